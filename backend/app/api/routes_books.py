@@ -5,6 +5,7 @@ from typing import List, Dict
 from sqlalchemy import func, or_
 from sqlalchemy.orm import joinedload
 import json as _json
+from concurrent.futures import as_completed
 
 from app.services.recommend import recommend_books
 from app.schemas.book import BookOut
@@ -16,6 +17,12 @@ from app.services.google_books import search_google_books, get_google_book_by_id
 from app.constants.univeristy_queries import UNI_BOOK_QUERIES
 from app.services.notifications import create_notification   # 🔥 NOWE
 from app.services.books_refresh import refresh_books_for_uni
+from app.core.executor import io_executor
+from app.core.cache import cache
+
+def invalidate_rankings_cache() -> None:
+    # rankingi (routes_rankings) liczą średnie z recenzji — po zmianie odśwież je we wszystkich workerach
+    cache.delete_tag("rankings")
 
 router = APIRouter(prefix="/books", tags=["books"])
 
@@ -364,23 +371,24 @@ def books_multi(
         # 🔹 Google Books bez cache
         queries = UNI_BOOK_QUERIES.get(uni, [uni])
         all_books = []
-        # pobierz równolegle i nie pobieraj nadmiarowo
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-        with ThreadPoolExecutor(max_workers=min(8, len(queries))) as ex:
-            futures = {
-                ex.submit(search_google_books, search_q, max_results=limit_each): search_q
-                for search_q in queries
-            }
-            for fut in as_completed(futures):
-                try:
-                    books = fut.result()
-                    books = [b for b in books if b.get("thumbnail") and b.get("authors")]
-                    all_books.extend(books)
-                    if len(all_books) >= limit_each * 2:
-                        # wystarczająco wyników, przerwij dalsze czekanie
-                        break
-                except Exception as e:
-                    print(f"❌ Błąd pobierania książek dla frazy '{futures[fut]}': {e}")
+        # pobierz równolegle (pula sieciowa — nie blokuje db_executor) i nie pobieraj nadmiarowo
+        futures = {
+            io_executor.submit(search_google_books, search_q, max_results=limit_each): search_q
+            for search_q in queries
+        }
+        for fut in as_completed(futures):
+            try:
+                books = fut.result()
+                books = [b for b in books if b.get("thumbnail") and b.get("authors")]
+                all_books.extend(books)
+                if len(all_books) >= limit_each * 2:
+                    # wystarczająco wyników, przerwij dalsze czekanie
+                    break
+            except Exception as e:
+                print(f"❌ Błąd pobierania książek dla frazy '{futures[fut]}': {e}")
+        # nie zajmuj puli zapytaniami, których wyników już nie potrzebujemy
+        for fut in futures:
+            fut.cancel()
 
         seen_local = set()
         unique_books = []
@@ -492,6 +500,7 @@ def review_book(
     )
     db.add(review)
     db.commit()
+    invalidate_rankings_cache()
     db.refresh(review)
     
     if book.created_by and book.created_by != user.id:
@@ -594,6 +603,7 @@ def update_review(
     review.text = rev.text
     review.rating = rev.rating
     db.commit()
+    invalidate_rankings_cache()
     db.refresh(review)
 
     avg = (
@@ -644,6 +654,7 @@ def delete_review(
 
     db.delete(review)
     db.commit()
+    invalidate_rankings_cache()
 
     # policz nową średnią
     avg = (
@@ -933,6 +944,7 @@ def update_book(
     book.available_copies = data.available_copies or 1
 
     db.commit()
+    invalidate_rankings_cache()
     db.refresh(book)
     return _enrich_with_ratings(db, book.__dict__)
 
@@ -956,4 +968,5 @@ def delete_book(
 
     db.delete(book)
     db.commit()
+    invalidate_rankings_cache()
     return {"status": "ok", "message": "Książka została usunięta"}
\ No newline at end of file
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from fastapi import APIRouter, HTTPException, Query
 from ..core.http_client import get_http
+from ..core import metrics
 from ..services.discovery import discover_sources
 
 router = APIRouter(prefix="/_debug", tags=["debug"])
@@ -24,3 +25,8 @@ async def debug_discover(url: str = Query(..., description="URL strony uczelni/o
         }
     except Exception as e:
         raise HTTPException(500, f"discover error: {e!r}")
+
+@router.get("/metrics")
+def debug_metrics():
+    """Metryki pul wątków i innych współdzielonych komponentów"""
+    return metrics.snapshot()
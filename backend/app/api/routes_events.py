@@ -12,9 +12,11 @@ from sqlalchemy.orm import Session
 
 from ..db.database import get_db
 from ..db import schemas
-from ..models.event import Event, UserEvent
+from ..models.event import Event, EventRecurrence, UserEvent
 from ..db.schemas import EventOut, EventDetail, RSVPIn, RSVPOut
+from ..core.executor import db_executor
 from ..core.http_client import get_http
+from ..services import event_classifier, event_recurrence, import_jobs
 from ..services.events_import import (
     import_events_all, import_events_for_university, build_event_ics, discover_sources
 )
@@ -22,97 +24,8 @@ from ..services.events_import import (
 router = APIRouter(prefix="/events", tags=["events"])
 
 def assign_event_to_universities(title: str, description: str, organizer: str, location: str) -> list[str]:
-    """Przypisz wydarzenie książkowe do odpowiednich uczelni na podstawie treści"""
-    text = f"{title} {description} {organizer} {location}".lower()
-    
-    # Słowa kluczowe dla każdej uczelni
-    university_keywords = {
-        "Akademia Górniczo-Hutnicza": [
-            "agh", "górnictwo", "hutnictwo", "inżynieria", "technologia", "matematyka", "fizyka", 
-            "informatyka", "automatyka", "energetyka", "materiały", "geologia", "geofizyka"
-        ],
-        "Uniwersytet Jagielloński": [
-            "uj", "jagielloński", "medycyna", "prawo", "farmacja", "biologia", "chemia", 
-            "psychologia", "historia", "filozofia", "literatura", "nauki polityczne"
-        ],
-        "Politechnika Krakowska": [
-            "pk", "politechnika", "architektura", "budownictwo", "mechanika", "elektrotechnika", 
-            "inżynieria", "matematyka", "fizyka", "chemia"
-        ],
-        "Uniwersytet Ekonomiczny": [
-            "uek", "ekonomiczny", "ekonomia", "finanse", "zarządzanie", "marketing", 
-            "biznes", "przedsiębiorczość", "statystyka"
-        ],
-        "Akademia Muzyczna im. Krzysztofa Pendereckiego": [
-            "muzyczna", "muzyka", "kompozycja", "dyrygentura", "instrumentalny", "wokalny", 
-            "jazz", "muzykologia", "teoria muzyki"
-        ],
-        "Akademia Sztuk Pięknych im. Jana Matejki": [
-            "asp", "sztuki piękne", "sztuka", "malarstwo", "rzeźba", "grafika", "architektura", 
-            "historia sztuki", "konserwacja"
-        ],
-        "Akademia Sztuk Teatralnych im. Stanisława Wyspiańskiego": [
-            "ast", "teatralna", "teatr", "aktorstwo", "reżyseria", "dramat", "scenografia", 
-            "historia teatru", "dramaturgia"
-        ],
-        "Akademia Wychowania Fizycznego im. Bronisława Czecha": [
-            "awf", "wychowanie fizyczne", "sport", "fitness", "rehabilitacja", "fizjoterapia", 
-            "medycyna sportowa", "biomechanika"
-        ],
-        "Uniwersytet Komisji Edukacji Narodowej": [
-            "uken", "pedagogika", "edukacja", "psychologia", "filologia", "dydaktyka", 
-            "nauczanie", "wychowanie"
-        ],
-        "Akademia Ignatianum": [
-            "ignatianum", "filozofia", "teologia", "etyka", "kultura", "humanistyka", 
-            "nauki społeczne", "psychologia"
-        ],
-        "Uniwersytet Papieski Jana Pawła II": [
-            "upjpii", "papieski", "teologia", "prawo kanoniczne", "filozofia religii", 
-            "historia kościoła", "etyka", "religia"
-        ],
-        "Krakowska Akademia im. Andrzeja Frycza Modrzewskiego": [
-            "krakowska akademia", "prawo", "administracja", "zarządzanie", "bezpieczeństwo", 
-            "pedagogika", "stosunki międzynarodowe", "zdrowie publiczne"
-        ],
-        "Wyższa Szkoła Zarządzania i Bankowości": [
-            "wszib", "zarządzanie", "bankowość", "finanse", "marketing", "biznes", 
-            "przedsiębiorczość", "ekonomia"
-        ],
-        "Uniwersytet Rolniczy im. Hugona Kołłątaja": [
-            "rolniczy", "rolnictwo", "ogrodnictwo", "leśnictwo", "weterynaria", 
-            "biotechnologia", "ochrona środowiska", "nauki o żywności"
-        ],
-        "Wyższa Szkoła Europejska im. ks. Józefa Tischnera": [
-            "wse", "europejska", "stosunki międzynarodowe", "kultura", "media", 
-            "zarządzanie", "turystyka", "komunikacja"
-        ],
-        "Wyższa Szkoła Ekonomii i Informatyki": [
-            "wsei", "ekonomia", "informatyka", "programowanie", "finanse", 
-            "zarządzanie", "marketing", "biznes"
-        ],
-        "Wyższa Szkoła Bezpieczeństwa Publicznego i Indywidualnego \"Apeiron\"": [
-            "apeiron", "bezpieczeństwo", "kryminologia", "cyberbezpieczeństwo", 
-            "obrona", "policja", "ratownictwo", "zarządzanie kryzysowe"
-        ]
-    }
-    
-    assigned_universities = []
-    
-    # Sprawdź słowa kluczowe dla każdej uczelni
-    for uni_name, keywords in university_keywords.items():
-        for keyword in keywords:
-            if keyword in text:
-                assigned_universities.append(uni_name)
-                break  # Przypisz tylko raz do każdej uczelni
-    
-    # Jeśli nie znaleziono żadnych powiązań, nie przypisuj do żadnej uczelni
-    # (zamiast przypisywać do wszystkich, co powoduje duplikaty)
-    if not assigned_universities:
-        print(f"⚠️ Nie znaleziono słów kluczowych dla wydarzenia: {title[:50]}...")
-        return []
-    
-    return assigned_universities
+    """Przypisz wydarzenie książkowe do odpowiednich uczelni na podstawie treści (reguły: app/data/event_classifier.json)"""
+    return event_classifier.universities_for(title, description, organizer, location)
 
 # ŹRÓDŁA WYDAWNICZE I KSIĄŻKOWE – prawdziwe strony z wydarzeniami w Krakowie
 EVENTS_SOURCES = {
@@ -255,20 +168,43 @@ def list_events(
                 func.lower(Event.location_name).like(like),
             )
         )
+    window_from = window_to = None
     if date_from:
         try:
-            sel = sel.where(Event.start_at >= datetime.fromisoformat(date_from))
+            window_from = datetime.fromisoformat(date_from)
         except Exception:
             pass
     if date_to:
         try:
-            sel = sel.where(Event.start_at <= datetime.fromisoformat(date_to))
+            window_to = datetime.fromisoformat(date_to)
         except Exception:
             pass
 
+    window = event_recurrence.window_bounds(window_from, window_to)
+    series = []
+    if window:
+        # 🔹 wydarzenia cykliczne osobnym zapytaniem — seria zaczęta dawno temu nie może wypaść przez limit
+        # pojedynczych wydarzeń; w oknie dat każde wystąpienie osobno (rozwijane leniwie, z cache)
+        series = db.execute(
+            sel.add_columns(EventRecurrence)
+            .join(EventRecurrence, EventRecurrence.event_id == Event.id)
+            .where(Event.start_at <= window[1],
+                   or_(EventRecurrence.until.is_(None), EventRecurrence.until >= window[0]))
+        ).all()
+        sel = sel.where(~Event.id.in_(select(EventRecurrence.event_id)))
+    if window_from:
+        sel = sel.where(Event.start_at >= window_from)
+    if window_to:
+        sel = sel.where(Event.start_at <= window_to)
+
     sel = sel.order_by(Event.start_at.desc(), Event.id.asc()).limit(200)
     events = db.execute(sel).scalars().all()
 
+    if series:
+        recurrences = {rec.event_id: rec for _, rec in series}
+        expanded = event_recurrence.expand([ev for ev, _ in series], recurrences, *window)
+        events = sorted([*events, *expanded], key=lambda e: e.start_at, reverse=True)[:200]
+
     # 🔹 mapowanie RSVP dla zalogowanego usera
     state_map = {}
     if current_user:
@@ -474,66 +410,50 @@ def event_ics(event_id: int, db: Session = Depends(get_db)):
     ics = build_event_ics(ev)
     return Response(content=ics, media_type="text/calendar")
 
-# Importy (MVP)
-@router.post("/import/all")
-async def import_all_events_endpoint(db: Session = Depends(get_db)):
-    http = get_http()
-    await import_events_all(db, http, EVENTS_SOURCES)
-    return {"ok": True}
+# Importy — zadania w tle (app/services/import_jobs.py); odpowiedź od razu z id zadania,
+# postęp pod /events/import/jobs/{id}. Jeden import na zestaw źródeł naraz.
+def _job_response(job: dict | None, created: bool, **extra) -> dict:
+    if job is None:
+        raise HTTPException(409, "Import tych źródeł już trwa")
+    return {
+        "ok": True,
+        "job_id": job["id"],
+        "status": job["status"],
+        "message": "Import uruchomiony w tle" if created else "Import tych źródeł już trwa",
+        **extra,
+    }
 
-@router.post("/import/refresh")
-async def refresh_events_endpoint(db: Session = Depends(get_db)):
-    """Wyczyść stare wydarzenia i zaimportuj nowe z zaktualizowanych źródeł"""
-    import time
-    start_time = time.time()
-    
-    try:
-        print("🔄 Rozpoczynam odświeżanie wydarzeń...")
-        
-        # Najpierw usuń powiązane rekordy z user_events (RSVP)
-        from sqlalchemy import delete
-        print("🗑️ Usuwam stare RSVP...")
-        db.execute(delete(UserEvent))
-        db.commit()
-        
-        # Teraz usuń wszystkie stare wydarzenia
-        print("🗑️ Usuwam stare wydarzenia...")
-        db.execute(delete(Event))
-        db.commit()
-        
-        print("📥 Importuję nowe wydarzenia z źródeł książkowych...")
-        print(f"📊 Łącznie źródeł do sprawdzenia: {len(EVENTS_SOURCES)}")
-        
-        # Zaimportuj nowe wydarzenia z zaktualizowanych źródeł
-        await import_events_all(db, get_http(), EVENTS_SOURCES)
-        
-        # Pokaż statystyki
-        total = db.execute(select(func.count()).select_from(Event)).scalar() or 0
-        rows = db.execute(
-            select(Event.university_name.label("university_name"), func.count().label("count"))
-            .group_by(Event.university_name)
-            .order_by(func.count().desc())
-        ).all()
-        by_university = [dict(r._mapping) for r in rows]
-        
-        elapsed_time = time.time() - start_time
-        
-        return {
-            "ok": True, 
-            "message": f"Wydarzenia zostały odświeżone z nowych źródeł książkowych w {elapsed_time:.1f}s",
-            "total_events": total, 
-            "by_university": by_university,
-            "elapsed_time": elapsed_time,
-            "sources_checked": len(EVENTS_SOURCES)
-        }
-    except Exception as e:
-        db.rollback()
-        elapsed_time = time.time() - start_time
-        print(f"❌ Błąd po {elapsed_time:.1f}s: {str(e)}")
-        return {
-            "ok": False,
-            "error": f"Błąd podczas odświeżania wydarzeń po {elapsed_time:.1f}s: {str(e)}"
-        }
+@router.post("/import/all", status_code=202)
+async def import_all_events_endpoint():
+    async def run(db: Session, on_progress):
+        return await import_events_all(db, get_http(), EVENTS_SOURCES, on_progress=on_progress)
+    job, created = await import_jobs.submit("all", "all", run)
+    return _job_response(job, created)
+
+@router.post("/import/refresh", status_code=202)
+async def refresh_events_endpoint():
+    """
+    Odśwież wydarzenia w tle: zmienione są aktualizowane, nowe publikowane, a zniknięte ze źródeł
+    dostają status "removed" — w jednej transakcji na końcu. RSVP użytkowników zostają,
+    a lista wydarzeń przez cały czas jest widoczna.
+    """
+    async def run(db: Session, on_progress):
+        print(f"🔄 Odświeżanie wydarzeń, źródeł do sprawdzenia: {len(EVENTS_SOURCES)}")
+        return await import_events_all(db, get_http(), EVENTS_SOURCES, sync=True, on_progress=on_progress)
+    # ten sam zestaw źródeł co /import/all — nie biegną równolegle
+    job, created = await import_jobs.submit("refresh", "all", run)
+    return _job_response(job, created, sources_checked=len(EVENTS_SOURCES))
+
+@router.get("/import/jobs")
+async def list_import_jobs(limit: int = Query(20, ge=1, le=100)):
+    return await db_executor.run(import_jobs.list_jobs, limit)
+
+@router.get("/import/jobs/{job_id}")
+async def get_import_job(job_id: int):
+    job = await db_executor.run(import_jobs.get_job, job_id)
+    if not job:
+        raise HTTPException(404, "Zadanie importu nie istnieje")
+    return job
 
 @router.post("/clean-duplicates")
 def clean_duplicates_endpoint(db: Session = Depends(get_db)):
@@ -559,34 +479,16 @@ def clean_duplicates_endpoint(db: Session = Depends(get_db)):
             "error": f"Błąd podczas czyszczenia duplikatów: {str(e)}"
         }
 
-@router.post("/import/uni")
-async def import_events_for_uni_endpoint(name: str, db: Session = Depends(get_db)):
-    import time
-    start_time = time.time()
-    
-    http = get_http()
+@router.post("/import/uni", status_code=202)
+async def import_events_for_uni_endpoint(name: str):
     if name not in EVENTS_SOURCES:
         raise HTTPException(404, f"Brak w EVENTS_SOURCES: {name}")
-    
-    print(f"🔄 Importuję wydarzenia dla: {name}")
-    await import_events_for_university(db, name, http, EVENTS_SOURCES)
-    
-    elapsed_time = time.time() - start_time
-    total = db.execute(select(func.count()).select_from(Event)).scalar() or 0
-    rows = db.execute(
-        select(Event.university_name.label("university_name"), func.count().label("count"))
-        .group_by(Event.university_name)
-        .order_by(func.count().desc())
-    ).all()
-    by_university = [dict(r._mapping) for r in rows]
-    
-    return {
-        "ok": True, 
-        "message": f"Import dla {name} zakończony w {elapsed_time:.1f}s",
-        "total_events": total, 
-        "by_university": by_university,
-        "elapsed_time": elapsed_time
-    }
+
+    async def run(db: Session, on_progress):
+        print(f"🔄 Importuję wydarzenia dla: {name}")
+        return await import_events_for_university(db, name, get_http(), EVENTS_SOURCES, on_progress=on_progress)
+    job, created = await import_jobs.submit("uni", f"uni:{name}", run)
+    return _job_response(job, created)
 
 @router.get("/import/test-source")
 async def test_single_source(url: str, db: Session = Depends(get_db)):
@@ -0,0 +1,39 @@
+# app/api/routes_media.py
+from __future__ import annotations
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse, RedirectResponse
+
+from ..core.cache import cache
+from ..core.http_client import get_http
+from ..services import media_cache
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+_FAIL_TTL = 600  # po nieudanym pobraniu przez 10 minut od razu odsyłamy do źródła
+_IMMUTABLE = "public, max-age=31536000, immutable"
+# obrazek z cudzego źródła serwowany z naszego originu: bez zgadywania typu i bez wykonywania czegokolwiek
+_SAFE_HEADERS = {"X-Content-Type-Options": "nosniff", "Content-Security-Policy": "default-src 'none'; sandbox"}
+
+@router.get("/proxy")
+async def media_proxy(url: str = Query(..., description="Zewnętrzny URL obrazka"),
+                      w: Optional[int] = Query(None, description="Szerokość docelowa (px)"),
+                      sig: str = Query(..., description="Podpis z media_cache.proxied_url")):
+    """Obrazek z lokalnego cache (pobrany raz, opcjonalnie przeskalowany) z długim, niezmiennym Cache-Control"""
+    if w is not None and w not in media_cache.ALLOWED_WIDTHS:
+        raise HTTPException(400, "Niedozwolona szerokość")
+    # podpisujemy tylko URL-e generowane przez backend — endpoint nie jest otwartym proxy
+    if not media_cache.verify_signature(url, w, sig):
+        raise HTTPException(403, "Nieprawidłowy podpis")
+
+    fail_key = f"media:fail:{url}|{w or ''}"
+    if await cache.aget(fail_key) is None:
+        hit = await media_cache.get_or_fetch(get_http(), url, w)
+        if hit:
+            path, content_type, digest = hit
+            return FileResponse(path, media_type=content_type,
+                                headers={"Cache-Control": _IMMUTABLE, "ETag": f'"{digest}"', **_SAFE_HEADERS})
+        await cache.aset(fail_key, True, ttl=_FAIL_TTL)
+    # źródło niedostępne z serwera — niech przeglądarka spróbuje sama (onError w UI pokaże placeholder)
+    return RedirectResponse(url, status_code=302, headers={"Cache-Control": "no-store"})
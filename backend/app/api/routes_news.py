@@ -1,15 +1,22 @@
 from __future__ import annotations
-import asyncio, time, re, hashlib
+import asyncio, calendar, json, time, re, hashlib, uuid
 from typing import Optional
 from urllib.parse import urljoin, quote_plus, urlparse, parse_qs
 from datetime import date, datetime, timedelta
 
-import httpx, feedparser
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
+import httpx
+from selectolax.parser import HTMLParser
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, field_serializer
 
 from ..core.http_client import get_http
 from ..constants.univeristy_queries import UNI_NEWS_QUERIES
+from ..services.feed_fetcher import get_feed
+from ..core.executor import parse_executor, db_executor
+from ..core.cache import cache
+from ..services import og_cache, news_store
+from ..services.media_cache import proxied_url, NEWS_THUMB_WIDTH
 
 router = APIRouter(tags=["news"])
 
@@ -24,6 +31,15 @@ class NewsItem(BaseModel):
     publisher_domain: str | None = None
     publisher_favicon: str | None = None
 
+    # 🖼️ w odpowiedziach API obrazki idą przez lokalny cache (/media/proxy); w cache/bazie zostają oryginały
+    @field_serializer("thumbnail", when_used="json")
+    def _proxy_thumbnail(self, v):
+        return proxied_url(v, NEWS_THUMB_WIDTH)
+
+    @field_serializer("publisher_favicon", when_used="json")
+    def _proxy_favicon(self, v):
+        return proxied_url(v)
+
 # --- Config / cache ---
 FEEDS: dict[str, list[str]] = {}
 
@@ -52,17 +68,22 @@ GENERAL_BOOK_NEWS_QUERIES = [
     "nauka literatura", "książki akademickie", "nauka książki"
 ]
 
-_NEWS_CACHE: dict[tuple[str,int], tuple[float, list[NewsItem]]] = {}
+# 🚀 Wyniki prekomputowane w tle (app/services/news_prefetch.py) we wspólnym cache (app/core/cache.py):
+# "news:<zapytanie>" -> (czas, newsy). Budujemy zawsze z _PREFETCH_MAX_RESULTS, a handlery tylko przycinają listę.
+_NEWS_CACHE_PREFIX = "news:"
 _NEWS_CACHE_TTL = 300.0  # 5 minut zamiast 2
-_NEWS_CACHE_LOCK = asyncio.Lock()
+_NEWS_CACHE_MAX_AGE = 3600.0  # po tylu sekundach nieodświeżany klucz wypada z cache
+_REFRESH_LEASE = 60.0  # blokada budowania klucza — jeden worker na raz
+_PREFETCH_MAX_RESULTS = 60
+ALL_NEWS_KEY = "wszystkie"
 
-# Cache dla multi-request
-_MULTI_NEWS_CACHE: dict[str, tuple[float, dict[str, list[NewsItem]]]] = {}
-_MULTI_NEWS_CACHE_TTL = 600.0  # 10 minut dla multi-request
-_MULTI_NEWS_CACHE_LOCK = asyncio.Lock()
+# Trwające odświeżenia (jedno na klucz)
+_REFRESH_TASKS: dict[str, asyncio.Task] = {}
+MAX_NEWS_REFRESHES = 16  # równoległe odświeżenia uruchamiane z żądań (dowolne q) — powyżej limitu nie startujemy nowych
+_COLD_RETRY_AFTER = 2    # zimne zapytanie: pusta odpowiedź od razu, klient ponawia po tylu sekundach
 
-# Semafor do ograniczenia równoległych zapytań fetch_og
-_FETCH_OG_SEMAPHORE = asyncio.Semaphore(5)  # Maksymalnie 5 równoległych zapytań
+# Semafor do ograniczenia równoległych zapytań fetch_og (łącznie; limit per host pilnuje core/http_client.py)
+_FETCH_OG_SEMAPHORE = asyncio.Semaphore(8)
 
 # --- Utils (skrócone, 1:1 z main.py) ---
 _HREF_RE = re.compile(r'href=["\']([^"\']+)["\']', re.I)
@@ -71,10 +92,10 @@ def extract_first_href(html: str | None) -> str | None:
     m = _HREF_RE.search(html); return m.group(1) if m else None
 
 _TAG_RE = re.compile(r"<[^>]+>")
+_WS_RE = re.compile(r"\s+")
 def strip_html(s: str | None) -> str:
     if not s: return ""
-    import re as _re
-    text = _TAG_RE.sub("", s); return _re.sub(r"\s+", " ", text).strip()
+    text = _TAG_RE.sub("", s); return _WS_RE.sub(" ", text).strip()
 
 _NORM_RE = re.compile(r"[\s\-\–\—\:;,\.\!\?\"“”\'’]+", re.U)
 def _norm(s: str) -> str:
@@ -101,19 +122,16 @@ BOOK_KEYWORDS = [
     "czytelnik", "czytelnicy", "czytelniczka", "czytelniczki"
 ]
 
+# 🚀 Jedna skompilowana alternacja (bez duplikatów, najdłuższe frazy najpierw) zamiast pętli po słowach
+_BOOK_KEYWORDS_RE = re.compile(
+    "|".join(re.escape(k) for k in sorted(set(BOOK_KEYWORDS), key=len, reverse=True))
+)
+
 def contains_book_keyword(title: str) -> bool:
     """Sprawdza czy tytuł zawiera słowa kluczowe związane z książkami"""
     if not title:
         return False
-    
-    title_lower = _norm(title)
-    
-    # Sprawdź czy tytuł zawiera jakiekolwiek słowo kluczowe
-    for keyword in BOOK_KEYWORDS:
-        if keyword in title_lower:
-            return True
-    
-    return False
+    return _BOOK_KEYWORDS_RE.search(_norm(title)) is not None
 
 def is_within_last_year(date_str: str) -> bool:
     """Sprawdza czy data jest z ostatniego roku"""
@@ -167,48 +185,75 @@ def _publisher_host_from_url(u: Optional[str]) -> Optional[str]:
     return h or None
 
 async def _fetch_feed(http: httpx.AsyncClient, url: str):
-    try:
-        r = await http.get(url, headers={"Accept": "application/rss+xml, application/xml, */*"}, timeout=5.0)
-        r.raise_for_status()
-        return feedparser.parse(r.content)
-    except Exception:
+    # wspólny cache per URL + single-flight + warunkowy GET (ETag/Last-Modified)
+    return await get_feed(http, url, timeout=5.0)
+
+_OG_MAX_BYTES = 64 * 1024  # nigdy nie czytamy więcej niż tyle z artykułu
+_OG_KEYS = ("og:image", "twitter:image", "og:description", "description", "og:site_name", "og:url")
+
+def _parse_og_html(html: str) -> dict:
+    """Wyciąga meta OG z <head> (CPU — uruchamiane w parse_executor)"""
+    out = {}
+    for node in HTMLParser(html).css("meta"):
+        attrs = node.attributes
+        k = (attrs.get("property") or attrs.get("name") or "").lower()
+        content = (attrs.get("content") or "").strip()
+        if k not in _OG_KEYS or not content:
+            continue
+        if k in ("og:image","twitter:image") and "image" not in out:
+            out["image"] = content
+        elif k in ("og:description","description") and "description" not in out:
+            out["description"] = content
+        elif k == "og:site_name" and "site_name" not in out:
+            out["site_name"] = content
+        elif k == "og:url" and "url" not in out:
+            out["url"] = content
+    return out
+
+async def _read_html_head(r: httpx.Response) -> str | None:
+    """Czyta strumień tylko do </head> (lub _OG_MAX_BYTES); reszta body nie jest pobierana"""
+    ctype = (r.headers.get("Content-Type") or "").lower()
+    if ctype and "html" not in ctype:
         return None
+    buf = bytearray()
+    async for chunk in r.aiter_bytes():
+        start = max(0, len(buf) - 7)
+        buf.extend(chunk)
+        if b"</head" in bytes(buf[start:]).lower() or len(buf) >= _OG_MAX_BYTES:
+            break
+    return bytes(buf[:_OG_MAX_BYTES]).decode(r.encoding or "utf-8", errors="replace")
 
 async def fetch_og(url: str, http: httpx.AsyncClient) -> dict:
-    # prosty, lokalny cache
-    if not hasattr(fetch_og, "_c"): fetch_og._c = {}  # type: ignore
-    cache = fetch_og._c  # type: ignore
-    import time as _t, re as _re
-    now = _t.time()
-    rec = cache.get(url)
-    if rec and now - rec[0] < 6*3600: return rec[1]
-    out = {}
-    
+    # 🚀 cache OG: wspólny cache (app/core/cache.py) + tabela og_cache, osobne TTL dla błędów
+    key = og_cache.canonical_url(url)
+    hit = await og_cache.aget_cached(key)
+    if hit is not None: return hit
+    try:
+        hit = await db_executor.run(og_cache.load_cached, key)
+    except Exception:
+        hit = None
+    if hit is not None: return hit
+
+    out, ok, html = {}, False, None
     # Ograniczenie równoległych zapytań
     async with _FETCH_OG_SEMAPHORE:
         try:
-            # Krótszy timeout i ograniczenie rozmiaru odpowiedzi
-            r = await http.get(url, timeout=5.0, follow_redirects=True)
-            r.raise_for_status()
-            # Ograniczenie do pierwszych 50KB HTML
-            html = r.text[:50000]
-            meta = _re.findall(
-                r'<meta[^>]+?(?:property|name)=["\'](og:image|twitter:image|og:description|description|og:site_name|og:url)["\'][^>]+?content=["\']([^"\']+)["\']',
-                html, flags=_re.I
-            )
-            for name, content in meta:
-                k = name.lower()
-                if k in ("og:image","twitter:image") and "image" not in out:
-                    out["image"] = content
-                elif k in ("og:description","description") and "description" not in out:
-                    out["description"] = content
-                elif k == "og:site_name" and "site_name" not in out:
-                    out["site_name"] = content
-                elif k == "og:url" and "url" not in out:
-                    out["url"] = content
+            # 🚀 streaming: wyjście z bloku zamyka połączenie po przeczytaniu <head>
+            async with http.stream("GET", url, timeout=5.0, follow_redirects=True) as r:
+                r.raise_for_status()
+                html = await _read_html_head(r)
+            ok = True
         except Exception:
             pass
-    cache[url] = (now, out)  # type: ignore
+    if html:
+        try:
+            out = await parse_executor.run(_parse_og_html, html)
+        except Exception:
+            out = {}
+    try:
+        await db_executor.run(og_cache.store, key, out, ok)
+    except Exception:
+        pass
     return out
 
 def resolve_google_link_fast(url: str) -> str:
@@ -221,62 +266,32 @@ def resolve_google_link_fast(url: str) -> str:
     except Exception:
         return url
 
-async def _build_news_for_query(http: httpx.AsyncClient, q: str, max_results: int) -> list[NewsItem]:
-    q = q.strip()
-    if not q: return []
-    
-    # Sprawdź czy to nazwa uczelni - jeśli tak, użyj zapytań związanych z książkami
-    if q in UNI_NEWS_QUERIES:
-        # Użyj wszystkich zapytań dla danej uczelni
-        queries = UNI_NEWS_QUERIES[q]
-        all_entries = []
-        
-        # Pobierz newsy równolegle dla wszystkich zapytań (szybsze)
-        all_targets = []
-        for query in queries:
-            targets = FEEDS.get(query, []) or [google_news_rss(query)]
-            all_targets.extend(targets)
-        
-        # Dodaj RSS feeds dla książek
-        for category, rss_urls in BOOK_RSS_FEEDS.items():
-            all_targets.extend(rss_urls)
-        
-        # Pobierz wszystkie feeds równolegle
-        feeds = await asyncio.gather(*[_fetch_feed(http, u) for u in all_targets])
-        
-        # Zbierz wszystkie entries
-        for f in feeds or []:
-            if f: all_entries.extend(f.entries[:max_results // 2])  # Połowa z każdego źródła
-        
-        entries = all_entries
-    else:
-        # Dla innych zapytań użyj standardowego mechanizmu + RSS feeds
-        targets = FEEDS.get(q, []) or [google_news_rss(q)]
-        
-        # Dodaj RSS feeds dla książek jeśli zapytanie zawiera słowo "książka"
-        if "książka" in q.lower() or "książki" in q.lower():
-            for category, rss_urls in BOOK_RSS_FEEDS.items():
-                targets.extend(rss_urls)
-        
-        feeds = await asyncio.gather(*[_fetch_feed(http, u) for u in targets])
+_ONE_YEAR = 365 * 24 * 3600
 
-        entries = []
-        for f in feeds or []:
-            if f: entries.extend(f.entries[:max_results])
+def _entry_is_recent(e, cutoff: float) -> bool:
+    """Data z gotowych struktur feedparsera (published_parsed/updated_parsed), bez strptime"""
+    st = getattr(e, "published_parsed", None) or getattr(e, "updated_parsed", None)
+    if st:
+        return calendar.timegm(st) >= cutoff
+    # feedparser nie rozpoznał daty — ścieżka awaryjna po tekście (brak daty = akceptuj)
+    return is_within_last_year(getattr(e, "published", None) or getattr(e, "updated", None))
 
+def _prepare_entries(entries) -> list[dict]:
+    """Filtruje wpisy z feedów (słowa kluczowe, ostatni rok) i wyciąga pola potrzebne do NewsItem"""
+    cutoff = time.time() - _ONE_YEAR
     pre = []
     for e in entries:
         title = getattr(e, "title", "") or ""
-        date  = getattr(e, "published", None) or getattr(e, "updated", None)
         
         # Filtruj tylko newsy zawierające słowa kluczowe związane z książkami w tytule
         if not contains_book_keyword(title):
             continue
         
         # Filtruj tylko newsy z ostatniego roku
-        if not is_within_last_year(date):
+        if not _entry_is_recent(e, cutoff):
             continue
             
+        date  = getattr(e, "published", None) or getattr(e, "updated", None)
         link  = getattr(e, "link", "") or ""
         html  = getattr(e, "summary", None)
         text  = strip_html(html)
@@ -289,16 +304,25 @@ async def _build_news_for_query(http: httpx.AsyncClient, q: str, max_results: in
         raw_url = extract_first_href(html) or link
         article_url = resolve_google_link_fast(raw_url)
         pre.append(dict(entry=e, title=title, text=text, date=date, thumb=thumb, url=article_url, src_title=src_title))
+    return pre
+
+async def _enrich_items(http: httpx.AsyncClient, pre: list[dict], max_results: int,
+                        concurrency: int | None = None) -> list[NewsItem]:
+    """Uzupełnia newsy o OG (opis, miniatura), wydawcę i favicon; deduplikuje po linku"""
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
 
-    # 🚀 Ograniczenie liczby newsów do przetworzenia (max 30 zamiast wszystkich)
-    pre_limited = pre[:30]
-    
     async def enrich(it) -> NewsItem:
         e, title, text, date, thumb, url, src_title = it.values()
         if _norm(text) == _norm(title) or _norm(text).startswith(_norm(title)):
             text = ""
         need_og = (not thumb) or (not text or len(text) < 40)
-        og = await fetch_og(url, http) if (need_og and url) else {}
+        og = {}
+        if need_og and url:
+            if semaphore:
+                async with semaphore:
+                    og = await fetch_og(url, http)
+            else:
+                og = await fetch_og(url, http)
         if (not text or len(text) < 40) and og.get("description") and _norm(og["description"]) != _norm(title):
             text = og["description"]
         thumb = thumb or (og.get("image") and urljoin(url, og["image"])) or None
@@ -323,188 +347,255 @@ async def _build_news_for_query(http: httpx.AsyncClient, q: str, max_results: in
             publisher_favicon=fav,
         )
 
-    out = await asyncio.gather(*[enrich(it) for it in pre_limited])
+    out = await asyncio.gather(*[enrich(it) for it in pre])
     uniq = {}
     for n in out:
         if n.link and n.link not in uniq: uniq[n.link] = n
     return list(uniq.values())[:max_results]
 
-# --- Endpoints ---
-@router.get("/news", response_model=list[NewsItem])
-async def news(q: str = Query(..., min_length=1), max_results: int = 12):
-    http = get_http()
-    if http is None:
-        raise HTTPException(503, "HTTP client not ready")
-    key = (q.strip(), int(max_results)); now = time.time()
-    async with _NEWS_CACHE_LOCK:
-        cached = _NEWS_CACHE.get(key)
-        if cached and (now - cached[0] < _NEWS_CACHE_TTL):
-            return cached[1]
-    data = await _build_news_for_query(http, q, max_results)
-    async with _NEWS_CACHE_LOCK:
-        _NEWS_CACHE[key] = (time.time(), data)
-    return data
-
-@router.get("/news/multi", response_model=dict[str, list[NewsItem]])
-async def news_multi(q: str = Query(..., description="Lista zapytań rozdzielona przecinkami"),
-                     limit_each: int = 4):
-    http = get_http()
-    if http is None:
-        raise HTTPException(503, "HTTP client not ready")
-    queries = [s.strip() for s in q.split(",") if s.strip()]
-    if not queries: return {}
-    
-    # 🚀 Cache na poziomie całego multi-request
-    cache_key = f"{sorted(queries)}_{limit_each}"
-    now = time.time()
-    async with _MULTI_NEWS_CACHE_LOCK:
-        cached = _MULTI_NEWS_CACHE.get(cache_key)
-        if cached and (now - cached[0] < _MULTI_NEWS_CACHE_TTL):
-            return cached[1]
-    
-    # 🚀 Ograniczenie liczby równoległych zapytań
-    max_concurrent = min(5, len(queries))  # Maksymalnie 5 równoległych zapytań
+async def _build_news_for_query(http: httpx.AsyncClient, q: str, max_results: int) -> list[NewsItem]:
+    q = q.strip()
+    if not q: return []
     
-    # Jeśli to są nazwy uczelni, użyj zapytań związanych z książkami
-    if all(uni in UNI_NEWS_QUERIES for uni in queries):
-        async def get_for(single_q: str):
-            key = (single_q, int(limit_each)); now = time.time()
-            async with _NEWS_CACHE_LOCK:
-                cached = _NEWS_CACHE.get(key)
-                if cached and (now - cached[0] < _NEWS_CACHE_TTL):
-                    return single_q, cached[1]
-            data = await _build_news_for_query(http, single_q, limit_each)
-            async with _NEWS_CACHE_LOCK:
-                _NEWS_CACHE[key] = (time.time(), data)
-            return single_q, data
+    # Sprawdź czy to nazwa uczelni - jeśli tak, użyj zapytań związanych z książkami
+    if q in UNI_NEWS_QUERIES:
+        # Użyj wszystkich zapytań dla danej uczelni
+        queries = UNI_NEWS_QUERIES[q]
+        all_entries = []
         
-        # 🚀 Ograniczenie równoległych zapytań
-        semaphore = asyncio.Semaphore(max_concurrent)
-        async def limited_get_for(single_q: str):
-            async with semaphore:
-                return await get_for(single_q)
+        # Pobierz newsy równolegle dla wszystkich zapytań (szybsze)
+        all_targets = []
+        for query in queries:
+            targets = FEEDS.get(query, []) or [google_news_rss(query)]
+            all_targets.extend(targets)
         
-        pairs = await asyncio.gather(*[limited_get_for(s) for s in queries])
-        result = {k: v for k, v in pairs}
+        # Dodaj RSS feeds dla książek
+        for category, rss_urls in BOOK_RSS_FEEDS.items():
+            all_targets.extend(rss_urls)
+        
+        # Pobierz wszystkie feeds równolegle
+        feeds = await asyncio.gather(*[_fetch_feed(http, u) for u in all_targets])
         
-        # 🚀 Cache wyników
-        async with _MULTI_NEWS_CACHE_LOCK:
-            _MULTI_NEWS_CACHE[cache_key] = (time.time(), result)
-        return result
+        # Zbierz wszystkie entries
+        for f in feeds or []:
+            if f: all_entries.extend(f.entries[:max_results // 2])  # Połowa z każdego źródła
+        
+        entries = all_entries
     else:
         # Dla innych zapytań użyj standardowego mechanizmu + RSS feeds
-        async def get_for(single_q: str):
-            key = (single_q, int(limit_each)); now = time.time()
-            async with _NEWS_CACHE_LOCK:
-                cached = _NEWS_CACHE.get(key)
-                if cached and (now - cached[0] < _NEWS_CACHE_TTL):
-                    return single_q, cached[1]
-            data = await _build_news_for_query(http, single_q, limit_each)
-            async with _NEWS_CACHE_LOCK:
-                _NEWS_CACHE[key] = (time.time(), data)
-            return single_q, data
+        targets = FEEDS.get(q, []) or [google_news_rss(q)]
         
-        # Jeśli "wszystkie" jest w zapytaniach, użyj RSS feeds
-        if "wszystkie" in queries:
-            # Pobierz newsy z RSS feeds dla wszystkich kategorii książek równolegle
-            all_rss_urls = []
+        # Dodaj RSS feeds dla książek jeśli zapytanie zawiera słowo "książka"
+        if "książka" in q.lower() or "książki" in q.lower():
             for category, rss_urls in BOOK_RSS_FEEDS.items():
-                all_rss_urls.extend(rss_urls)
-            
-            # 🚀 Ograniczenie równoległych zapytań RSS
-            semaphore = asyncio.Semaphore(3)  # Maksymalnie 3 równoległe zapytania RSS
-            async def limited_fetch_feed(url):
-                async with semaphore:
-                    return await _fetch_feed(http, url)
-            
-            feeds = await asyncio.gather(*[limited_fetch_feed(url) for url in all_rss_urls])
-            
-            all_entries = []
-            for f in feeds or []:
-                if f: all_entries.extend(f.entries[:limit_each // 2])  # Połowa z każdego źródła
-            
-            # Przetwórz entries na NewsItem
-            pre = []
-            for e in all_entries:
-                title = getattr(e, "title", "") or ""
-                date  = getattr(e, "published", None) or getattr(e, "updated", None)
-                
-                # Filtruj tylko newsy zawierające słowa kluczowe związane z książkami w tytule
-                if not contains_book_keyword(title):
-                    continue
-                
-                # Filtruj tylko newsy z ostatniego roku
-                if not is_within_last_year(date):
-                    continue
-                    
-                link  = getattr(e, "link", "") or ""
-                html  = getattr(e, "summary", None)
-                text  = strip_html(html)
-                src_title = getattr(getattr(e, "feed", None) or {}, "title", None) or getattr(getattr(e, "source", None) or {}, "title", None)
-                thumb = None
-                if hasattr(e, "media_thumbnail") and e.media_thumbnail:
-                    thumb = e.media_thumbnail[0].get("url")
-                elif hasattr(e, "media_content") and e.media_content:
-                    thumb = e.media_content[0].get("url")
-                raw_url = extract_first_href(html) or link
-                article_url = resolve_google_link_fast(raw_url)
-                pre.append(dict(entry=e, title=title, text=text, date=date, thumb=thumb, url=article_url, src_title=src_title))
-            
-            # 🚀 Ograniczenie równoległych zapytań enrich
-            enrich_semaphore = asyncio.Semaphore(3)  # Maksymalnie 3 równoległe zapytania enrich
-            async def enrich(it) -> NewsItem:
-                async with enrich_semaphore:
-                    e, title, text, date, thumb, url, src_title = it.values()
-                    if _norm(text) == _norm(title) or _norm(text).startswith(_norm(title)):
-                        text = ""
-                    need_og = (not thumb) or (not text or len(text) < 40)
-                    og = await fetch_og(url, http) if (need_og and url) else {}
-                    if (not text or len(text) < 40) and og.get("description") and _norm(og["description"]) != _norm(title):
-                        text = og["description"]
-                    thumb = thumb or (og.get("image") and urljoin(url, og["image"])) or None
-                    host = _publisher_host_from_url(url)
-                    if host and "google." in host:
-                        try:
-                            src = getattr(e, "source", None)
-                            src_url = getattr(src, "href", None) or (src.get("href") if isinstance(src, dict) else None)
-                            src_host = _publisher_host_from_url(src_url)
-                            if src_host: host = src_host
-                        except Exception:
-                            pass
-                    fav = f"https://icons.duckduckgo.com/ip3/{host}.ico" if host else None
-                    return NewsItem(
-                        title=title,
-                        link=url or getattr(e,"link","") or "",
-                        source=og.get("site_name") or src_title,
-                        snippet=take_2_3_sentences(text) if text else None,
-                        date=date,
-                        thumbnail=thumb,
-                        publisher_domain=host,
-                        publisher_favicon=fav,
-                    )
-            
-            out = await asyncio.gather(*[enrich(it) for it in pre])
-            uniq = {}
-            for n in out:
-                if n.link and n.link not in uniq: uniq[n.link] = n
-            data = list(uniq.values())[:limit_each]
-            
-            result = {"wszystkie": data}
-            # 🚀 Cache wyników
-            async with _MULTI_NEWS_CACHE_LOCK:
-                _MULTI_NEWS_CACHE[cache_key] = (time.time(), result)
-            return result
+                targets.extend(rss_urls)
+        
+        feeds = await asyncio.gather(*[_fetch_feed(http, u) for u in targets])
+
+        entries = []
+        for f in feeds or []:
+            if f: entries.extend(f.entries[:max_results])
+
+    # 🚀 Ograniczenie liczby newsów do przetworzenia (max 30 zamiast wszystkich)
+    pre_limited = (await parse_executor.run(_prepare_entries, entries))[:30]
+    return await _enrich_items(http, pre_limited, max_results)
+
+async def _build_all_books_news(http: httpx.AsyncClient, max_results: int) -> list[NewsItem]:
+    """Widok "wszystkie": newsy z RSS księgarni, bibliotek i wydawnictw"""
+    all_rss_urls = []
+    for category, rss_urls in BOOK_RSS_FEEDS.items():
+        all_rss_urls.extend(rss_urls)
+    
+    # 🚀 Ograniczenie równoległych zapytań RSS
+    semaphore = asyncio.Semaphore(3)  # Maksymalnie 3 równoległe zapytania RSS
+    async def limited_fetch_feed(url):
+        async with semaphore:
+            return await _fetch_feed(http, url)
+    
+    feeds = await asyncio.gather(*[limited_fetch_feed(url) for url in all_rss_urls])
+    
+    all_entries = []
+    for f in feeds or []:
+        if f: all_entries.extend(f.entries[:max_results // 2])  # Połowa z każdego źródła
+    
+    # 🚀 Ograniczenie równoległych zapytań enrich (max 3)
+    pre = await parse_executor.run(_prepare_entries, all_entries)
+    return await _enrich_items(http, pre, max_results, concurrency=3)
+
+# --- Prekomputacja / odczyt ---
+async def _cached_news(key: str) -> tuple[float, list[NewsItem]] | None:
+    return await cache.aget(_NEWS_CACHE_PREFIX + key)
+
+async def _store_news(key: str, ts: float, data: list[NewsItem]) -> None:
+    await cache.aset(_NEWS_CACHE_PREFIX + key, (ts, data), ttl=_NEWS_CACHE_MAX_AGE, tags=("news",))
+
+async def _wait_for_other_worker(key: str, since: float) -> list[NewsItem]:
+    """Inny worker buduje ten klucz — czekamy na jego wynik we wspólnym cache (maks. czas blokady)"""
+    while time.time() - since < _REFRESH_LEASE:
+        await asyncio.sleep(0.5)
+        rec = await _cached_news(key)
+        if rec and rec[0] >= since:
+            return rec[1]
+    rec = await _cached_news(key)
+    return rec[1] if rec else []
+
+async def _refresh_news(key: str) -> list[NewsItem]:
+    lock_key = f"{_NEWS_CACHE_PREFIX}lock:{key}"
+    started = time.time()
+    token = uuid.uuid4().hex  # właściciel blokady — zwalniamy tylko własną, nawet po jej wygaśnięciu
+    if not await cache.aadd(lock_key, token, ttl=_REFRESH_LEASE):
+        return await _wait_for_other_worker(key, started)
+    try:
+        http = get_http()
+        if key == ALL_NEWS_KEY:
+            data = await _build_all_books_news(http, _PREFETCH_MAX_RESULTS)
         else:
-            # 🚀 Ograniczenie równoległych zapytań
-            semaphore = asyncio.Semaphore(max_concurrent)
-            async def limited_get_for(single_q: str):
-                async with semaphore:
-                    return await get_for(single_q)
-            
-            pairs = await asyncio.gather(*[limited_get_for(s) for s in queries])
-            result = {k: v for k, v in pairs}
-            
-            # 🚀 Cache wyników
-            async with _MULTI_NEWS_CACHE_LOCK:
-                _MULTI_NEWS_CACHE[cache_key] = (time.time(), result)
-            return result
+            data = await _build_news_for_query(http, key, _PREFETCH_MAX_RESULTS)
+        await _store_news(key, time.time(), data)
+    finally:
+        await cache.arelease(lock_key, token)
+    try:
+        # 💾 trwały magazyn artykułów (news_items) — przeżywa restart i wygaśnięcie cache
+        await db_executor.run(news_store.upsert_news, key, data)
+    except Exception as e:
+        print(f"❌ Zapis newsów '{key}' do bazy nieudany: {e!r}")
+    return data
+
+def schedule_news_refresh(key: str, capped: bool = True) -> asyncio.Task | None:
+    """
+    Uruchamia (lub zwraca trwające) odświeżenie klucza w tle. None, gdy trwa już MAX_NEWS_REFRESHES
+    odświeżeń (capped=False — prefetcher ze stałą listą kluczy — limitu nie sprawdza).
+    """
+    task = _REFRESH_TASKS.get(key)
+    if task is None or task.done():
+        if capped and len(_REFRESH_TASKS) >= MAX_NEWS_REFRESHES:
+            return None
+        task = asyncio.create_task(_refresh_news(key))
+        _REFRESH_TASKS[key] = task
+        task.add_done_callback(lambda t, k=key: _refresh_done(k, t))
+    return task
+
+def _refresh_done(key: str, task: asyncio.Task) -> None:
+    if _REFRESH_TASKS.get(key) is task:
+        del _REFRESH_TASKS[key]
+    # zadania z żądań nie są awaitowane — błąd trafia do logu, a nie do "Task exception was never retrieved"
+    if not task.cancelled() and task.exception() is not None:
+        print(f"❌ Odświeżenie newsów '{key}' nieudane: {task.exception()!r}")
+
+def _load_stored_news(key: str) -> tuple[float, list[NewsItem]] | None:
+    items, _ = news_store.read_news_page(key, _PREFETCH_MAX_RESULTS)
+    ts = news_store.latest_fetch(key)
+    if not items or ts is None:
+        return None
+    return ts, [NewsItem(**d) for d in items]
+
+async def warm_news_cache(keys: list[str]) -> None:
+    """Po restarcie wypełnia cache newsów z bazy (z oryginalnym czasem pobrania, więc TTL działa dalej)"""
+    for key in keys:
+        if await _cached_news(key) is not None:
+            continue
+        try:
+            rec = await db_executor.run(_load_stored_news, key)
+        except Exception as e:
+            print(f"❌ Odczyt newsów '{key}' z bazy nieudany: {e!r}")
+            continue
+        if rec:
+            await _store_news(key, *rec)
+
+async def news_age(key: str) -> float | None:
+    """Wiek (s) wpisu w cache albo None — prefetch pomija klucze świeżo zbudowane przez inny worker"""
+    rec = await _cached_news(key)
+    return time.time() - rec[0] if rec else None
+
+async def _read_news(key: str, limit: int) -> list[NewsItem]:
+    """Zwraca prekomputowane newsy; brak/nieświeże -> odświeżenie w tle, nigdy sieć w żądaniu"""
+    cached = await _cached_news(key)
+    if not cached or time.time() - cached[0] >= _NEWS_CACHE_TTL:
+        schedule_news_refresh(key)
+    return cached[1][:limit] if cached else []
+
+# --- Endpoints ---
+@router.get("/news", response_model=list[NewsItem])
+async def news(response: Response,
+               q: str = Query(..., min_length=1),
+               max_results: int = Query(12, ge=1, le=_PREFETCH_MAX_RESULTS, description="Rozmiar strony (maks. 60)"),
+               cursor: Optional[str] = Query(None, description="Kursor z nagłówka X-Next-Cursor")):
+    """
+    Newsy z bazy (od najnowszych) z paginacją kursorem. Nieświeże odświeżamy w tle, żądanie nigdy
+    nie czeka na źródła: nowa fraza dostaje od razu pustą stronę z Retry-After (pobieranie trwa w tle),
+    a przy wyczerpanym limicie odświeżeń — 503.
+    """
+    key, limit = q.strip(), int(max_results)
+    cached = await _cached_news(key)
+    task = None
+    if not cached or time.time() - cached[0] >= _NEWS_CACHE_TTL:
+        task = schedule_news_refresh(key)
+    items, next_cursor = await db_executor.run(news_store.read_news_page, key, limit, cursor)
+    if not items and not cursor:
+        if cached:
+            return cached[1][:limit]  # nic jeszcze nie zapisano w bazie (błąd zapisu) — to, co jest w pamięci
+        if task is None:
+            raise HTTPException(503, "Zbyt wiele odświeżeń newsów naraz — spróbuj za chwilę",
+                                headers={"Retry-After": "5"})
+        response.headers["Retry-After"] = str(_COLD_RETRY_AFTER)
+        return []
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+@router.get("/news/multi", response_model=dict[str, list[NewsItem]])
+async def news_multi(q: str = Query(..., description="Lista zapytań rozdzielona przecinkami"),
+                     limit_each: int = 4):
+    queries = [s.strip() for s in q.split(",") if s.strip()]
+    if not queries: return {}
+    
+    # Jeśli "wszystkie" jest w zapytaniach, użyj RSS feeds
+    if ALL_NEWS_KEY in queries:
+        return {ALL_NEWS_KEY: await _read_news(ALL_NEWS_KEY, int(limit_each))}
+    return {single_q: await _read_news(single_q, int(limit_each)) for single_q in queries}
+
+@router.get("/news/multi/stream")
+async def news_multi_stream(q: str = Query(..., description="Lista zapytań rozdzielona przecinkami"),
+                            limit_each: int = 4,
+                            deadline: float = Query(8.0, gt=0, le=30, description="Łączny limit czasu (s)")):
+    """
+    NDJSON: jedna linia {"university": ..., "items": [...]} na zapytanie.
+    Klucze z cache idą od razu, pozostałe w kolejności ukończenia, aż do `deadline`.
+    """
+    queries = [s.strip() for s in q.split(",") if s.strip()]
+    keys = [ALL_NEWS_KEY] if ALL_NEWS_KEY in queries else list(dict.fromkeys(queries))
+
+    def line(key: str, items: list[NewsItem], **extra) -> str:
+        payload = {"university": key, "items": [n.model_dump(mode="json") for n in items], **extra}
+        return json.dumps(payload, ensure_ascii=False) + "\n"
+
+    async def gen():
+        loop = asyncio.get_running_loop()
+        end = loop.time() + deadline
+        pending: dict[asyncio.Task, str] = {}
+        for key in keys:
+            if await _cached_news(key) is not None:
+                yield line(key, await _read_news(key, int(limit_each)))
+            elif (task := schedule_news_refresh(key)) is not None:
+                pending[task] = key
+            else:
+                yield line(key, [], busy=True)  # limit równoległych odświeżeń — klient może ponowić
+
+        while pending:
+            remaining = end - loop.time()
+            if remaining <= 0:
+                break
+            # asyncio.wait nie anuluje zadań — odświeżenia dokończą się w tle mimo timeoutu
+            done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                key = pending.pop(task)
+                try:
+                    items = task.result()[:int(limit_each)]
+                except Exception:
+                    items = []
+                yield line(key, items)
+
+        for key in pending.values():
+            yield line(key, [], timed_out=True)
+
+    return StreamingResponse(gen(), media_type="application/x-ndjson")
@@ -1,121 +1,138 @@
 # app/routes/routes_rankings.py
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from sqlalchemy import func, or_, cast, Numeric
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional, Dict
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
-import time
+from concurrent.futures import as_completed
 import hashlib
 from app.db.database import SessionLocal
 from app.db.database import get_db
 from app import models, schemas
-from .routes_books import _enrich_with_ratings, _persist_book
+from .routes_books import _enrich_with_ratings
 from app.services.book_cache import get_cached_books
+from app.core.executor import db_executor
+from app.core.cache import cache
 
 router = APIRouter(prefix="/rankings", tags=["rankings"])
 
-# 🚀 Cache dla wyników rankingów (5 minut TTL)
-_RANKINGS_CACHE = {}
-_RANKINGS_CACHE_LOCK = Lock()
+# 🚀 Cache dla wyników rankingów (5 minut TTL) — wspólny cache, tag czyszczony po zmianie recenzji/książek
+_RANKINGS_CACHE_PREFIX = "rankings:"
+_RANKINGS_CACHE_TAG = "rankings"  # routes_books.invalidate_rankings_cache
 _RANKINGS_CACHE_TTL = 300  # 5 minut
 
-# ✅ zoptymalizowana funkcja do batch enrichment
-def _enrich_books_batch(db: Session, books: List[dict]) -> List[dict]:
-    """Wzbogaca listę książek o oceny w jednym zapytaniu batch"""
-    if not books:
-        return books
-    
-    # Pobierz tylko książki z ID
-    books_with_id = [b for b in books if b.get("id")]
-    if not books_with_id:
-        return books
-    
-    book_ids = [b["id"] for b in books_with_id]
-    
-    # Jedno zapytanie dla wszystkich ocen
-    ratings_data = (
-        db.query(
-            models.book.Review.book_id,
-            func.avg(models.book.Review.rating).label("avg_rating"),
-            func.count(models.book.Review.id).label("reviews_count")
-        )
-        .filter(models.book.Review.book_id.in_(book_ids))
-        .group_by(models.book.Review.book_id)
-        .all()
-    )
-    
-    # Stwórz mapę book_id -> (avg_rating, reviews_count)
-    ratings_map = {
-        row.book_id: (round(row.avg_rating, 1), row.reviews_count)
-        for row in ratings_data
+def _persist_cached_books(db: Session, uni: str) -> Dict[str, dict]:
+    """Dopisuje brakujące książki z cache Google Books do tabeli books (batch) i zwraca mapę google_id -> dane z cache"""
+    cached = get_cached_books(db, uni) or []
+    by_gid: Dict[str, dict] = {}
+    for b in cached:
+        if b.get("google_id") and b.get("thumbnail") and b.get("authors"):
+            by_gid.setdefault(b["google_id"], b)
+    if not by_gid:
+        return by_gid
+
+    Book = models.book.Book
+    existing = {
+        gid for (gid,) in db.query(Book.google_id).filter(Book.google_id.in_(list(by_gid))).all()
     }
-    
-    # Wzbogać książki
-    for book in books:
-        if book.get("id") and book["id"] in ratings_map:
-            avg_rating, reviews_count = ratings_map[book["id"]]
-            book["avg_rating"] = avg_rating
-            book["reviews_count"] = reviews_count
-        else:
-            book["avg_rating"] = 0.0
-            book["reviews_count"] = 0
-    
-    return books
+    missing = [b for gid, b in by_gid.items() if gid not in existing]
+    if missing:
+        db.add_all([
+            Book(
+                google_id=b.get("google_id"),
+                title=b.get("title"),
+                authors=b.get("authors"),
+                publisher=None,
+                published_date=b.get("published_date"),
+                thumbnail=b.get("thumbnail"),
+                categories=b.get("categories"),
+                description=b.get("description"),
+                available_copies=1,
+            )
+            for b in missing
+        ])
+        try:
+            db.commit()
+        except IntegrityError:
+            # równoległe żądanie zdążyło zapisać te same google_id
+            db.rollback()
+    return by_gid
+
+
+def _query_uni_rankings(db: Session, uni: str, min_stars: float, max_stars: float,
+                        sort_by: str, order: str, limit: int,
+                        year: Optional[int], categories: Optional[List[str]]) -> List[dict]:
+    """Ranking jednej uczelni jednym zapytaniem SQL (WHERE + HAVING + ORDER BY + LIMIT)"""
+    Book, Review = models.book.Book, models.book.Review
+    cached_by_gid = _persist_cached_books(db, uni)
+
+    # ta sama semantyka co wcześniej: średnia zaokrąglona do 0.1, brak recenzji = 0
+    avg_expr = func.round(cast(func.coalesce(func.avg(Review.rating), 0), Numeric), 1)
+    count_expr = func.count(Review.id)
+
+    scope = Book.university == uni
+    if cached_by_gid:
+        scope = or_(scope, Book.google_id.in_(list(cached_by_gid)))
+
+    q = (
+        db.query(Book, avg_expr.label("avg_rating"), count_expr.label("reviews_count"))
+        .outerjoin(Review, Review.book_id == Book.id)
+        .filter(scope)
+    )
+    if year:
+        q = q.filter(Book.published_date.startswith(str(year), autoescape=True))
+    if categories and "Wszystkie" not in categories:
+        q = q.filter(or_(*[Book.categories.icontains(c, autoescape=True) for c in categories]))
+
+    q = (
+        q.group_by(Book.id)
+        .having(avg_expr >= min_stars)
+        .having(avg_expr <= max_stars)
+    )
+
+    # 🔹 sortowanie SQL
+    if sort_by == "avg_rating":
+        sort_expr = avg_expr
+    elif sort_by == "reviews_count":
+        sort_expr = count_expr
+    else:
+        sort_expr = Book.title
+    q = q.order_by(sort_expr.desc() if order == "desc" else sort_expr.asc(), Book.id.asc())
+
+    out = []
+    for book, avg_rating, reviews_count in q.limit(limit).all():
+        extra = cached_by_gid.get(book.google_id) or {}
+        out.append({
+            "id": book.id,
+            "google_id": book.google_id,
+            "title": book.title,
+            "authors": book.authors,
+            "publisher": book.publisher,
+            "published_date": book.published_date,
+            "thumbnail": book.thumbnail,
+            "categories": book.categories,
+            "description": book.description,
+            "available_copies": book.available_copies,
+            "created_by": book.created_by,
+            "language": extra.get("language"),
+            "page_count": extra.get("page_count"),
+            "isbn": extra.get("isbn"),
+            "avg_rating": float(avg_rating or 0),
+            "reviews_count": reviews_count or 0,
+        })
+    return out
+
 
 def _process_university_rankings(uni: str, min_stars: float, max_stars: float, 
                                 sort_by: str, order: str, limit_each: int, 
                                 year: Optional[int], categories: Optional[List[str]]) -> tuple[str, List[dict]]:
-    """Przetwarza rankingi dla jednej uczelni - do użycia w ThreadPoolExecutor"""
+    """Przetwarza rankingi dla jednej uczelni - do użycia we współdzielonym db_executor"""
     # Tworzymy nową sesję dla tego wątku
     db = SessionLocal()
     try:
-        # 🔹 lokalne książki
-        local_books = (
-            db.query(models.book.Book)
-            .filter(models.book.Book.university == uni)
-            .all()
+        return uni, _query_uni_rankings(
+            db, uni, min_stars, max_stars, sort_by, order, limit_each, year, categories
         )
-        local_books = [b.__dict__ for b in local_books]
-
-        # 🔹 cache Google Books
-        cached = get_cached_books(db, uni) or []
-        persisted = [
-            _persist_book(db, b)
-            for b in cached
-            if b.get("thumbnail") and b.get("authors")
-        ]
-
-        # 🔹 scal lokalne i z Google
-        all_books = local_books + persisted
-        
-        # 🔹 batch enrichment - jedno zapytanie dla wszystkich książek tej uczelni
-        all_books = _enrich_books_batch(db, all_books)
-
-        # 🔹 filtry
-        if year:
-            all_books = [b for b in all_books if (b.get("published_date") or "").startswith(str(year))]
-        if categories and "Wszystkie" not in categories:
-            all_books = [
-                b for b in all_books
-                if any(c.lower() in (b.get("categories") or "").lower() for c in categories)
-            ]
-        all_books = [
-            b for b in all_books
-            if min_stars <= (b.get("avg_rating") or 0) <= max_stars
-        ]
-
-        # 🔹 sortowanie
-        reverse = order == "desc"
-        if sort_by == "avg_rating":
-            all_books.sort(key=lambda b: b.get("avg_rating") or 0, reverse=reverse)
-        elif sort_by == "reviews_count":
-            all_books.sort(key=lambda b: b.get("reviews_count") or 0, reverse=reverse)
-        else:
-            all_books.sort(key=lambda b: b.get("title") or "", reverse=reverse)
-
-        return uni, all_books[:limit_each]
-    
     finally:
         db.close()
 
@@ -133,48 +150,10 @@ def list_rankings(
 ):
     # 🔹 Tryb 1: konkretna uczelnia
     if uni and uni.lower() != "wszystkie":
-        # lokalne książki
-        local_books = (
-            db.query(models.book.Book)
-            .filter(models.book.Book.university == uni)
-            .all()
+        books = _query_uni_rankings(
+            db, uni, min_stars, max_stars, sort_by, order, limit, year, categories
         )
-        local_books = [_enrich_with_ratings(db, b.__dict__) for b in local_books]
-
-        # cache Google Books
-        cached = get_cached_books(db, uni) or []
-        persisted = [
-            _persist_book(db, b)
-            for b in cached
-            if b.get("thumbnail") and b.get("authors")
-        ]
-        enriched_cached = [_enrich_with_ratings(db, b) for b in persisted]
-
-        books = local_books + enriched_cached
-
-        # filtry
-        if year:
-            books = [b for b in books if (b.get("published_date") or "").startswith(str(year))]
-        if categories and "Wszystkie" not in categories:
-            books = [
-                b for b in books
-                if any(c.lower() in (b.get("categories") or "").lower() for c in categories)
-            ]
-        books = [
-            b for b in books
-            if min_stars <= (b.get("avg_rating") or 0) <= max_stars
-        ]
-
-        # sortowanie
-        reverse = order == "desc"
-        if sort_by == "avg_rating":
-            books.sort(key=lambda b: b.get("avg_rating") or 0, reverse=reverse)
-        elif sort_by == "reviews_count":
-            books.sort(key=lambda b: b.get("reviews_count") or 0, reverse=reverse)
-        else:
-            books.sort(key=lambda b: b.get("title") or "", reverse=reverse)
-
-        return [schemas.book.BookOut(**b) for b in books[:limit]]
+        return [schemas.book.BookOut(**b) for b in books]
 
     # 🔹 Tryb 2: wszystkie uczelnie
     q = (
@@ -186,9 +165,9 @@ def list_rankings(
     )
 
     if year:
-        q = q.filter(models.book.Book.published_date.like(f"{year}%"))
+        q = q.filter(models.book.Book.published_date.startswith(str(year), autoescape=True))
     if categories and "Wszystkie" not in categories:
-        q = q.filter(or_(*[models.book.Book.categories.ilike(f"%{c}%") for c in categories]))
+        q = q.filter(or_(*[models.book.Book.categories.icontains(c, autoescape=True) for c in categories]))
 
     # sortowanie SQL
     if sort_by == "avg_rating":
@@ -224,48 +203,43 @@ def rankings_multi(
         f"{sorted(q)}_{min_stars}_{max_stars}_{sort_by}_{order}_{limit_each}_{year}_{sorted(categories or [])}".encode()
     ).hexdigest()
     
-    now = time.time()
-    with _RANKINGS_CACHE_LOCK:
-        cached = _RANKINGS_CACHE.get(cache_key)
-        if cached and (now - cached[0] < _RANKINGS_CACHE_TTL):
-            return cached[1]
+    cached = cache.get(_RANKINGS_CACHE_PREFIX + cache_key)
+    if cached is not None:
+        return cached
     
     results: Dict[str, List[schemas.book.BookOut]] = {}
     seen_global = set()  # 🔹 globalny set dla wszystkich uczelni
     
-    # 🚀 Równoległe przetwarzanie uczelni
-    with ThreadPoolExecutor(max_workers=min(8, len(q))) as executor:
-        # Uruchom zadania dla wszystkich uczelni równolegle
-        future_to_uni = {
-            executor.submit(
-                _process_university_rankings, 
-                uni, min_stars, max_stars, sort_by, order, limit_each, year, categories
-            ): uni for uni in q
-        }
-        
-        # Zbierz wyniki w miarę ich gotowości
-        for future in as_completed(future_to_uni):
-            try:
-                uni, books = future.result()
-                
-                # 🔹 deduplikacja globalna (thread-safe)
-                deduped = []
-                for b in books:
-                    key = b.get("google_id") or b.get("isbn") or b.get("title")
-                    if key in seen_global:
-                        continue
-                    seen_global.add(key)
-                    deduped.append(b)
-                
-                results[uni] = [schemas.book.BookOut(**b) for b in deduped]
-                
-            except Exception as e:
-                print(f"❌ Błąd przetwarzania uczelni '{future_to_uni[future]}': {e}")
-                # W przypadku błędu, dodaj pustą listę
-                results[future_to_uni[future]] = []
+    # 🚀 Równoległe przetwarzanie uczelni we współdzielonej puli (limit = rozmiar puli DB)
+    future_to_uni = {
+        db_executor.submit(
+            _process_university_rankings, 
+            uni, min_stars, max_stars, sort_by, order, limit_each, year, categories
+        ): uni for uni in q
+    }
+    
+    # Zbierz wyniki w miarę ich gotowości
+    for future in as_completed(future_to_uni):
+        try:
+            uni, books = future.result()
+            
+            # 🔹 deduplikacja globalna (thread-safe)
+            deduped = []
+            for b in books:
+                key = b.get("google_id") or b.get("isbn") or b.get("title")
+                if key in seen_global:
+                    continue
+                seen_global.add(key)
+                deduped.append(b)
+            
+            results[uni] = [schemas.book.BookOut(**b) for b in deduped]
+            
+        except Exception as e:
+            print(f"❌ Błąd przetwarzania uczelni '{future_to_uni[future]}': {e}")
+            # W przypadku błędu, dodaj pustą listę
+            results[future_to_uni[future]] = []
 
     # 🚀 Cache wyników
-    with _RANKINGS_CACHE_LOCK:
-        _RANKINGS_CACHE[cache_key] = (now, results)
+    cache.set(_RANKINGS_CACHE_PREFIX + cache_key, results, ttl=_RANKINGS_CACHE_TTL, tags=(_RANKINGS_CACHE_TAG,))
     
     return results
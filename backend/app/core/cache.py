@@ -0,0 +1,325 @@
+# app/core/cache.py
+"""
+Wspólny cache klucz -> wartość z TTL i tagami.
+
+Backendy (zmienna CACHE_BACKEND):
+  - "memory" (domyślnie): LRU w pamięci procesu — jeden worker, zero zależności
+  - "sqlite": plik SQLite w trybie WAL (CACHE_PATH) — współdzielony przez wszystkie
+    workery uvicorna na tej samej maszynie, wartości serializowane pickle
+"""
+from __future__ import annotations
+import os, pickle, sqlite3, threading, time
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from . import metrics
+
+
+class MemoryCache:
+    """LRU w pamięci procesu"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        # klucz -> (wygasa, wartość, tagi)
+        self._data: "OrderedDict[str, tuple[float, Any, tuple[str, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            rec = self._data.get(key)
+            if rec is None:
+                return None
+            if rec[0] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return rec[1]
+
+    def set(self, key: str, value: Any, ttl: float, tags: Iterable[str] = ()) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value, tuple(tags))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key: str, value: Any, ttl: float) -> bool:
+        """Zapis tylko gdy klucza brak (albo wygasł) — prosta blokada między żądaniami"""
+        with self._lock:
+            rec = self._data.get(key)
+            if rec is not None and rec[0] > time.time():
+                return False
+            self._data[key] = (time.time() + ttl, value, ())
+            return True
+
+    def release(self, key: str, token: Any) -> bool:
+        """Usuwa blokadę z add() tylko, gdy nadal należy do nas (ta sama wartość)"""
+        with self._lock:
+            rec = self._data.get(key)
+            if rec is None or rec[1] != token:
+                return False
+            del self._data[key]
+            return True
+
+    def incr(self, key: str, ttl: float) -> int:
+        with self._lock:
+            rec = self._data.get(key)
+            prev = rec[1] if rec is not None and rec[0] > time.time() else 0
+            value = (prev if isinstance(prev, int) else 0) + 1
+            self._data[key] = (time.time() + ttl, value, ())
+            self._data.move_to_end(key)
+            return value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_tag(self, tag: str) -> int:
+        with self._lock:
+            keys = [k for k, rec in self._data.items() if tag in rec[2]]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            keys = [k for k, rec in self._data.items() if rec[0] <= now]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteCache:
+    """Plik SQLite (WAL) współdzielony przez procesy; jedno połączenie na wątek"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as c:
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            c.execute("CREATE INDEX IF NOT EXISTS ix_cache_expires ON cache(expires_at)")
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS cache_tags ("
+                " tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # "with conn" niżej = commit (albo rollback) na każdą operację
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Any | None:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            return pickle.loads(row[0])
+        except Exception:
+            return None
+
+    def set(self, key: str, value: Any, ttl: float, tags: Iterable[str] = ()) -> None:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._conn() as c:
+            c.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, blob, time.time() + ttl),
+            )
+            c.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+            c.executemany("INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)", [(t, key) for t in tags])
+
+    def add(self, key: str, value: Any, ttl: float) -> bool:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._conn() as c:
+            c.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, now))
+            cur = c.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, blob, now + ttl),
+            )
+            return cur.rowcount == 1
+
+    def release(self, key: str, token: Any) -> bool:
+        blob = pickle.dumps(token, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._conn() as c:
+            return c.execute("DELETE FROM cache WHERE key = ? AND value = ?", (key, blob)).rowcount == 1
+
+    def incr(self, key: str, ttl: float) -> int:
+        now = time.time()
+        with self._conn() as c:
+            c.execute("BEGIN IMMEDIATE")  # odczyt i zapis w jednej transakcji z blokadą zapisu — atomowo między procesami
+            row = c.execute("SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            try:
+                prev = pickle.loads(row[0]) if row else 0
+            except Exception:
+                prev = 0
+            value = (prev if isinstance(prev, int) else 0) + 1
+            c.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now + ttl),
+            )
+            return value
+
+    def delete(self, key: str) -> None:
+        with self._conn() as c:
+            c.execute("DELETE FROM cache WHERE key = ?", (key,))
+            c.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+
+    def delete_tag(self, tag: str) -> int:
+        with self._conn() as c:
+            cur = c.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache_tags WHERE tag = ?)", (tag,))
+            c.execute(
+                "DELETE FROM cache_tags WHERE key IN (SELECT key FROM cache_tags WHERE tag = ?)", (tag,)
+            )
+            return cur.rowcount
+
+    def purge_expired(self) -> int:
+        with self._conn() as c:
+            cur = c.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            c.execute("DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache)")
+            return cur.rowcount
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class Cache:
+    """Fasada nad backendem: liczniki trafień, a błędy backendu nie wychodzą poza cache"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "errors": 0}
+
+    def _bump(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            # cache nigdy nie może położyć żądania — brak wpisu zamiast błędu
+            self._bump("errors")
+            print(f"❌ Cache get '{key}': {e!r}")
+            return default
+        self._bump("misses" if value is None else "hits")
+        return default if value is None else value
+
+    def set(self, key: str, value: Any, ttl: float, tags: Iterable[str] = ()) -> None:
+        try:
+            self.backend.set(key, value, ttl, tags)
+            self._bump("sets")
+        except Exception as e:
+            self._bump("errors")
+            print(f"❌ Cache set '{key}': {e!r}")
+
+    def add(self, key: str, value: Any, ttl: float) -> bool:
+        try:
+            return self.backend.add(key, value, ttl)
+        except Exception as e:
+            self._bump("errors")
+            print(f"❌ Cache add '{key}': {e!r}")
+            return True  # bez blokady lepiej zrobić pracę dwa razy niż wcale
+
+    def release(self, key: str, token: Any) -> bool:
+        try:
+            return self.backend.release(key, token)
+        except Exception as e:
+            self._bump("errors")
+            print(f"❌ Cache release '{key}': {e!r}")
+            return False
+
+    def incr(self, key: str, ttl: float) -> int:
+        """Atomowy licznik (+1); TTL liczony od ostatniego zwiększenia"""
+        try:
+            return self.backend.incr(key, ttl)
+        except Exception as e:
+            self._bump("errors")
+            print(f"❌ Cache incr '{key}': {e!r}")
+            return 0
+
+    def delete(self, key: str) -> None:
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            self._bump("errors")
+            print(f"❌ Cache delete '{key}': {e!r}")
+
+    def delete_tag(self, tag: str) -> int:
+        try:
+            return self.backend.delete_tag(tag)
+        except Exception as e:
+            self._bump("errors")
+            print(f"❌ Cache delete_tag '{tag}': {e!r}")
+            return 0
+
+    def purge_expired(self) -> int:
+        try:
+            return self.backend.purge_expired()
+        except Exception as e:
+            self._bump("errors")
+            print(f"❌ Cache purge: {e!r}")
+            return 0
+
+    # --- wersje dla kodu async: backend z plikiem (SQLite, busy timeout 5 s) nie blokuje event loopa ---
+    async def _off_loop(self, fn, *args) -> Any:
+        if isinstance(self.backend, MemoryCache):
+            return fn(*args)  # dict w pamięci — szybciej wprost niż przez pulę
+        from .executor import io_executor
+        return await io_executor.run(fn, *args)
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        return await self._off_loop(self.get, key, default)
+
+    async def aset(self, key: str, value: Any, ttl: float, tags: Iterable[str] = ()) -> None:
+        await self._off_loop(self.set, key, value, ttl, tags)
+
+    async def aadd(self, key: str, value: Any, ttl: float) -> bool:
+        return await self._off_loop(self.add, key, value, ttl)
+
+    async def arelease(self, key: str, token: Any) -> bool:
+        return await self._off_loop(self.release, key, token)
+
+    async def adelete(self, key: str) -> None:
+        await self._off_loop(self.delete, key)
+
+    async def apurge_expired(self) -> int:
+        return await self._off_loop(self.purge_expired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {"backend": self.backend.name, **self._stats}
+        try:
+            out["size"] = self.backend.size()
+        except Exception:
+            pass
+        return out
+
+
+def _make_backend():
+    kind = os.getenv("CACHE_BACKEND", "memory").lower()
+    if kind == "sqlite":
+        return SQLiteCache(os.getenv("CACHE_PATH", "cache.sqlite3"))
+    return MemoryCache(int(os.getenv("CACHE_MAX_ENTRIES", "10000")))
+
+# 🗄️ Jeden cache na proces; przy CACHE_BACKEND=sqlite wspólny dla wszystkich workerów
+cache = Cache(_make_backend())
+metrics.register("cache", cache.stats)
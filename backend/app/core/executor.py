@@ -0,0 +1,128 @@
+# app/core/executor.py
+from __future__ import annotations
+import asyncio, os, time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Callable
+
+from ..db.database import engine
+from . import metrics
+
+
+class BoundedExecutor:
+    """Współdzielona (na czas życia aplikacji) pula wątków ze stałym limitem i metrykami kolejki."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        metrics.register(name, self.stats)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            return self._pool
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        enqueued = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+
+        def run():
+            waited = time.perf_counter() - enqueued
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+        fut = self._get_pool().submit(run)
+        fut.add_done_callback(self._on_done)
+        return fut
+
+    def _on_done(self, fut: Future) -> None:
+        # anulowane w kolejce: run() nigdy nie wystartuje, więc licznik kolejki zwalniamy tutaj
+        if fut.cancelled():
+            with self._lock:
+                self._queued -= 1
+                self._cancelled += 1
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Wersja async: event loop tylko czeka na wynik z puli"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "cancelled": self._cancelled,
+                "avg_queue_wait_ms": round(1000 * self._wait_total / done, 2) if done else 0.0,
+                "max_queue_wait_ms": round(1000 * self._wait_max, 2),
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _db_workers() -> int:
+    # Limit = rozmiar puli połączeń (bez overflow, który zostaje dla sesji per-request)
+    env = os.getenv("DB_EXECUTOR_WORKERS")
+    if env:
+        return int(env)
+    size = getattr(engine.pool, "size", None)
+    return size() if callable(size) else 5
+
+def _io_workers() -> int:
+    env = os.getenv("IO_EXECUTOR_WORKERS")
+    if env:
+        return int(env)
+    return 8
+
+def _parse_workers() -> int:
+    env = os.getenv("PARSE_EXECUTOR_WORKERS")
+    if env:
+        return int(env)
+    return min(4, os.cpu_count() or 1)
+
+# 🚀 Jedna pula dla równoległej pracy per uczelnia (rankings/multi, books/multi)
+db_executor = BoundedExecutor("db_executor", _db_workers())
+
+# 🚀 Pula dla blokujących wywołań sieciowych (np. Google Books) — nie zajmują slotów db_executor
+io_executor = BoundedExecutor("io_executor", _io_workers())
+
+# 🚀 Pula dla parsowania CPU (feedparser, HTML/OG) — poza event loopem
+parse_executor = BoundedExecutor("parse_executor", _parse_workers())
+
+def shutdown_executors() -> None:
+    db_executor.shutdown()
+    io_executor.shutdown()
+    parse_executor.shutdown()
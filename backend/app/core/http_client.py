@@ -1,24 +1,275 @@
 # app/http_client.py
 from __future__ import annotations
+import asyncio, os, time
+from collections import OrderedDict
+from dataclasses import dataclass
+
 import httpx, certifi
 
+from . import metrics, http_metrics
+
+# ── Limity per host (na wspólnym kliencie jeden wolny/padnięty serwis nie zajmie wszystkich połączeń)
+HTTP_MAX_CONNECTIONS = 50
+HOST_MAX_CONCURRENCY = int(os.getenv("HTTP_HOST_MAX_CONCURRENCY", "6"))
+HOST_TIMEOUT_BUDGET = float(os.getenv("HTTP_HOST_TIMEOUT", "7.0"))  # górny limit connect/read/write/pool
+
+# ── Circuit breaker: po tylu kolejnych błędach host jest odcinany na CIRCUIT_COOLDOWN sekund
+CIRCUIT_FAILURES = int(os.getenv("HTTP_CIRCUIT_FAILURES", "5"))
+CIRCUIT_COOLDOWN = float(os.getenv("HTTP_CIRCUIT_COOLDOWN", "30"))
+
+# stan per host (semafor + breaker) dla najwyżej tylu hostów — hosty OG / obrazków są dowolne
+HOST_STATE_MAX = int(os.getenv("HTTP_HOST_STATE_MAX", "256"))
+
+# hosty z problematycznym TLS — krótszy budżet, żeby nie blokowały importu wydarzeń
+BAD_TLS_HOSTS = {"krakow.ast.krakow.pl", "www.ast.krakow.pl"}
+
+@dataclass(frozen=True)
+class HostPolicy:
+    max_concurrency: int = HOST_MAX_CONCURRENCY
+    timeout: float = HOST_TIMEOUT_BUDGET
+
+_DEFAULT_POLICY = HostPolicy()
+
+HOST_POLICIES: dict[str, HostPolicy] = {
+    # wszystkie zapytania newsów uczelni idą do jednego hosta
+    "news.google.com": HostPolicy(max_concurrency=16, timeout=7.0),
+    "icons.duckduckgo.com": HostPolicy(max_concurrency=8, timeout=4.0),
+    **{h: HostPolicy(max_concurrency=2, timeout=4.0) for h in BAD_TLS_HOSTS},
+}
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Host odcięty przez circuit breaker — zapytanie nie wychodzi w sieć"""
+
+
+class _HostState:
+    def __init__(self, policy: HostPolicy):
+        self.policy = policy
+        self.semaphore = asyncio.Semaphore(policy.max_concurrency)
+        self.in_flight = 0
+        self.failures = 0          # kolejne błędy (reset po sukcesie)
+        self.open_until = 0.0      # > teraz = obwód otwarty
+        self.probing = False       # po cooldownie przepuszczamy jedno zapytanie próbne
+        self.rejected = 0
+        self.trips = 0
+
+    def admit(self, now: float) -> bool:
+        if self.failures < CIRCUIT_FAILURES:
+            return True
+        if now < self.open_until or self.probing:
+            self.rejected += 1
+            return False
+        self.probing = True  # half-open
+        return True
+
+    def record(self, ok: bool | None) -> None:
+        self.probing = False
+        if ok is None:
+            return
+        if ok:
+            self.failures = 0
+            self.open_until = 0.0
+            return
+        self.failures += 1
+        if self.failures >= CIRCUIT_FAILURES:
+            if self.open_until <= time.time():
+                self.trips += 1
+            self.open_until = time.time() + CIRCUIT_COOLDOWN
+
+    def idle(self, now: float) -> bool:
+        """Nic w locie i obwód zamknięty — usunięcie stanu niczego nie gubi"""
+        return self.in_flight == 0 and not self.probing and now >= self.open_until
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        return {
+            "in_flight": self.in_flight,
+            "limit": self.policy.max_concurrency,
+            "failures": self.failures,
+            "circuit": "open" if now < self.open_until else ("half_open" if self.probing else "closed"),
+            "rejected": self.rejected,
+            "trips": self.trips,
+        }
+
+
+class _GuardedStream(httpx.AsyncByteStream):
+    """Trzyma slot hosta do końca czytania body; błąd w trakcie czytania liczy się jako porażka"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, host: str, on_close):
+        self._stream = stream
+        self._host = host
+        self._on_close = on_close
+        self._failed = False
+        self._closed = False
+
+    async def __aiter__(self):
+        n = 0
+        try:
+            async for chunk in self._stream:
+                n += len(chunk)
+                yield chunk
+        except Exception as e:
+            self._failed = True
+            if isinstance(e, httpx.TimeoutException):
+                http_metrics.record_error(self._host, timeout=True)
+            raise
+        finally:
+            http_metrics.record_bytes(self._host, n)
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self._stream.aclose()
+        finally:
+            self._on_close(self._failed)
+
+
+class HostAwareTransport(httpx.AsyncBaseTransport):
+    """Transport z limitem współbieżności i budżetem czasu per host oraz circuit breakerem"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+        self._hosts: OrderedDict[str, _HostState] = OrderedDict()  # LRU, najdłużej nieużywany pierwszy
+
+    def _state(self, host: str) -> _HostState:
+        st = self._hosts.get(host)
+        if st is not None:
+            self._hosts.move_to_end(host)
+            return st
+        st = self._hosts[host] = _HostState(HOST_POLICIES.get(host, _DEFAULT_POLICY))
+        if len(self._hosts) > HOST_STATE_MAX:
+            self._evict_idle(keep=host)
+        return st
+
+    def _evict_idle(self, keep: str) -> None:
+        # tylko bezczynne hosty z zamkniętym obwodem; zajęte / odcięte zostają (limit chwilowo przekroczony)
+        now = time.time()
+        for host, st in list(self._hosts.items()):
+            if len(self._hosts) <= HOST_STATE_MAX:
+                break
+            if host != keep and st.idle(now):
+                del self._hosts[host]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = (request.url.host or "").lower()
+        st = self._state(host)
+        if not st.admit(time.time()):
+            raise CircuitOpenError(f"Circuit open for {host}", request=request)
+        probe = st.probing
+
+        # budżet hosta obcina timeouty ustawione na kliencie / w wywołaniu
+        budget = st.policy.timeout
+        timeouts = dict(request.extensions.get("timeout") or {})
+        for k in ("connect", "read", "write", "pool"):
+            v = timeouts.get(k)
+            timeouts[k] = budget if v is None else min(v, budget)
+        request.extensions = {**request.extensions, "timeout": timeouts}
+
+        waited = time.perf_counter()
+        try:
+            await asyncio.wait_for(st.semaphore.acquire(), timeouts["pool"])
+        except asyncio.TimeoutError:
+            if probe:
+                st.probing = False
+            http_metrics.record_error(host, timeout=True)
+            raise httpx.PoolTimeout(f"Per-host limit reached for {host}", request=request)
+        http_metrics.record_slot_wait(host, time.perf_counter() - waited)
+        self._trace_pool_wait(request, host)
+
+        st.in_flight += 1
+        released = False
+
+        def release(ok: bool | None) -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            st.in_flight -= 1
+            st.semaphore.release()
+            st.record(ok)
+
+        try:
+            response = await self._inner.handle_async_request(request)
+        except BaseException as e:
+            # anulowanie (np. deadline w /news/multi/stream) nie świadczy o stanie hosta
+            release(False if isinstance(e, Exception) else None)
+            if isinstance(e, Exception):
+                http_metrics.record_error(host, timeout=isinstance(e, httpx.TimeoutException))
+            raise
+
+        status_ok = response.status_code < 500 and response.status_code != 429
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_GuardedStream(response.stream, host, lambda failed: release(status_ok and not failed)),
+            extensions=response.extensions,
+        )
+
+    @staticmethod
+    def _trace_pool_wait(request: httpx.Request, host: str) -> None:
+        """Rozszerzenie "trace" httpcore: czas do pierwszego zdarzenia połączenia = czekanie na pulę"""
+        started = time.perf_counter()
+        previous = request.extensions.get("trace")
+        seen = False
+
+        async def trace(event: str, info: dict) -> None:
+            nonlocal seen
+            if not seen and event.endswith(("connect_tcp.started", "send_request_headers.started")):
+                seen = True
+                http_metrics.record_pool_wait(host, time.perf_counter() - started)
+            if previous is not None:
+                await previous(event, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+
+    def stats(self) -> dict:
+        return {host: st.snapshot() for host, st in list(self._hosts.items())}
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+# ── Event hooki: latencja do nagłówków odpowiedzi i klasy statusów (każdy hop przekierowania osobno)
+async def _on_request(request: httpx.Request) -> None:
+    request.extensions["metrics_started"] = time.perf_counter()
+
+async def _on_response(response: httpx.Response) -> None:
+    started = response.request.extensions.get("metrics_started")
+    if started is not None:
+        http_metrics.record_response((response.request.url.host or "").lower(), response.status_code,
+                                     time.perf_counter() - started)
+
+
 _client: httpx.AsyncClient | None = None
+_transport: HostAwareTransport | None = None
+
+def _stats() -> dict:
+    return _transport.stats() if _transport is not None else {}
+
+metrics.register("http_hosts", _stats)
 
 def get_http() -> httpx.AsyncClient:
     """Zwraca singleton AsyncClient; tworzy go przy pierwszym użyciu."""
-    global _client
+    global _client, _transport
     if _client is None:
+        _transport = HostAwareTransport(httpx.AsyncHTTPTransport(
+            verify=certifi.where(),
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=20),
+        ))
         _client = httpx.AsyncClient(
             timeout=httpx.Timeout(7.0),
             follow_redirects=True,
-            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
             headers={"User-Agent": "Mozilla/5.0 (NewsFetcher; +http://localhost)"},
-            verify=certifi.where(),
+            transport=_transport,
+            event_hooks={"request": [_on_request], "response": [_on_response]},
         )
     return _client
 
 async def close_http() -> None:
-    global _client
+    global _client, _transport
     if _client is not None:
         await _client.aclose()
         _client = None
+        _transport = None
@@ -0,0 +1,135 @@
+# app/core/http_metrics.py
+"""Metryki ruchu wychodzącego per host (httpx z get_http() + blokujące requests w google_books)."""
+from __future__ import annotations
+from threading import Lock
+
+from . import metrics
+
+# górne granice kubełków histogramu (ms); ostatni kubełek = powyżej
+_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+_TOP_HOSTS = 50  # w snapshot tylko hosty z największym łącznym czasem
+_MAX_HOSTS = 200  # śledzonych osobno; kolejne (np. dowolne hosty z OG) trafiają do wspólnego "other"
+OTHER_HOST = "other"
+
+
+class _HostStats:
+    __slots__ = ("requests", "errors", "timeouts", "status", "bytes_in", "hist", "latency_sum",
+                 "latency_max", "pool_wait_sum", "pool_wait_max", "pool_waits", "slot_wait_sum", "slot_waits")
+
+    def __init__(self):
+        self.requests = 0   # odpowiedzi (nagłówki) — błędy liczone osobno, bo timeout treści ma już odpowiedź
+        self.errors = 0
+        self.timeouts = 0
+        self.status = {"1xx": 0, "2xx": 0, "3xx": 0, "4xx": 0, "5xx": 0}
+        self.bytes_in = 0
+        self.hist = [0] * (len(_BUCKETS_MS) + 1)
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.pool_wait_sum = 0.0
+        self.pool_wait_max = 0.0
+        self.pool_waits = 0
+        self.slot_wait_sum = 0.0
+        self.slot_waits = 0
+
+    def _percentile(self, q: float) -> float | None:
+        """Przybliżenie z histogramu: górna granica kubełka, w którym wypada percentyl"""
+        total = sum(self.hist)
+        if not total:
+            return None
+        rank, seen = q * total, 0
+        for i, n in enumerate(self.hist):
+            seen += n
+            if seen >= rank:
+                return float(_BUCKETS_MS[i]) if i < len(_BUCKETS_MS) else round(1000 * self.latency_max, 1)
+        return None
+
+    def as_dict(self) -> dict:
+        timed = sum(self.hist)
+        labels = [f"le_{b}" for b in _BUCKETS_MS] + ["inf"]
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "status": dict(self.status),
+            "bytes_in": self.bytes_in,
+            "latency_ms": {
+                "avg": round(1000 * self.latency_sum / timed, 1) if timed else None,
+                "p50": self._percentile(0.5),
+                "p95": self._percentile(0.95),
+                "max": round(1000 * self.latency_max, 1),
+                "total": round(1000 * self.latency_sum, 1),
+                "buckets": dict(zip(labels, self.hist)),
+            },
+            "pool_wait_ms": {
+                "avg": round(1000 * self.pool_wait_sum / self.pool_waits, 2) if self.pool_waits else None,
+                "max": round(1000 * self.pool_wait_max, 2),
+            },
+            "host_slot_wait_ms": {
+                "avg": round(1000 * self.slot_wait_sum / self.slot_waits, 2) if self.slot_waits else None,
+            },
+        }
+
+
+_HOSTS: dict[str, _HostStats] = {}
+_LOCK = Lock()  # requests z google_books działa w wątkach (io_executor, pula wątków FastAPI dla endpointów sync)
+
+def _host(host: str) -> _HostStats:
+    st = _HOSTS.get(host)
+    if st is None:
+        if len(_HOSTS) >= _MAX_HOSTS:
+            host = OTHER_HOST
+            st = _HOSTS.get(host)
+        if st is None:
+            st = _HOSTS[host] = _HostStats()
+    return st
+
+def record_response(host: str, status_code: int, latency: float) -> None:
+    """Odpowiedź (nagłówki) — latencja do pierwszego bajtu odpowiedzi w sekundach"""
+    idx = next((i for i, b in enumerate(_BUCKETS_MS) if latency * 1000 <= b), len(_BUCKETS_MS))
+    with _LOCK:
+        st = _host(host)
+        st.requests += 1
+        cls = f"{status_code // 100}xx"
+        if cls in st.status:
+            st.status[cls] += 1
+        st.hist[idx] += 1
+        st.latency_sum += latency
+        st.latency_max = max(st.latency_max, latency)
+
+def record_error(host: str, timeout: bool = False) -> None:
+    """Błąd przed odpowiedzią albo przy czytaniu treści — nie zwiększa licznika requests"""
+    with _LOCK:
+        st = _host(host)
+        st.errors += 1
+        if timeout:
+            st.timeouts += 1
+
+def record_bytes(host: str, n: int) -> None:
+    with _LOCK:
+        _host(host).bytes_in += n
+
+def record_pool_wait(host: str, seconds: float) -> None:
+    """Czas od wejścia do puli połączeń do rozpoczęcia łączenia / wysyłki nagłówków"""
+    with _LOCK:
+        st = _host(host)
+        st.pool_waits += 1
+        st.pool_wait_sum += seconds
+        st.pool_wait_max = max(st.pool_wait_max, seconds)
+
+def record_slot_wait(host: str, seconds: float) -> None:
+    """Czas oczekiwania na slot limitu per host (HostAwareTransport)"""
+    with _LOCK:
+        st = _host(host)
+        st.slot_waits += 1
+        st.slot_wait_sum += seconds
+
+def snapshot() -> dict:
+    with _LOCK:
+        ranked = sorted(_HOSTS.items(), key=lambda kv: kv[1].latency_sum, reverse=True)
+        return {host: st.as_dict() for host, st in ranked[:_TOP_HOSTS]}
+
+def reset() -> None:
+    with _LOCK:
+        _HOSTS.clear()
+
+metrics.register("http", snapshot)
@@ -0,0 +1,20 @@
+# app/core/metrics.py
+from __future__ import annotations
+from typing import Callable
+
+# nazwa -> funkcja zwracająca aktualny snapshot (dict) danego komponentu
+_PROVIDERS: dict[str, Callable[[], dict]] = {}
+
+def register(name: str, provider: Callable[[], dict]) -> None:
+    """Rejestruje źródło metryk widoczne w /_debug/metrics."""
+    _PROVIDERS[name] = provider
+
+def snapshot() -> dict:
+    """Zbiera metryki ze wszystkich zarejestrowanych komponentów."""
+    out = {}
+    for name, provider in list(_PROVIDERS.items()):
+        try:
+            out[name] = provider()
+        except Exception as e:
+            out[name] = {"error": repr(e)}
+    return out
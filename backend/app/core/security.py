@@ -1,24 +1,21 @@
 # app/security.py
-from time import time
 from fastapi import HTTPException
 
-FAILED_LOGINS = {}
+from .cache import cache
+
+# nieudane logowania we wspólnym cache: "login:<email>" -> licznik (atomowy incr), wygasa LOCKOUT_TIME po ostatniej próbie
+_FAILED_LOGIN_PREFIX = "login:"
 LOCKOUT_TIME = 300  # 5 minut
 MAX_ATTEMPTS = 5
 
 def check_login_attempts(email: str):
-    now = time()
-    attempts = FAILED_LOGINS.get(email, {"count": 0, "last": now})
-    if attempts["count"] >= MAX_ATTEMPTS and now - attempts["last"] < LOCKOUT_TIME:
+    count = cache.get(_FAILED_LOGIN_PREFIX + email, 0)
+    if isinstance(count, int) and count >= MAX_ATTEMPTS:
         raise HTTPException(status_code=429, detail="Konto zablokowane na 5 minut po wielu nieudanych próbach.")
-    return attempts
+    return count
 
 def record_failed_login(email: str):
-    now = time()
-    attempts = FAILED_LOGINS.get(email, {"count": 0, "last": now})
-    attempts["count"] += 1
-    attempts["last"] = now
-    FAILED_LOGINS[email] = attempts
+    cache.incr(_FAILED_LOGIN_PREFIX + email, ttl=LOCKOUT_TIME)
 
 def reset_login_attempts(email: str):
-    FAILED_LOGINS.pop(email, None)
+    cache.delete(_FAILED_LOGIN_PREFIX + email)
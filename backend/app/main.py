@@ -7,6 +7,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from .db.database import engine
 from . import models
 from .core.http_client import close_http
+from .core.executor import db_executor, shutdown_executors
+from .services.news_prefetch import start_news_prefetcher, stop_news_prefetcher
+from .services.import_jobs import recover_interrupted_jobs, stop_import_jobs
 from app.db.database import Base
 # Routers
 from .api.routes_auth import router as auth_router
@@ -20,6 +23,7 @@ from .api.routes_notifications import router as notif_router
 from .api.routes_books import router as books_router
 from .api.routes_rankings import router as routes_rankings
 from .api.routes_admin import router as admin_router
+from .api.routes_media import router as media_router
 
 # ── Init DB metadata (migrations docelowo przez Alembic, ale na razie OK)
 Base.metadata.create_all(bind=engine)
@@ -33,6 +37,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],  # paginacja /news, ponowienie zimnej frazy
 )
 
 # ── Routers
@@ -47,8 +52,18 @@ app.include_router(notif_router)
 app.include_router(books_router)
 app.include_router(routes_rankings)
 app.include_router(admin_router)
+app.include_router(media_router)
 
-# ── Graceful shutdown of shared HTTP client
+# ── Background jobs (news prefetch, event imports)
+@app.on_event("startup")
+async def _startup() -> None:
+    start_news_prefetcher()
+    await db_executor.run(recover_interrupted_jobs)
+
+# ── Graceful shutdown of shared HTTP client and worker pools
 @app.on_event("shutdown")
 async def _shutdown() -> None:
+    await stop_news_prefetcher()
+    await stop_import_jobs()
     await close_http()
+    shutdown_executors()
@@ -1,16 +1,22 @@
 # app/models/__init__.py
 from .user import User
-from .event import Event, UserEvent
+from .event import Event, UserEvent, EventTitleKey, EventRecurrence
 from .forum import ForumPost, ForumReply, ForumReaction, ForumReport, ForumReplyReaction, ForumReplyReport
 from .notification import Notification
 from .book import Book, Rating, Review, Loan
 from .book_cache import BookCache
+from .og_cache import OgCache
+from .news import NewsArticle, NewsArticleUniversity
+from .import_job import ImportJob
 
 __all__ = [
     "User",
-    "Event", "UserEvent",
+    "Event", "UserEvent", "EventTitleKey", "EventRecurrence",
     "ForumPost", "ForumReply", "ForumReaction", "ForumReport", "ForumReplyReaction", "ForumReplyReport",
     "Notification",
     "Book", "BookReview", "BookRating", "BookLoan", 
     "BookCache",
+    "OgCache",
+    "NewsArticle", "NewsArticleUniversity",
+    "ImportJob",
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Integer, String, Text, Boolean, Float, ForeignKey, UniqueConstraint, func
+from sqlalchemy import Column, DateTime, Integer, String, Text, Boolean, Float, ForeignKey, Index, JSON, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -59,3 +59,25 @@ class UserEvent(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     event = relationship("Event", back_populates="attendees")
+
+
+class EventTitleKey(Base):
+    """Klucze wykrywania duplikatów (services/title_fingerprint.py): odcisk tytułu i pasma LSH"""
+    __tablename__ = "event_title_keys"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(32), primary_key=True)       # "fp:<skrót>" albo "b<i>:<skrót>"
+    start_at = Column(DateTime, nullable=False)      # kopia z events — okno czasu sprawdzane na indeksie
+
+    __table_args__ = (Index("ix_event_title_keys_key_start", "key", "start_at"),)
+
+
+class EventRecurrence(Base):
+    """Reguła serii z ICS (services/event_recurrence.py) — wiersz events to pierwsze wystąpienie"""
+    __tablename__ = "event_recurrences"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    rrule = Column(Text, nullable=False)             # wartość RRULE, UNTIL zawsze w UTC
+    exdates = Column(JSON, nullable=True)            # starty pominiętych wystąpień (ISO, UTC jak events.start_at)
+    tzid = Column(String, nullable=False, default="UTC")  # strefa, w której rozwijamy regułę
+    until = Column(DateTime, index=True, nullable=True)   # ostatnie wystąpienie; NULL = seria bez końca
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, String, Text, text
+from datetime import datetime
+from app.db.database import Base
+
+# najwyżej jeden aktywny import na zestaw źródeł — pilnuje tego baza, niezależnie od liczby workerów
+_ACTIVE_WHERE = text("status IN ('queued', 'running')")
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)                    # all | uni | refresh
+    source_key = Column(String, index=True, nullable=False)  # zestaw źródeł
+    status = Column(String, index=True, default="queued")    # queued | running | done | failed
+    progress = Column(JSON, nullable=True)                   # {"sources", "sources_done", "items", "inserted", ...}
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)           # odnawiane przez worker, który wykonuje zadanie
+
+    __table_args__ = (
+        Index("uq_import_jobs_active_source", "source_key", unique=True,
+              postgresql_where=_ACTIVE_WHERE, sqlite_where=_ACTIVE_WHERE),
+    )
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, String, Text
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.db.database import Base
+
+class NewsArticle(Base):
+    __tablename__ = "news_items"
+
+    id = Column(String(64), primary_key=True)     # sha256 kanonicznego linku
+    link = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    source = Column(String, nullable=True)        # wydawca (og:site_name / tytuł feedu)
+    publisher_domain = Column(String, nullable=True)
+    publisher_favicon = Column(String, nullable=True)
+    snippet = Column(Text, nullable=True)
+    thumbnail = Column(String, nullable=True)
+    date = Column(String, nullable=True)          # data w oryginalnym formacie z feedu
+    published_at = Column(DateTime, index=True, nullable=True)
+    fetched_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    universities = relationship("NewsArticleUniversity", back_populates="article", cascade="all, delete-orphan")
+
+
+class NewsArticleUniversity(Base):
+    __tablename__ = "news_item_universities"
+
+    item_id = Column(String(64), ForeignKey("news_items.id", ondelete="CASCADE"), primary_key=True)
+    university = Column(String, primary_key=True)  # nazwa uczelni albo "wszystkie"
+    published_at = Column(DateTime, nullable=True)  # kopia z news_items — paginacja po indeksie
+
+    article = relationship("NewsArticle", back_populates="universities")
+
+    __table_args__ = (Index("ix_news_uni_published", "university", "published_at", "item_id"),)
@@ -0,0 +1,11 @@
+from sqlalchemy import Boolean, Column, DateTime, String, JSON
+from datetime import datetime
+from app.db.database import Base
+
+class OgCache(Base):
+    __tablename__ = "og_cache"
+
+    url = Column(String, primary_key=True)        # kanoniczny URL artykułu
+    data = Column(JSON)                           # {"image", "description", "site_name", "url"}
+    ok = Column(Boolean, default=True)            # False = nieudane pobranie (krótszy TTL)
+    fetched_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,7 +1,8 @@
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, validator, field_validator, field_serializer
 from datetime import date
 from typing import Optional
 from app.db.schemas import UserOut
+from app.services.media_cache import proxied_url, original_url, BOOK_THUMB_WIDTH
 
 
 class RatingBase(BaseModel):
@@ -63,6 +64,12 @@ class BookCreate(BaseModel):
     available_copies: Optional[int] = 1 
     university: str
 
+    @field_validator("thumbnail")
+    @classmethod
+    def unwrap_thumbnail(cls, v):
+        # formularz edycji odsyła URL z /media/proxy — zapisujemy oryginał
+        return original_url(v)
+
 
 class BookUpdate(BaseModel):
     title: str
@@ -74,6 +81,12 @@ class BookUpdate(BaseModel):
     description: Optional[str] = None
     available_copies: Optional[int] = 1
 
+    @field_validator("thumbnail")
+    @classmethod
+    def unwrap_thumbnail(cls, v):
+        # formularz edycji odsyła URL z /media/proxy — zapisujemy oryginał
+        return original_url(v)
+
 
 class BookOut(BaseModel):
     id: Optional[int] = None
@@ -94,6 +107,11 @@ class BookOut(BaseModel):
 
     created_by: Optional[int] = None   
 
+    @field_serializer("thumbnail", when_used="json")
+    def proxy_thumbnail(self, v):
+        # 🖼️ okładki przez lokalny cache (/media/proxy), przeskalowane do rozmiaru karty
+        return proxied_url(v, BOOK_THUMB_WIDTH)
+
     class Config:
         from_attributes = True
 
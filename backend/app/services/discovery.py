@@ -6,8 +6,7 @@ from typing import Optional, Dict, Any, List, Set
 import httpx
 from selectolax.parser import HTMLParser
 
-# hosty z problematycznym TLS — opcjonalny fallback
-_BAD_TLS = {"krakow.ast.krakow.pl", "www.ast.krakow.pl"}
+from ..core.http_client import BAD_TLS_HOSTS
 
 CAL_MIME_TYPES = {"text/calendar", "application/calendar+json"}
 
@@ -18,7 +17,7 @@ async def _safe_get(url: str, http: httpx.AsyncClient) -> Optional[httpx.Respons
         return r
     except httpx.ConnectError:
         host = (urlparse(url).hostname or "").lower()
-        if host in _BAD_TLS:
+        if host in BAD_TLS_HOSTS:
             # 1) spróbuj bez weryfikacji certu (po HTTPS)
             try:
                 r = await http.get(url, headers={"Accept": "text/html,application/xhtml+xml,*/*"}, verify=False)
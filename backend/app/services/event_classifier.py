@@ -0,0 +1,89 @@
+# app/services/event_classifier.py
+"""
+Klasyfikator wydarzeń: kategoria z tytułu i uczelnie dla wydarzeń książkowych.
+
+Reguły (słowa kluczowe) leżą w app/data/event_classifier.json (albo w pliku z EVENT_RULES_PATH),
+więc strojenie nie wymaga zmian w kodzie — po edycji wystarczy reload_rules(). Każda grupa słów
+jest kompilowana raz do jednego regexu (dopasowanie podciągu, jak wcześniej `keyword in text`),
+a wyniki są zapamiętywane po treści: to samo wydarzenie wpisane u kilkunastu uczelni
+klasyfikujemy raz.
+"""
+from __future__ import annotations
+import json, os, re
+from functools import lru_cache
+from pathlib import Path
+
+from ..core import metrics
+
+RULES_PATH = Path(os.getenv("EVENT_RULES_PATH") or Path(__file__).parent.parent / "data" / "event_classifier.json")
+
+
+def _compile(keywords: list[str]) -> re.Pattern | None:
+    # dłuższe najpierw — w komunikacie pokazujemy najdłuższe pasujące słowo
+    words = sorted({k.lower() for k in keywords if k}, key=len, reverse=True)
+    return re.compile("|".join(map(re.escape, words))) if words else None
+
+
+class _Rules:
+    def __init__(self, raw: dict):
+        cats = raw["categories"]
+        self.classify_defaults = set(cats.get("classify_defaults") or [])
+        self.fallback = cats.get("fallback")
+        self.categories = [(r["category"], _compile(r["keywords"])) for r in cats["rules"]]
+        self.universities = [(r["university"], _compile(r["keywords"])) for r in raw["universities"]["rules"]]
+
+
+def _load() -> _Rules:
+    try:
+        with open(RULES_PATH, "r", encoding="utf-8") as f:
+            return _Rules(json.load(f))
+    except FileNotFoundError as e:
+        raise RuntimeError(f"Brak pliku z regułami klasyfikacji wydarzeń: {RULES_PATH}") from e
+    except KeyError as e:
+        raise RuntimeError(f"Niepoprawny format reguł (brak klucza {e}) w {RULES_PATH}") from e
+
+_rules = _load()
+
+@lru_cache(maxsize=4096)
+def _category_for_title(title: str) -> str | None:
+    title_lower = title.lower()
+    for category, pattern in _rules.categories:
+        m = pattern.search(title_lower) if pattern else None
+        if m:
+            print(f"🔍 Found {category} keyword '{m.group(0)}' in '{title[:50]}...'")
+            return category
+    return None
+
+@lru_cache(maxsize=4096)
+def _universities_for_text(text: str) -> tuple[str, ...]:
+    found = tuple(name for name, pattern in _rules.universities if pattern and pattern.search(text))
+    if not found:
+        print(f"⚠️ Nie znaleziono słów kluczowych dla wydarzenia: {text[:50]}...")
+    return found
+
+def category_for(title: str, default_category: str | None) -> str:
+    """Kategoria źródła, a dla ogólnych (classify_defaults, np. "bilety") — pierwsza reguła pasująca do tytułu"""
+    if default_category and default_category not in _rules.classify_defaults:
+        return default_category
+    return _category_for_title(title or "") or default_category or _rules.fallback
+
+def universities_for(title: str, description: str, organizer: str, location: str) -> list[str]:
+    """Uczelnie, których słowo kluczowe występuje w treści wydarzenia (pusta lista = żadna)"""
+    return list(_universities_for_text(f"{title} {description} {organizer} {location}".lower()))
+
+def reload_rules() -> None:
+    """Wczytuje reguły z pliku ponownie i czyści zapamiętane wyniki"""
+    global _rules
+    _rules = _load()
+    _category_for_title.cache_clear()
+    _universities_for_text.cache_clear()
+
+def _stats() -> dict:
+    cat, uni = _category_for_title.cache_info(), _universities_for_text.cache_info()
+    return {
+        "rules_path": str(RULES_PATH),
+        "categories": {"hits": cat.hits, "misses": cat.misses, "size": cat.currsize},
+        "universities": {"hits": uni.hits, "misses": uni.misses, "size": uni.currsize},
+    }
+
+metrics.register("event_classifier", _stats)
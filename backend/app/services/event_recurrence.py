@@ -0,0 +1,145 @@
+# app/services/event_recurrence.py
+"""
+Wydarzenia cykliczne (RRULE / EXDATE z ICS).
+
+Seria jest zapisana raz: wiersz events (pierwsze wystąpienie) + reguła w event_recurrences.
+Wystąpienia w oknie dat listy wydarzeń liczymy leniwie (generator), a wynik dla danej serii
+i okna trzyma mały cache LRU. Regułę rozwijamy w strefie z DTSTART, żeby godzina wydarzenia
+nie przesuwała się przy zmianie czasu; na zewnątrz starty są w UTC bez strefy, jak events.start_at.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator
+from zoneinfo import ZoneInfo
+
+from dateutil.rrule import rrulestr
+
+from ..core import metrics
+
+MAX_OCCURRENCES = 100                  # wystąpień jednej serii w jednym oknie
+DEFAULT_WINDOW = timedelta(days=365)   # drugi koniec okna, gdy podano tylko date_from albo date_to
+_COUNT_LIMIT = 1000                    # COUNT większy niż to traktujemy jak serię bez końca
+
+def _zone(tzid: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(tzid)
+    except Exception:
+        return ZoneInfo("UTC")
+
+def _tzid_of(dt) -> str:
+    # strefa znana z nazwy (IANA) — inaczej UTC (czas "pływający", data, własna definicja VTIMEZONE)
+    key = getattr(getattr(dt, "tzinfo", None), "key", None)
+    return key if key and _zone(key).key == key else "UTC"
+
+def _as_start(dt) -> datetime:
+    """Ta sama postać co events.start_at: UTC bez strefy, data -> północ"""
+    if isinstance(dt, datetime):
+        return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+    return datetime.combine(dt, datetime.min.time())
+
+# --- import (parse_executor) ---
+def recurrence_from_vevent(ve) -> dict | None:
+    """RRULE/EXDATE z komponentu VEVENT -> słownik do event_recurrences (None = wydarzenie pojedyncze)"""
+    rule = ve.get("rrule")
+    if isinstance(rule, list):
+        rule = rule[0] if rule else None  # kilka RRULE w jednym VEVENT zdarza się rzadko — bierzemy pierwszą
+    dtstart = ve.get("dtstart")
+    if not rule or dtstart is None:
+        return None
+    tzid = _tzid_of(dtstart.dt)
+    tz = _zone(tzid)
+    rule = rule.copy()
+
+    until = None
+    if rule.get("UNTIL"):
+        u = rule["UNTIL"][0]
+        if not isinstance(u, datetime):
+            u = datetime.combine(u, datetime.max.time().replace(microsecond=0))
+        u = (u if u.tzinfo else u.replace(tzinfo=tz)).astimezone(timezone.utc)
+        rule["UNTIL"] = [u]  # w UTC — rrulestr wymaga tego przy DTSTART ze strefą
+        until = u.replace(tzinfo=None)
+
+    exdates = set()
+    ex = ve.get("exdate")
+    for lst in (ex if isinstance(ex, list) else [ex] if ex else []):
+        exdates.update(_as_start(d.dt) for d in lst.dts)
+
+    rec = {
+        "rrule": rule.to_ical().decode("utf-8"),
+        "exdates": sorted(d.isoformat() for d in exdates),
+        "tzid": tzid,
+        "until": until,
+    }
+    if until is None and rule.get("COUNT") and rule["COUNT"][0] <= _COUNT_LIMIT:
+        start = _as_start(dtstart.dt)
+        last = None
+        for last in iter_occurrences(rec["rrule"], tzid, start, (), start, datetime.max):
+            pass
+        rec["until"] = last
+    return rec
+
+def recurrence_id_of(ve) -> datetime | None:
+    """RECURRENCE-ID (start zastępowanego wystąpienia) w postaci exdates; None = nie jest nadpisaniem"""
+    rid = ve.get("recurrence-id")
+    return _as_start(rid.dt) if rid is not None else None
+
+# --- lista wydarzeń ---
+def iter_occurrences(rrule: str, tzid: str, start_at: datetime, exdates: Iterable[datetime],
+                     window_from: datetime, window_to: datetime) -> Iterator[datetime]:
+    """Starty wystąpień w [window_from, window_to] bez EXDATE — leniwie, po kolei"""
+    tz = _zone(tzid)
+    rule = rrulestr(rrule, dtstart=start_at.replace(tzinfo=timezone.utc).astimezone(tz))
+    skip = set(exdates)
+    for occ in rule.xafter(window_from.replace(tzinfo=timezone.utc), inc=True):
+        start = occ.astimezone(timezone.utc).replace(tzinfo=None)
+        if start > window_to:
+            return
+        if start not in skip:
+            yield start
+
+@lru_cache(maxsize=2048)
+def _occurrences(rrule: str, tzid: str, start_at: datetime, exdates: tuple[str, ...],
+                 window_from: datetime, window_to: datetime) -> tuple[datetime, ...] | None:
+    try:
+        skip = [datetime.fromisoformat(d) for d in exdates]
+        return tuple(islice(iter_occurrences(rrule, tzid, start_at, skip, window_from, window_to), MAX_OCCURRENCES))
+    except Exception as e:
+        print(f"⚠️ Nie udało się rozwinąć reguły '{rrule}': {e!r}")
+        return None
+
+class EventOccurrence:
+    """Jedno wystąpienie serii: atrybuty wydarzenia z przesuniętym start_at / end_at"""
+
+    def __init__(self, event, start_at: datetime):
+        self._event = event
+        self.start_at = start_at
+        self.end_at = event.end_at + (start_at - event.start_at) if event.end_at else None
+
+    def __getattr__(self, name):
+        return getattr(self._event, name)
+
+def window_bounds(date_from: datetime | None, date_to: datetime | None) -> tuple[datetime, datetime] | None:
+    if date_from is None and date_to is None:
+        return None
+    return (date_from or date_to - DEFAULT_WINDOW, date_to or date_from + DEFAULT_WINDOW)
+
+def expand(events: Iterable, recurrences: dict[int, object], window_from: datetime, window_to: datetime) -> Iterator:
+    """Wydarzenia z okna: pojedyncze bez zmian, serie jako kolejne wystąpienia (EventOccurrence)"""
+    for ev in events:
+        rec = recurrences.get(ev.id)
+        starts = None
+        if rec is not None:
+            starts = _occurrences(rec.rrule, rec.tzid, ev.start_at, tuple(rec.exdates or ()), window_from, window_to)
+        if starts is None:
+            yield ev  # wydarzenie pojedyncze albo reguła, której nie da się rozwinąć — sam wiersz
+            continue
+        for start in starts:
+            yield EventOccurrence(ev, start)
+
+def _stats() -> dict:
+    info = _occurrences.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+
+metrics.register("event_recurrence", _stats)
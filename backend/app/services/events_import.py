@@ -1,84 +1,54 @@
 # app/services/events_import.py
 from __future__ import annotations
-import re, json, hashlib
-from datetime import datetime, timezone
+import asyncio, re, json, hashlib
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urljoin, urlparse, parse_qs
-from typing import Optional
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional
 
 import httpx
 from selectolax.parser import HTMLParser
-from icalendar import Calendar
-from sqlalchemy import select
+from sqlalchemy import delete, exists, insert, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from dateutil import parser as dtp
 
-from ..models.event import Event
+from ..models.event import Event, EventRecurrence, EventTitleKey, UserEvent
+from . import event_classifier
+from .event_recurrence import recurrence_from_vevent, recurrence_id_of
+from .feed_fetcher import get_feed
+from .ics_stream import VEventSplitter, parse_vevents
+from .title_fingerprint import title_keys, titles_similar
+from ..core.http_client import BAD_TLS_HOSTS
+from ..core.executor import db_executor, parse_executor
 
-_BAD_TLS = {"krakow.ast.krakow.pl", "www.ast.krakow.pl"}
 CAL_MIME_TYPES = {"text/calendar", "application/calendar+json"}
 
+IMPORT_FETCH_CONCURRENCY = 8   # ile źródeł z planu importu pobieramy naraz
+DISCOVER_CONCURRENCY = 6       # podstrony / pliki ICS w obrębie jednego źródła "discover"
+ICS_PARSE_BATCH = 200          # bloki VEVENT parsowane razem (jedno zadanie w parse_executor)
+_DUP_WINDOW = timedelta(hours=1)  # okno czasu dla globalnych duplikatów wydarzeń książkowych
+
 def _sha(s: str) -> str: return hashlib.sha256(s.encode("utf-8")).hexdigest()
 def _norm_txt(x: str | None) -> str: return (x or "").strip()
 
-def _check_global_duplicate(db: Session, title: str, start_at: datetime | None, location: str | None) -> Event | None:
-    """Sprawdź czy wydarzenie o podobnym tytule, dacie i lokalizacji już istnieje"""
-    if not title or not start_at:
-        return None
-    
-    # Szukaj wydarzeń o podobnym tytule i dacie (w ciągu 1 godziny)
-    from datetime import timedelta
-    time_window_start = start_at - timedelta(hours=1)
-    time_window_end = start_at + timedelta(hours=1)
-    
-    similar_events = db.execute(
-        select(Event).where(
-            Event.title.ilike(f"%{title[:30]}%"),  # Pierwsze 30 znaków tytułu
-            Event.start_at.between(time_window_start, time_window_end),
-            Event.status == "published"
-        )
-    ).scalars().all()
-    
-    # Sprawdź podobieństwo tytułów (prosta heurystyka)
-    title_words = set(title.lower().split())
-    for event in similar_events:
-        event_words = set(event.title.lower().split())
-        # Jeśli 70% słów się pokrywa, to prawdopodobnie duplikat
-        if len(title_words & event_words) / max(len(title_words), len(event_words)) > 0.7:
-            return event
-    
-    return None
+def sync_title_keys(db: Session) -> int:
+    """Klucze duplikatów dla wydarzeń, które ich nie mają (np. sprzed tabeli event_title_keys); usuwa osierocone"""
+    db.execute(delete(EventTitleKey).where(~EventTitleKey.event_id.in_(select(Event.id))))
+    missing = db.execute(
+        select(Event.id, Event.title, Event.start_at)
+        .where(~exists().where(EventTitleKey.event_id == Event.id))
+    ).all()
+    rows = [{"event_id": r.id, "key": k, "start_at": r.start_at} for r in missing for k in title_keys(r.title)]
+    if rows:
+        db.execute(insert(EventTitleKey), rows)
+    db.commit()
+    return len(missing)
 
 def _assign_category_from_title(title: str, default_category: str | None) -> str:
-    """Przypisz kategorię na podstawie tytułu wydarzenia"""
-    if default_category and default_category != "bilety":
-        return default_category
-    
-    title_lower = title.lower()
-    
-    # Słowa kluczowe dla różnych kategorii
-    kultura_keywords = ["wystawa", "galeria", "muzeum", "teatr", "koncert", "spektakl", "sztuka", "kultura", "artysta", "malarstwo", "rzeźba", "artystyczne"]
-    turystyka_keywords = ["wycieczka", "spacer", "zwiedzanie", "turystyka", "podróż", "wyprawa", "szlak", "trasa", "krajoznawstwo"]
-    wydarzenia_keywords = ["konferencja", "seminarium", "warsztat", "szkolenie", "spotkanie", "debata", "panel", "dyskusja", "prezentacja"]
-    
-    # Sprawdź słowa kluczowe
-    for keyword in kultura_keywords:
-        if keyword in title_lower:
-            print(f"🔍 Found kultura keyword '{keyword}' in '{title[:50]}...'")
-            return "kultura"
-    
-    for keyword in turystyka_keywords:
-        if keyword in title_lower:
-            print(f"🔍 Found turystyka keyword '{keyword}' in '{title[:50]}...'")
-            return "turystyka"
-    
-    for keyword in wydarzenia_keywords:
-        if keyword in title_lower:
-            print(f"🔍 Found wydarzenia keyword '{keyword}' in '{title[:50]}...'")
-            return "wydarzenia"
-    
-    # Domyślnie zostaw "bilety" jeśli nie pasuje do niczego
-    return default_category or "bilety"
+    """Przypisz kategorię na podstawie tytułu wydarzenia (reguły: services/event_classifier.py)"""
+    return event_classifier.category_for(title, default_category)
 
 async def _safe_get(url: str, http: httpx.AsyncClient) -> httpx.Response | None:
     try:
@@ -87,7 +57,7 @@ async def _safe_get(url: str, http: httpx.AsyncClient) -> httpx.Response | None:
         return r
     except httpx.ConnectError:
         host = (urlparse(url).hostname or "").lower()
-        if host in _BAD_TLS:
+        if host in BAD_TLS_HOSTS:
             try:
                 r = await http.get(url, headers={"Accept": "text/html,application/xhtml+xml,*/*"}, verify=False)
                 if r.status_code == 200: return r
@@ -165,22 +135,10 @@ def _ics_datetime(v):
     except Exception:
         return None
 
-async def _fetch_ics(http: httpx.AsyncClient, url: str) -> bytes | None:
-    try:
-        r = await http.get(url, headers={"Accept": "text/calendar, */*"})
-        r.raise_for_status()
-        return r.content
-    except Exception:
-        return None
-
 async def _fetch_rss_items(url: str, http: httpx.AsyncClient) -> list[dict]:
-    import feedparser
-    try:
-        r = await http.get(url, headers={"Accept": "application/rss+xml, application/xml, */*"})
-        r.raise_for_status()
-    except Exception:
+    parsed = await get_feed(http, url)
+    if parsed is None:
         return []
-    parsed = feedparser.parse(r.content)
     items = []
     for e in parsed.entries:
         title = (getattr(e, "title", "") or "").strip()
@@ -195,11 +153,51 @@ async def _fetch_rss_items(url: str, http: httpx.AsyncClient) -> list[dict]:
         items.append({"title": title, "link": link, "desc": desc, "start_at": dt})
     return items
 
-def _upsert_event_from_vevent(db: Session, ve, uni_name: str, src_url: str, default_category: str | None):
-    title = _norm_txt(str(ve.get("summary", "")))
-    desc = _norm_txt(str(ve.get("description", "")))
-    loc = _norm_txt(str(ve.get("location", "")))
-    url = _norm_txt(str(ve.get("url", "")))
+# --- Zapis: plan zapisu elementu + ImportSession (decyzja insert/update w pamięci, zapis hurtowy) ---
+_PROBE_CHUNK = 500                 # klucze w jednym IN (...) przy dociąganiu wierszy z bazy
+
+# kolumny trzymane w pamięci: klucze + pola porównywane przy aktualizacji
+_ROW_COLUMNS = ("id", "hash", "title", "description", "start_at", "end_at", "all_day", "is_online", "meeting_url",
+                "location_name", "organizer", "university_name", "category", "source_url", "source_type",
+                "source_uid", "status")
+
+def _new_event(**values) -> dict:
+    """Pełny wiersz do INSERT — wszystkie nowe wiersze mają ten sam zestaw kolumn (jeden executemany)"""
+    row = {
+        "title": None, "description": None, "start_at": None, "end_at": None, "all_day": False,
+        "is_online": False, "meeting_url": None, "location_name": None, "address": None, "organizer": None,
+        "university_name": None, "category": None, "source_url": None, "source_type": None,
+        "source_uid": None, "hash": None, "status": "published",
+    }
+    row.update(values)
+    return row
+
+@dataclass
+class _EventWrite:
+    """Zapis jednego elementu źródła dla jednej uczelni; insert czy update rozstrzyga ImportSession.apply"""
+    title: str
+    start_at: datetime | None
+    targets: list[tuple[str, str | None, dict]]  # (hash, source_uid do wyszukania, wiersz do INSERT)
+    always: dict = field(default_factory=dict)   # przy update: nadpisywane zawsze
+    fill: dict = field(default_factory=dict)     # przy update: nadpisywane tylko niepustą wartością
+    book: bool = False                           # ścieżka książkowa — najpierw globalne duplikaty
+    label: str = ""
+    recurrence: dict | None = None               # ICS: reguła serii ({} = wydarzenie pojedyncze), inne źródła: None
+    override_of: tuple[str, str] | None = None   # ICS z RECURRENCE-ID: (UID serii, start zastępowanego wystąpienia)
+
+def _is_book(title: str, default_category: str | None) -> bool:
+    return default_category in ["książki", "literatura"] or "książk" in (title or "").lower()
+
+def _book_targets(fp: str, assigned_universities: list[str], new: dict) -> list[tuple[str, str | None, dict]]:
+    # Wydarzenie książkowe: osobny wiersz dla każdej przypisanej uczelni
+    targets = []
+    for assigned_uni in assigned_universities:
+        uni_hash = fp + "_" + assigned_uni.lower()
+        targets.append((uni_hash, None, {**new, "university_name": assigned_uni, "hash": uni_hash}))
+    return targets
+
+def _vevent_fields(ve) -> dict:
+    """VEVENT -> słownik pól; parsowany raz na źródło, niezależnie od liczby uczelni"""
     dtstart = _ics_datetime(ve.get("dtstart"))
     dtend = _ics_datetime(ve.get("dtend"))
 
@@ -209,136 +207,66 @@ def _upsert_event_from_vevent(db: Session, ve, uni_name: str, src_url: str, defa
         dtstart = datetime.combine(ve.get("dtstart").dt, datetime.min.time())
         dtend = datetime.combine(ve.get("dtend").dt if ve.get("dtend") else ve.get("dtstart").dt, datetime.max.time())
 
-    uid = _norm_txt(str(ve.get("uid", "")))
-    organizer = _norm_txt(str(ve.get("organizer", "")))
-    is_online = _is_online_from(loc, url)
+    loc = _norm_txt(str(ve.get("location", "")))
+    url = _norm_txt(str(ve.get("url", "")))
+    recurrence_id = recurrence_id_of(ve)
+    try:
+        # nadpisanie jednego wystąpienia (RECURRENCE-ID) nie niesie reguły serii
+        recurrence = None if recurrence_id else recurrence_from_vevent(ve)
+    except Exception:
+        recurrence = None  # nieczytelna reguła — zostaje samo pierwsze wystąpienie
+    return {
+        "title": _norm_txt(str(ve.get("summary", ""))),
+        "desc": _norm_txt(str(ve.get("description", ""))),
+        "loc": loc,
+        "url": url,
+        "start_at": dtstart,
+        "end_at": dtend,
+        "all_day": all_day,
+        "uid": _norm_txt(str(ve.get("uid", ""))),
+        "organizer": _norm_txt(str(ve.get("organizer", ""))),
+        "is_online": _is_online_from(loc, url),
+        "recurrence": recurrence,
+        "recurrence_id": recurrence_id,
+    }
 
+def _vevent_write(it: dict, uni_name: str, src_url: str, default_category: str | None) -> _EventWrite:
+    title, dtstart = it["title"], it["start_at"]
+    rid = it.get("recurrence_id")
     fp = _sha("|".join([
         title.lower(), uni_name.lower(),
         (dtstart.isoformat() if isinstance(dtstart, datetime) else str(dtstart)),
-        loc.lower()
+        it["loc"].lower(),
+        *([rid.isoformat()] if rid else []),
     ]))
-
-    found = None
-    if uid:
-        found = db.execute(select(Event).where(Event.source_type=="ics", Event.source_uid==uid)).scalar_one_or_none()
-    if not found:
-        found = db.execute(select(Event).where(Event.hash==fp)).scalar_one_or_none()
+    # nadpisanie wystąpienia serii: własny wiersz (UID + RECURRENCE-ID), nigdy wiersz serii
+    uid = f"{it['uid']}#{rid.isoformat()}" if rid and it["uid"] else it["uid"]
+    override_of = (it["uid"], rid.isoformat()) if rid and it["uid"] else None
+    # 🚀 Przypisz kategorię na podstawie tytułu wydarzenia
+    assigned_category = _assign_category_from_title(title or "", default_category)
+    new = _new_event(
+        title=title or "(bez tytułu)", description=it["desc"] or None, start_at=dtstart or datetime.utcnow(),
+        end_at=it["end_at"], all_day=it["all_day"], is_online=it["is_online"], meeting_url=it["url"] or None,
+        location_name=it["loc"] or None, organizer=it["organizer"] or None, university_name=uni_name,
+        category=assigned_category, source_url=src_url, source_type="ics", source_uid=uid or None, hash=fp,
+    )
+    always = {"all_day": it["all_day"], "is_online": it["is_online"], "source_url": src_url}
+    fill = {"title": title, "description": it["desc"], "start_at": dtstart, "end_at": it["end_at"],
+            "meeting_url": it["url"], "location_name": it["loc"], "organizer": it["organizer"]}
+
+    recurrence = None if rid else (it.get("recurrence") or {})
 
     # Dla wydarzeń książkowych, przypisz do odpowiednich uczelni na podstawie treści
-    if default_category in ["książki", "literatura"] or "książk" in (title or "").lower():
-        # 🚀 Sprawdź globalne duplikaty przed przypisaniem do uczelni
-        global_duplicate = _check_global_duplicate(db, title, dtstart, loc)
-        if global_duplicate:
-            print(f"🚫 Pominięto duplikat: {title[:50]}... (już istnieje: {global_duplicate.title[:50]}...)")
-            return
-        
-        from ..api.routes_events import assign_event_to_universities
-        assigned_universities = assign_event_to_universities(title, desc, organizer, loc)
-        
-        # 🚀 Sprawdź czy wydarzenie już istnieje w bazie (niezależnie od uczelni)
-        existing_global = db.execute(
-            select(Event).where(
-                Event.title.ilike(f"%{title[:30]}%"),
-                Event.start_at == dtstart,
-                Event.status == "published"
-            )
-        ).scalar_one_or_none()
-        
-        if existing_global:
-            print(f"🚫 Pominięto duplikat globalny: {title[:50]}... (już istnieje: {existing_global.title[:50]}...)")
-            return
-        
-        # Utwórz wydarzenie dla każdej przypisanej uczelni
-        for assigned_uni in assigned_universities:
-            # 🚀 Sprawdź czy wydarzenie już istnieje dla tej uczelni
-            uni_hash = fp + "_" + assigned_uni.lower()
-            existing_event = db.execute(
-                select(Event).where(Event.hash == uni_hash)
-            ).scalar_one_or_none()
-            
-            if existing_event:
-                # Aktualizuj istniejące wydarzenie
-                existing_event.title = title or existing_event.title
-                existing_event.description = desc or existing_event.description
-                existing_event.start_at = dtstart or existing_event.start_at
-                existing_event.end_at = dtend or existing_event.end_at
-                existing_event.all_day = all_day
-                existing_event.is_online = is_online
-                existing_event.meeting_url = url or existing_event.meeting_url
-                existing_event.location_name = loc or existing_event.location_name
-                existing_event.organizer = organizer or existing_event.organizer
-                existing_event.source_url = src_url
-                existing_event.source_uid = uid or existing_event.source_uid
-                continue
-            
-            # 🚀 Przypisz różne kategorie na podstawie tytułu wydarzenia
-            assigned_category = _assign_category_from_title(title or "", default_category)
-            
-            ev = Event(
-                title=title or "(bez tytułu)",
-                description=desc or None,
-                start_at=dtstart or datetime.utcnow(),
-                end_at=dtend,
-                all_day=all_day,
-                is_online=is_online,
-                meeting_url=url or None,
-                location_name=loc or None,
-                address=None,
-                organizer=organizer or None,
-                university_name=assigned_uni,
-                category=assigned_category,
-                source_url=src_url,
-                source_type="ics",
-                source_uid=uid or None,
-                hash=uni_hash,
-                status="published",
-            )
-            db.add(ev)
-    else:
-        # 🚀 Przypisz kategorię na podstawie tytułu dla wszystkich wydarzeń
-        assigned_category = _assign_category_from_title(title or "", default_category)
-        
-        if found:
-            ev = found
-            ev.title = title or ev.title
-            ev.description = desc or ev.description
-            ev.start_at = dtstart or ev.start_at
-            ev.end_at = dtend or ev.end_at
-            ev.all_day = all_day
-            ev.location_name = loc or ev.location_name
-            ev.is_online = is_online
-            ev.meeting_url = url or ev.meeting_url
-            ev.organizer = organizer or ev.organizer
-            ev.university_name = uni_name
-            ev.category = assigned_category or ev.category
-            ev.source_url = src_url
-        else:
-            ev = Event(
-                title=title or "(bez tytułu)",
-                description=desc or None,
-                start_at=dtstart or datetime.utcnow(),
-                end_at=dtend,
-                all_day=all_day,
-                is_online=is_online,
-                meeting_url=url or None,
-                location_name=loc or None,
-                address=None,
-                organizer=organizer or None,
-                university_name=uni_name,
-                category=assigned_category,
-                source_url=src_url,
-                source_type="ics",
-                source_uid=uid or None,
-                hash=fp,
-                status="published",
-            )
-            db.add(ev)
-    
-    try: db.commit()
-    except IntegrityError: db.rollback()
-
-def _upsert_event_from_rss(db: Session, it: dict, uni_name: str, src_url: str, default_category: str | None):
+    if _is_book(title, default_category):
+        assigned_universities = event_classifier.universities_for(title, it["desc"], it["organizer"], it["loc"])
+        return _EventWrite(title, dtstart, _book_targets(fp, assigned_universities, new),
+                           always, {**fill, "source_uid": uid}, book=True, recurrence=recurrence,
+                           override_of=override_of)
+    return _EventWrite(title, dtstart, [(fp, uid or None, new)],
+                       {**always, "university_name": uni_name}, {**fill, "category": assigned_category},
+                       recurrence=recurrence, override_of=override_of)
+
+def _rss_write(it: dict, uni_name: str, src_url: str, default_category: str | None) -> _EventWrite:
     title = it["title"] or "(bez tytułu)"
     desc  = it.get("desc") or None
     link  = it.get("link") or None
@@ -349,82 +277,361 @@ def _upsert_event_from_rss(db: Session, it: dict, uni_name: str, src_url: str, d
         (dt.isoformat() if isinstance(dt, datetime) else ""),
         (link or "").lower()
     ]))
-    
-    # Dla wydarzeń książkowych, przypisz do odpowiednich uczelni na podstawie treści
-    if default_category in ["książki", "literatura"] or "książk" in title.lower():
-        # 🚀 Sprawdź globalne duplikaty przed przypisaniem do uczelni
-        global_duplicate = _check_global_duplicate(db, title, dt, None)
-        if global_duplicate:
-            print(f"🚫 Pominięto duplikat RSS: {title[:50]}... (już istnieje: {global_duplicate.title[:50]}...)")
+    assigned_category = _assign_category_from_title(title, default_category)
+    new = _new_event(
+        title=title, description=desc, start_at=dt or datetime.utcnow(), is_online=is_online,
+        university_name=uni_name, category=assigned_category, source_url=src_url, source_type="rss", hash=fp,
+    )
+    always = {"is_online": is_online, "source_url": src_url}
+    fill = {"description": desc, "start_at": dt}
+
+    if _is_book(title, default_category):
+        assigned_universities = event_classifier.universities_for(title, desc or "", "", "")
+        return _EventWrite(title, dt, _book_targets(fp, assigned_universities, new), always, fill,
+                           book=True, label=" RSS")
+    return _EventWrite(title, dt, [(fp, None, new)],
+                       {**always, "university_name": uni_name}, {**fill, "category": assigned_category})
+
+def _jsonld_write(ev: dict, uni_name: str, src_url: str, default_category: str | None) -> _EventWrite:
+    title = ev["title"]
+    fp = _sha("|".join([
+        title.lower(), uni_name.lower(),
+        (ev["start_at"].isoformat() if isinstance(ev["start_at"], datetime) else ""),
+    ]))
+    new = _new_event(
+        title=title, description=ev.get("description"), start_at=ev.get("start_at") or datetime.utcnow(),
+        end_at=ev.get("end_at"), is_online=ev.get("is_online", False), location_name=ev.get("location_name"),
+        university_name=uni_name, category=default_category, source_url=src_url, source_type="jsonld", hash=fp,
+    )
+    always = {"is_online": ev.get("is_online"), "source_url": src_url}
+    fill = {"description": ev.get("description"), "start_at": ev.get("start_at"), "end_at": ev.get("end_at"),
+            "location_name": ev.get("location_name")}
+
+    if _is_book(title, default_category):
+        assigned_universities = event_classifier.universities_for(
+            title, ev.get("description") or "", "", ev.get("location_name") or ""
+        )
+        new["category"] = _assign_category_from_title(title, default_category)
+        return _EventWrite(title, ev.get("start_at"), _book_targets(fp, assigned_universities, new), always, fill,
+                           book=True, label=" JSON-LD")
+    return _EventWrite(title, ev.get("start_at"), [(fp, None, new)],
+                       {**always, "university_name": uni_name}, {**fill, "category": default_category})
+
+_WRITE_BUILDERS = {"vevent": _vevent_write, "rss": _rss_write, "jsonld": _jsonld_write}
+
+
+class ImportSession:
+    """
+    Stan zapisu jednego przebiegu importu. Istniejące wydarzenia (klucze hash / source_uid i pola
+    porównywane przy aktualizacji) trzymamy w pamięci, więc insert vs update rozstrzyga się
+    w Pythonie, a zmiany idą hurtowym INSERT/UPDATE z jednym commitem na źródło.
+    Używana sekwencyjnie przez writer importu (wątek db_executor).
+
+    new_status="pending": nowe wiersze są niewidoczne do finalize(), które w jednej transakcji
+    publikuje je i oznacza jako "removed" wydarzenia, których źródło już nie zwraca.
+    """
+
+    def __init__(self, db: Session, new_status: str = "published"):
+        self.db = db
+        self.new_status = new_status
+        self.seen: set[str] = set()  # hashe wierszy potwierdzonych przez źródła w tym przebiegu
+        self._overrides: dict[str, set[str]] = {}  # UID serii -> starty wystąpień nadpisanych (RECURRENCE-ID)
+        self.stats = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "conflicts": 0}
+        self._visible = {"published", new_status}
+        self._reset()
+
+    def _reset(self) -> None:
+        self._rows: dict[int, dict] = {}                    # zapisane wiersze po id
+        self._by_hash: dict[str, dict] = {}
+        self._by_uid: dict[tuple[str, str], dict] = {}
+        self._by_key: dict[str, list[dict]] = {}            # klucze tytułu (title_keys) — globalne duplikaty
+        self._probed: set[tuple[str, str]] = set()          # klucze sprawdzone w bazie (także nieistniejące)
+        self._inserts: list[dict] = []
+        self._updates: dict[int, dict] = {}
+        self._rekey: set[int] = set()                       # zmieniony tytuł / start — do przepisania w event_title_keys
+        self._recur: dict[int, tuple[dict, dict]] = {}      # id(wiersz) -> (wiersz, reguła serii z ICS)
+        self._new_overrides: set[str] = set()               # UID serii z nowymi nadpisaniami od ostatniego flush
+
+    # --- indeks w pamięci ---
+    def _index(self, row: dict) -> None:
+        if row["hash"]:
+            self._by_hash[row["hash"]] = row
+        if row["source_uid"]:
+            self._by_uid[(row["source_type"], row["source_uid"])] = row
+        for key in title_keys(row["title"]):
+            self._by_key.setdefault(key, []).append(row)
+
+    def _load(self, *where) -> None:
+        columns = [getattr(Event, c) for c in _ROW_COLUMNS]
+        for r in self.db.execute(select(*columns).where(*where)).all():
+            if r.id not in self._rows:
+                row = self._rows[r.id] = dict(r._mapping)
+                self._index(row)
+
+    def prefetch(self, writes: list[_EventWrite]) -> None:
+        """Dociąga wiersze potrzebne zapisom z jednego źródła: kandydaci na duplikaty + IN po hash / source_uid"""
+        book = [w for w in writes if w.book and w.start_at]
+        if book:
+            # wspólny klucz tytułu i start w oknie — zapytanie po indeksie (key, start_at)
+            lo = min(w.start_at for w in book) - _DUP_WINDOW
+            hi = max(w.start_at for w in book) + _DUP_WINDOW
+            keys = list({k for w in book for k in title_keys(w.title)})
+            for i in range(0, len(keys), _PROBE_CHUNK):
+                self._load(Event.id.in_(
+                    select(EventTitleKey.event_id).where(
+                        EventTitleKey.key.in_(keys[i:i + _PROBE_CHUNK]), EventTitleKey.start_at.between(lo, hi)
+                    )
+                ))
+
+        hashes, uids = set(), set()
+        for w in writes:
+            for key, _, new in w.targets:
+                if key not in self._by_hash and ("hash", key) not in self._probed:
+                    hashes.add(key)
+                uid = new["source_uid"]
+                if uid and (new["source_type"], uid) not in self._by_uid and ("uid", uid) not in self._probed:
+                    uids.add(uid)
+        for column, kind, keys in ((Event.hash, "hash", hashes), (Event.source_uid, "uid", uids)):
+            keys = list(keys)
+            for i in range(0, len(keys), _PROBE_CHUNK):
+                self._load(column.in_(keys[i:i + _PROBE_CHUNK]))
+            self._probed.update((kind, k) for k in keys)
+
+    def _candidates(self, title: str, start_at: datetime) -> list[dict]:
+        seen, out = set(), []
+        for key in title_keys(title):
+            for row in self._by_key.get(key, ()):
+                if id(row) not in seen and row["status"] in self._visible and abs(row["start_at"] - start_at) <= _DUP_WINDOW:
+                    seen.add(id(row))
+                    out.append(row)
+        return out
+
+    def find_duplicate(self, title: str, start_at: datetime | None) -> dict | None:
+        """Wydarzenie o podobnym tytule (odcisk / pasmo LSH + titles_similar) ze startem w oknie _DUP_WINDOW"""
+        if not title or not start_at:
+            return None
+        return next((row for row in self._candidates(title, start_at) if titles_similar(title, row["title"])), None)
+
+    def find_same_start(self, title: str, start_at: datetime | None) -> dict | None:
+        """Opublikowane wydarzenie o tym samym starcie i pasującym początku tytułu"""
+        if not start_at:
+            return None
+        needle = title[:30].lower()
+        return next((row for row in self._candidates(title, start_at)
+                     if row["start_at"] == start_at and needle in row["title"].lower()), None)
+
+    # --- decyzja insert / update ---
+    def apply(self, w: _EventWrite) -> None:
+        if w.override_of:
+            # wystąpienie zastąpione osobnym wierszem znika z rozwinięcia serii (dopisane do jej exdates)
+            uid, start = w.override_of
+            dates = self._overrides.setdefault(uid, set())
+            if start not in dates:
+                dates.add(start)
+                self._new_overrides.add(uid)
+        if w.book:
+            # 🚀 Sprawdź globalne duplikaty przed przypisaniem do uczelni
+            dup = self.find_duplicate(w.title, w.start_at)
+            if dup is not None:
+                print(f"🚫 Pominięto duplikat{w.label}: {w.title[:50]}... (już istnieje: {dup['title'][:50]}...)")
+                self._skip(w, dup)
+                return
+            # 🚀 Sprawdź czy wydarzenie już istnieje w bazie (niezależnie od uczelni)
+            dup = self.find_same_start(w.title, w.start_at)
+            if dup is not None:
+                print(f"🚫 Pominięto duplikat globalny{w.label}: {w.title[:50]}... (już istnieje: {dup['title'][:50]}...)")
+                self._skip(w, dup)
+                return
+
+        changes = {**w.always, **{k: v for k, v in w.fill.items() if v}}
+        for key, uid, new in w.targets:
+            row = (self._by_uid.get((new["source_type"], uid)) if uid else None) or self._by_hash.get(key)
+            if row is None:
+                row = self._insert(new)
+                self.seen.add(key)
+            else:
+                self._update(row, changes)
+                self.seen.add(row["hash"])
+            if row is not None and w.recurrence is not None:
+                self._recur[id(row)] = (row, w.recurrence)
+
+    def _skip(self, w: _EventWrite, dup: dict) -> None:
+        # element nadal jest w źródle — jego wiersze (i znaleziony duplikat) nie znikają przy synchronizacji
+        self.stats["duplicates"] += 1
+        self.seen.update(key for key, _, _ in w.targets)
+        if dup["hash"]:
+            self.seen.add(dup["hash"])
+
+    def _insert(self, new: dict) -> dict | None:
+        if new["source_uid"] and (new["source_type"], new["source_uid"]) in self._by_uid:
+            # (source_type, source_uid) jest unikalne — taki wiersz i tak odrzuciłaby baza
+            self.stats["conflicts"] += 1
+            return None
+        row = {**new, "status": self.new_status}  # bez "id" do czasu INSERT; zmiany przed flush trafiają prosto do wiersza
+        self._inserts.append(row)
+        self._index(row)
+        return row
+
+    def _update(self, row: dict, values: dict) -> None:
+        if row["status"] == "removed":
+            values = {**values, "status": self.new_status}  # wydarzenie wróciło do źródła
+        elif row["status"] == "pending" and self.new_status == "published":
+            # pozostałość po przerwanej synchronizacji (finalize się nie wykonał) — źródło je potwierdza
+            values = {**values, "status": "published"}
+        changes = {k: v for k, v in values.items() if row.get(k) != v}
+        uid = changes.get("source_uid")
+        if uid:
+            owner = self._by_uid.get((row["source_type"], uid))
+            if owner is not None and owner is not row:
+                del changes["source_uid"]
+                self.stats["conflicts"] += 1
+            else:
+                self._by_uid.pop((row["source_type"], row["source_uid"]), None)
+                self._by_uid[(row["source_type"], uid)] = row
+        if not changes:
+            self.stats["unchanged"] += 1
             return
-        
-        from ..api.routes_events import assign_event_to_universities
-        assigned_universities = assign_event_to_universities(title, desc or "", "", "")
-        
-        # 🚀 Sprawdź czy wydarzenie już istnieje w bazie (niezależnie od uczelni)
-        existing_global = db.execute(
-            select(Event).where(
-                Event.title.ilike(f"%{title[:30]}%"),
-                Event.start_at == dt,
-                Event.status == "published"
-            )
-        ).scalar_one_or_none()
-        
-        if existing_global:
-            print(f"🚫 Pominięto duplikat globalny RSS: {title[:50]}... (już istnieje: {existing_global.title[:50]}...)")
+        if "title" in changes:
+            for key in title_keys(row["title"]):
+                self._by_key[key] = [r for r in self._by_key.get(key, ()) if r is not row]
+        row.update(changes)
+        if "title" in changes:
+            for key in title_keys(row["title"]):
+                self._by_key.setdefault(key, []).append(row)
+        if row.get("id") is not None:
+            self._updates.setdefault(row["id"], {}).update(changes)
+            if "title" in changes or "start_at" in changes:
+                self._rekey.add(row["id"])
+
+    # --- zapis ---
+    def flush(self) -> None:
+        """Hurtowy INSERT (RETURNING id) i UPDATE po kluczu głównym razem z kluczami tytułów, jeden commit"""
+        inserts, updates, rekey, recur = self._inserts, self._updates, self._rekey, self._recur
+        overridden, self._new_overrides = self._new_overrides, set()
+        self._inserts, self._updates, self._rekey, self._recur = [], {}, set(), {}
+        if not inserts and not updates and not recur and not overridden:
             return
-        
-        # Utwórz wydarzenie dla każdej przypisanej uczelni
-        for assigned_uni in assigned_universities:
-            # 🚀 Sprawdź czy wydarzenie już istnieje dla tej uczelni
-            uni_hash = fp + "_" + assigned_uni.lower()
-            existing_event = db.execute(
-                select(Event).where(Event.hash == uni_hash)
-            ).scalar_one_or_none()
-            
-            if existing_event:
-                # Aktualizuj istniejące wydarzenie
-                existing_event.description = desc or existing_event.description
-                existing_event.start_at = dt or existing_event.start_at
-                existing_event.is_online = is_online
-                existing_event.source_url = src_url
-                continue
-            
-            # 🚀 Przypisz kategorię na podstawie tytułu
-            assigned_category = _assign_category_from_title(title, default_category)
-            
-            ev = Event(
-                title=title, description=desc, start_at=dt or datetime.utcnow(), end_at=None,
-                all_day=False, is_online=is_online, meeting_url=None, location_name=None, address=None,
-                organizer=None, university_name=assigned_uni, category=assigned_category,
-                source_url=src_url, source_type="rss", source_uid=None, 
-                hash=uni_hash, status="published",
-            )
-            db.add(ev)
-    else:
-        # 🚀 Przypisz kategorię na podstawie tytułu dla wszystkich wydarzeń RSS
-        assigned_category = _assign_category_from_title(title, default_category)
-        
-        found = db.execute(select(Event).where(Event.hash==fp)).scalar_one_or_none()
-        if found:
-            ev = found
-            ev.description = desc or ev.description
-            ev.start_at    = dt or ev.start_at
-            ev.is_online   = is_online
-            ev.university_name = uni_name
-            ev.category    = assigned_category or ev.category
-            ev.source_url  = src_url
-        else:
-            ev = Event(
-                title=title, description=desc, start_at=dt or datetime.utcnow(), end_at=None,
-                all_day=False, is_online=is_online, meeting_url=None, location_name=None, address=None,
-                organizer=None, university_name=uni_name, category=assigned_category,
-                source_url=src_url, source_type="rss", source_uid=None, hash=fp, status="published",
-            )
-            db.add(ev)
-    
-    try: db.commit()
-    except IntegrityError: db.rollback()
+        now = datetime.utcnow()
+        try:
+            if inserts:
+                ids = dict(self.db.execute(insert(Event).returning(Event.hash, Event.id), inserts).all())
+                for row in inserts:
+                    row["id"] = ids[row["hash"]]
+                    self._rows[row["id"]] = row
+            if updates:
+                self.db.execute(update(Event), [{"id": i, **ch, "updated_at": now} for i, ch in updates.items()])
+            if rekey:
+                self.db.execute(delete(EventTitleKey).where(EventTitleKey.event_id.in_(rekey)))
+            keyed = inserts + [self._rows[i] for i in rekey]
+            key_rows = [{"event_id": r["id"], "key": k, "start_at": r["start_at"]} for r in keyed for k in title_keys(r["title"])]
+            if key_rows:
+                self.db.execute(insert(EventTitleKey), key_rows)
+            if recur or overridden:
+                self._write_recurrences(recur, overridden)
+            self.db.commit()
+        except IntegrityError:
+            # np. równoległy import tych samych źródeł — wiersz po wierszu, odrzucone pomijamy
+            self.db.rollback()
+            self._flush_row_by_row(inserts, updates, now)
+            return
+        except Exception:
+            self.rollback()
+            raise
+        self.stats["inserted"] += len(inserts)
+        self.stats["updated"] += len(updates)
+
+    def _with_overrides(self, uid: str | None, rec: dict) -> dict:
+        extra = self._overrides.get(uid) if rec and uid else None
+        return {**rec, "exdates": sorted(set(rec["exdates"]) | extra)} if extra else rec
+
+    def _write_recurrences(self, recur: dict[int, tuple[dict, dict]], overridden: set[str]) -> None:
+        """
+        Reguły serii (event_recurrences) dla wierszy z ICS — zapisujemy tylko te, które się zmieniły.
+        Serie z nowymi nadpisaniami wystąpień, zapisane we wcześniejszej paczce, dostają je do exdates tutaj.
+        """
+        wanted = {row["id"]: self._with_overrides(row["source_uid"], rec)
+                  for row, rec in recur.values() if row.get("id") is not None}
+        patch: dict[int, str] = {}  # id serii spoza tej paczki -> jej UID
+        uids = list(overridden)
+        for i in range(0, len(uids), _PROBE_CHUNK):
+            for r in self.db.execute(
+                select(Event.id, Event.source_uid).join(EventRecurrence, EventRecurrence.event_id == Event.id)
+                .where(Event.source_type == "ics", Event.source_uid.in_(uids[i:i + _PROBE_CHUNK]))
+            ).all():
+                if r.id not in wanted:
+                    patch[r.id] = r.source_uid
+        ids = list(wanted) + list(patch)
+        current = {}
+        for i in range(0, len(ids), _PROBE_CHUNK):
+            for r in self.db.execute(
+                select(EventRecurrence.event_id, EventRecurrence.rrule, EventRecurrence.exdates,
+                       EventRecurrence.tzid, EventRecurrence.until)
+                .where(EventRecurrence.event_id.in_(ids[i:i + _PROBE_CHUNK]))
+            ).all():
+                current[r.event_id] = {"rrule": r.rrule, "exdates": r.exdates or [], "tzid": r.tzid, "until": r.until}
+        for i, uid in patch.items():
+            if i in current:
+                wanted[i] = self._with_overrides(uid, current[i])
+        changed = [i for i, rec in wanted.items() if current.get(i, {}) != rec]
+        stale = [i for i in changed if i in current]
+        for i in range(0, len(stale), _PROBE_CHUNK):
+            self.db.execute(delete(EventRecurrence).where(EventRecurrence.event_id.in_(stale[i:i + _PROBE_CHUNK])))
+        rows = [{"event_id": i, **wanted[i]} for i in changed if wanted[i]]
+        if rows:
+            self.db.execute(insert(EventRecurrence), rows)
+
+    def _flush_row_by_row(self, inserts: list[dict], updates: dict[int, dict], now: datetime) -> None:
+        for stmt, params, stat in (
+            *((update(Event), {"id": i, **ch, "updated_at": now}, "updated") for i, ch in updates.items()),
+            *((insert(Event), {k: v for k, v in row.items() if k != "id"}, "inserted") for row in inserts),
+        ):
+            try:
+                self.db.execute(stmt, [params])
+                self.db.commit()
+                self.stats[stat] += 1
+            except IntegrityError:
+                self.db.rollback()
+                self.stats["conflicts"] += 1
+        sync_title_keys(self.db)
+        # reguły serii z tej paczki dopisze następny import (wiersze będą już istniały)
+        self._reset()  # stan w pamięci mógł się rozjechać z bazą — następne źródło wczyta go od nowa
+
+    def rollback(self) -> None:
+        self.db.rollback()
+        self._reset()
+
+    def finalize(self, source_urls: set[str]) -> dict:
+        """
+        Jedna transakcja: nowe wiersze ("pending") potwierdzone w tym przebiegu -> "published",
+        wydarzenia ze źródeł, które w tym przebiegu zwróciły dane, a których już w nich nie ma -> "removed".
+        Źródła bez danych (błąd sieci, pusta strona) nie są ruszane.
+        """
+        publish, remove = [], []
+        urls = list(source_urls)
+        for i in range(0, len(urls), _PROBE_CHUNK):
+            for r in self.db.execute(
+                select(Event.id, Event.hash, Event.status).where(
+                    Event.source_url.in_(urls[i:i + _PROBE_CHUNK]), Event.status.in_(self._visible)
+                )
+            ).all():
+                if r.hash not in self.seen:
+                    remove.append(r.id)
+                elif r.status != "published":
+                    publish.append(r.id)
+        now = datetime.utcnow()
+        try:
+            for status, ids in (("published", publish), ("removed", remove)):
+                for i in range(0, len(ids), _PROBE_CHUNK):
+                    self.db.execute(
+                        update(Event).where(Event.id.in_(ids[i:i + _PROBE_CHUNK]))
+                        .values(status=status, updated_at=now).execution_options(synchronize_session=False)
+                    )
+            self.db.commit()
+        except Exception:
+            self.rollback()
+            raise
+        self._reset()
+        return {"published": len(publish), "removed": len(remove)}
 
 def _event_from_jsonld(ev: dict) -> dict:
     def take(*keys): 
@@ -456,183 +663,249 @@ def _event_from_jsonld(ev: dict) -> dict:
         "source_type": "jsonld",
     }
 
-def _upsert_event_from_jsonld(db: Session, ev: dict, uni_name: str, src_url: str, default_category: str | None):
-    fp = _sha("|".join([
-        ev["title"].lower(), uni_name.lower(),
-        (ev["start_at"].isoformat() if isinstance(ev["start_at"], datetime) else ""),
-    ]))
-    
-    # Dla wydarzeń książkowych, przypisz do odpowiednich uczelni na podstawie treści
-    if default_category in ["książki", "literatura"] or "książk" in ev["title"].lower():
-        # 🚀 Sprawdź globalne duplikaty przed przypisaniem do uczelni
-        global_duplicate = _check_global_duplicate(db, ev["title"], ev.get("start_at"), ev.get("location_name"))
-        if global_duplicate:
-            print(f"🚫 Pominięto duplikat JSON-LD: {ev['title'][:50]}... (już istnieje: {global_duplicate.title[:50]}...)")
-            return
-        
-        from ..api.routes_events import assign_event_to_universities
-        assigned_universities = assign_event_to_universities(
-            ev["title"], 
-            ev.get("description") or "", 
-            "", 
-            ev.get("location_name") or ""
-        )
-        
-        # 🚀 Sprawdź czy wydarzenie już istnieje w bazie (niezależnie od uczelni)
-        existing_global = db.execute(
-            select(Event).where(
-                Event.title.ilike(f"%{ev['title'][:30]}%"),
-                Event.start_at == ev.get("start_at"),
-                Event.status == "published"
-            )
-        ).scalar_one_or_none()
-        
-        if existing_global:
-            print(f"🚫 Pominięto duplikat globalny JSON-LD: {ev['title'][:50]}... (już istnieje: {existing_global.title[:50]}...)")
-            return
-        
-        # Utwórz wydarzenie dla każdej przypisanej uczelni
-        for assigned_uni in assigned_universities:
-            # 🚀 Sprawdź czy wydarzenie już istnieje dla tej uczelni
-            uni_hash = fp + "_" + assigned_uni.lower()
-            existing_event = db.execute(
-                select(Event).where(Event.hash == uni_hash)
-            ).scalar_one_or_none()
-            
-            if existing_event:
-                # Aktualizuj istniejące wydarzenie
-                existing_event.description = ev.get("description") or existing_event.description
-                existing_event.start_at = ev.get("start_at") or existing_event.start_at
-                existing_event.end_at = ev.get("end_at") or existing_event.end_at
-                existing_event.is_online = ev.get("is_online", existing_event.is_online)
-                existing_event.location_name = ev.get("location_name") or existing_event.location_name
-                existing_event.source_url = src_url
-                continue
-            
-            # 🚀 Przypisz kategorię na podstawie tytułu
-            assigned_category = _assign_category_from_title(ev["title"], default_category)
-            
-            rec = Event(
-                title=ev["title"], description=ev.get("description"),
-                start_at=ev.get("start_at") or datetime.utcnow(), end_at=ev.get("end_at"),
-                all_day=False, is_online=ev.get("is_online", False), meeting_url=None,
-                location_name=ev.get("location_name"), address=None, organizer=None,
-                university_name=assigned_uni, category=assigned_category, source_url=src_url,
-                source_type="jsonld", source_uid=None, 
-                hash=uni_hash, status="published",
-            )
-            db.add(rec)
-    else:
-        found = db.execute(select(Event).where(Event.hash==fp)).scalar_one_or_none()
-        if found:
-            rec = found
-            rec.description = ev.get("description") or rec.description
-            rec.start_at    = ev.get("start_at") or rec.start_at
-            rec.end_at      = ev.get("end_at") or rec.end_at
-            rec.is_online   = ev.get("is_online")
-            rec.location_name = ev.get("location_name") or rec.location_name
-            rec.university_name = uni_name
-            rec.category = default_category or rec.category
-            rec.source_url = src_url
-        else:
-            rec = Event(
-                title=ev["title"], description=ev.get("description"),
-                start_at=ev.get("start_at") or datetime.utcnow(), end_at=ev.get("end_at"),
-                all_day=False, is_online=ev.get("is_online", False), meeting_url=None,
-                location_name=ev.get("location_name"), address=None, organizer=None,
-                university_name=uni_name, category=default_category, source_url=src_url,
-                source_type="jsonld", source_uid=None, hash=fp, status="published",
-            )
-            db.add(rec)
-    
-    try: db.commit()
-    except IntegrityError: db.rollback()
-
-async def import_events_for_university(db: Session, uni_name: str, http: httpx.AsyncClient, sources_map: dict):
-    sources = sources_map.get(uni_name) or []
-    for s in sources:
-        stype, url, cat = s.get("type"), s.get("url"), s.get("category")
-        if not url: continue
-
-        if stype == "ics":
-            raw = await _fetch_ics(http, url)
-            if raw:
-                cal = Calendar.from_ical(raw)
-                for comp in cal.walk("vevent"):
-                    _upsert_event_from_vevent(db, comp, uni_name, url, cat)
-
-        elif stype == "rss":
-            items = await _fetch_rss_items(url, http)
-            for it in items:
-                _upsert_event_from_rss(db, it, uni_name, url, cat)
-
-        elif stype == "discover":
-            found = await discover_sources(url, http)
-            for ics_url in found["ics"]:
-                raw = await _fetch_ics(http, ics_url)
-                if not raw: continue
-                try:
-                    cal = Calendar.from_ical(raw)
-                    for comp in cal.walk("vevent"):
-                        _upsert_event_from_vevent(db, comp, uni_name, ics_url, cat)
-                except Exception:
-                    pass
-            for evobj in found["jsonld_events"]:
-                ev = _event_from_jsonld(evobj)
-                _upsert_event_from_jsonld(db, ev, uni_name, url, cat)
-            for durl in found["detail_pages"]:
-                try:
-                    sub = await discover_sources(durl, http)
-                    for ics_url in sub["ics"]:
-                        raw = await _fetch_ics(http, ics_url)
-                        if not raw: continue
-                        cal = Calendar.from_ical(raw)
-                        for comp in cal.walk("vevent"):
-                            _upsert_event_from_vevent(db, comp, uni_name, ics_url, cat)
-                    for evobj in sub["jsonld_events"]:
-                        ev = _event_from_jsonld(evobj)
-                        _upsert_event_from_jsonld(db, ev, uni_name, durl, cat)
-                except Exception:
+def build_fetch_plan(sources_map: dict, universities: list[str] | None = None) -> dict[tuple[str, str], list[tuple[str, str | None]]]:
+    """
+    Plan importu: (typ, url) -> [(uczelnia, kategoria), ...].
+    To samo źródło wpisane u wielu uczelni (EVENTS_SOURCES) pobieramy i parsujemy raz.
+    """
+    plan: dict[tuple[str, str], list[tuple[str, str | None]]] = {}
+    for uni_name in (universities or list(sources_map.keys())):
+        for s in sources_map.get(uni_name) or []:
+            stype, url = s.get("type"), s.get("url")
+            if not url: continue
+            plan.setdefault((stype, url), []).append((uni_name, s.get("category")))
+    return plan
+
+def _iter_vevents(blocks: list[bytes], timezones: list[bytes], src_url: str) -> Iterator[tuple[str, dict, str]]:
+    for comp in parse_vevents(blocks, timezones):
+        try:
+            yield ("vevent", _vevent_fields(comp), src_url)
+        except Exception:
+            continue  # pojedynczy uszkodzony VEVENT nie przekreśla całego kalendarza
+
+def _parse_ics_batch(blocks: list[bytes], timezones: list[bytes], src_url: str) -> list[tuple[str, dict, str]]:
+    """W parse_executor: paczka surowych bloków VEVENT -> znormalizowane słowniki"""
+    return list(_iter_vevents(blocks, timezones, src_url))
+
+async def _gather_bounded(limit: int, coros) -> list:
+    """asyncio.gather z limitem współbieżności; wyjątki wracają jako wartości"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(c):
+        async with semaphore:
+            return await c
+
+    coros = list(coros)
+    try:
+        return await asyncio.gather(*(run(c) for c in coros), return_exceptions=True)
+    except asyncio.CancelledError:
+        for c in coros:
+            c.close()  # te, które nie zdążyły wystartować (bez ostrzeżenia "never awaited")
+        raise
+
+# element-znacznik w paczce: strumień z tego URL-a urwał się albo zapis się nie udał — sync go nie rozlicza
+_INCOMPLETE = "incomplete"
+
+Emit = Callable[[list], Awaitable[None]]
+
+async def _iter_ics_batches(http: httpx.AsyncClient, ics_url: str) -> AsyncIterator[list[tuple[str, object, str]]]:
+    """
+    ICS strumieniowo: bloki VEVENT wycinane z kolejnych kawałków odpowiedzi, parsowane paczkami
+    (ICS_PARSE_BATCH) w parse_executor — paczka parsuje się, gdy pobieramy następną, a gotowe
+    paczki od razu idą dalej, więc w pamięci nie ma całego kalendarza. Błąd w połowie pliku nie
+    cofa już oddanych paczek: ostatnia paczka to wtedy znacznik _INCOMPLETE.
+    """
+    splitter = VEventSplitter()
+    batch: list[bytes] = []
+    parsing: asyncio.Future | None = None
+    done = 0
+
+    def submit(blocks: list[bytes]) -> asyncio.Future:
+        return asyncio.ensure_future(parse_executor.run(_parse_ics_batch, blocks, list(splitter.timezones), ics_url))
+
+    error = None
+    try:
+        async with http.stream("GET", ics_url, headers={"Accept": "text/calendar, */*"}) as r:
+            r.raise_for_status()
+            async for chunk in r.aiter_bytes():
+                batch += splitter.feed(chunk)
+                if len(batch) < ICS_PARSE_BATCH:
                     continue
+                ready, parsing, batch = parsing, submit(batch), []
+                if ready is not None:
+                    items = await ready
+                    done += len(items)
+                    yield items
+        batch += splitter.close()
+    except Exception as e:
+        error = e
+    # paczka w toku i bloki już wycięte — także po błędzie: co doszło w całości, idzie do zapisu
+    for fut in (parsing, submit(batch) if batch else None):
+        if fut is not None:
+            items = await fut
+            done += len(items)
+            yield items
+    if error is not None:
+        print(f"⚠️ ICS {ics_url} przerwany po {done} wydarzeniach: {error!r}" if done else f"⚠️ ICS {ics_url} nieudany: {error!r}")
+        yield [(_INCOMPLETE, None, ics_url)]
+
+async def _emit_ics(http: httpx.AsyncClient, ics_url: str, emit: Emit) -> None:
+    async with aclosing(_iter_ics_batches(http, ics_url)) as batches:  # anulowanie zamyka też połączenie
+        async for items in batches:
+            await emit(items)
+
+async def _fetch_discovered(http: httpx.AsyncClient, url: str, follow_details: bool, emit: Emit) -> None:
+    """Strona "discover": jej pliki ICS, JSON-LD i (opcjonalnie) podstrony — równolegle, z limitem"""
+    found = await discover_sources(url, http)
+    if found["jsonld_events"]:
+        await emit([("jsonld", _event_from_jsonld(evobj), url) for evobj in found["jsonld_events"]])
+    jobs = [_emit_ics(http, ics_url, emit) for ics_url in found["ics"]]
+    if follow_details:
+        jobs += [_fetch_discovered(http, durl, False, emit) for durl in found["detail_pages"]]
+    await _gather_bounded(DISCOVER_CONCURRENCY, jobs)
+
+async def _fetch_source(http: httpx.AsyncClient, stype: str, url: str, emit: Emit) -> None:
+    """Pobiera i parsuje jedno źródło; paczki (rodzaj, element, URL źródła) idą do emit — gotowe do zapisu dla dowolnej uczelni"""
+    if stype == "ics":
+        await _emit_ics(http, url, emit)
+    elif stype == "rss":
+        await emit([("rss", it, url) for it in await _fetch_rss_items(url, http)])
+    elif stype == "discover":
+        await _fetch_discovered(http, url, True, emit)
+
+def _apply_for_subscribers(session: ImportSession, items: list, subscribers: list[tuple[str, str | None]]) -> None:
+    """Elementy jednego źródła dla wszystkich jego uczelni: jedno dociągnięcie kluczy, jeden commit"""
+    writes = [
+        _WRITE_BUILDERS[kind](obj, uni_name, src_url, cat)
+        for uni_name, cat in subscribers
+        for kind, obj, src_url in items if kind in _WRITE_BUILDERS
+    ]
+    session.prefetch(writes)
+    for w in writes:
+        session.apply(w)
+    session.flush()
+
+ProgressCallback = Callable[[dict], Awaitable[None]]
+
+async def import_events_plan(db: Session, http: httpx.AsyncClient, plan: dict, sync: bool = False,
+                             on_progress: ProgressCallback | None = None) -> dict:
+    """
+    Wykonuje plan jako pipeline: źródła pobierane równolegle (limit IMPORT_FETCH_CONCURRENCY),
+    gotowe paczki elementów trafiają do ograniczonej kolejki, a jeden writer zapisuje je do bazy
+    (sesja używana sekwencyjnie, w db_executor — event loop w tym czasie dalej pobiera). Duże
+    kalendarze ICS przychodzą wieloma paczkami, więc pamięć nie rośnie z rozmiarem źródła.
+
+    sync=True: synchronizacja zamiast dopisywania — nowe wydarzenia stają się widoczne, a zniknięte
+    ze źródeł dostają status "removed" dopiero na końcu, w jednej transakcji (ImportSession.finalize).
+
+    on_progress: wołane po każdym źródle z bieżącymi statystykami (sources_done, items, inserted, …).
+    """
+    stats = {"sources": len(plan), "subscriptions": sum(len(v) for v in plan.values()),
+             "sources_done": 0, "items": 0, "failed": 0, "errors": 0}
+    await db_executor.run(sync_title_keys, db)
+    session = ImportSession(db, new_status="pending" if sync else "published")
+    touched: set[str] = set()     # URL-e, z których przyszły dane zapisane bez błędu
+    incomplete: set[str] = set()  # URL-e z urwanym strumieniem albo nieudanym zapisem — sync ich nie rozlicza
+    print(f"📥 Plan importu: {stats['sources']} unikalnych źródeł dla {stats['subscriptions']} wpisów uczelni")
+    queue: asyncio.Queue = asyncio.Queue(maxsize=IMPORT_FETCH_CONCURRENCY)
+
+    async def fetch_one(key: tuple[str, str], subscribers: list):
+        stype, url = key
+
+        async def emit(items: list) -> None:
+            if items:
+                await queue.put((url, subscribers, items))
+
+        try:
+            await _fetch_source(http, stype, url, emit)
+        except Exception as e:
+            print(f"❌ Źródło {url} nieudane: {e!r}")
+            stats["failed"] += 1
+        await queue.put((url, subscribers, None))  # koniec źródła
+
+    async def fetch_stage():
+        # wyjątki fetch_one wracają jako wartości; anulowanie (writer padł) kończy etap bez znacznika końca
+        await _gather_bounded(IMPORT_FETCH_CONCURRENCY, [fetch_one(k, v) for k, v in plan.items()])
+        await queue.put(None)
+
+    async def writer_stage():
+        while (job := await queue.get()) is not None:
+            url, subscribers, items = job
+            if items is None:
+                stats["sources_done"] += 1
+                if on_progress:
+                    await on_progress({**stats, **session.stats})
+                continue
+            incomplete.update(src_url for kind, _, src_url in items if kind == _INCOMPLETE)
+            items = [it for it in items if it[0] != _INCOMPLETE]
+            if not items:
+                continue
+            stats["items"] += len(items)
+            try:
+                await db_executor.run(_apply_for_subscribers, session, items, subscribers)
+                touched.update(src_url for _, _, src_url in items)
+            except Exception as e:
+                stats["errors"] += 1
+                incomplete.update(src_url for _, _, src_url in items)
+                print(f"❌ Zapis wydarzeń ze źródła {url} nieudany: {e!r}")
+                # nieudany rollback = sesja bezużyteczna: wyjątek przerywa import (pobieranie zostaje anulowane)
+                await db_executor.run(session.rollback)
+
+    # writer jest jedynym konsumentem ograniczonej kolejki — gdy padnie, producenci nie mogą czekać na put()
+    fetcher = asyncio.create_task(fetch_stage())
+    try:
+        await writer_stage()
+    finally:
+        fetcher.cancel()  # po normalnym końcu zadanie jest już zakończone — no-op
+        await asyncio.gather(fetcher, return_exceptions=True)
+    stats.update(session.stats)
+    if sync:
+        stats.update(await db_executor.run(session.finalize, touched - incomplete))
+    return stats
+
+async def import_events_for_university(db: Session, uni_name: str, http: httpx.AsyncClient, sources_map: dict,
+                                       on_progress: ProgressCallback | None = None):
+    return await import_events_plan(db, http, build_fetch_plan(sources_map, [uni_name]), on_progress=on_progress)
 
 def clean_duplicate_events(db: Session):
-    """Usuń duplikaty wydarzeń na podstawie podobieństwa tytułów i dat"""
-    from sqlalchemy import func, and_
-    
-    # Znajdź potencjalne duplikaty (te same tytuły w podobnym czasie)
-    duplicates = db.execute(
-        select(Event.title, func.count().label('count'))
-        .where(Event.status == "published")
-        .group_by(Event.title)
-        .having(func.count() > 1)
-    ).all()
-    
-    removed_count = 0
-    for title, count in duplicates:
-        # Znajdź wszystkie wydarzenia o tym tytule
-        events = db.execute(
-            select(Event).where(
-                Event.title == title,
-                Event.status == "published"
-            ).order_by(Event.updated_at.desc())
-        ).scalars().all()
-        
-        # Zostaw tylko najnowsze, usuń resztę
-        if len(events) > 1:
-            for event in events[1:]:  # Usuń wszystkie oprócz pierwszego (najnowszego)
-                db.delete(event)
-                removed_count += 1
-    
+    """Usuń duplikaty wydarzeń na podstawie tytułów — zostaje najnowsze (updated_at), jedno zapytanie na tabelę"""
+    from sqlalchemy import func
+
+    # Numeracja w obrębie tytułu od najnowszego; rn > 1 = do usunięcia.
+    # Wiersze z UID źródła (ICS: serie, nadpisania wystąpień — ten sam tytuł) i serie nie są duplikatami:
+    # identyfikuje je źródło, a usunięty wiersz wróciłby z następnym importem z nowym id, bez RSVP i reguły
+    ranked = (
+        select(
+            Event.id,
+            func.row_number().over(
+                partition_by=Event.title, order_by=(Event.updated_at.desc(), Event.id.desc())
+            ).label("rn"),
+        )
+        .where(Event.status == "published", Event.source_uid.is_(None),
+               ~Event.id.in_(select(EventRecurrence.event_id)))
+        .subquery()
+    )
+    duplicate_ids = select(ranked.c.id).where(ranked.c.rn > 1)
+
+    # Zależne wiersze najpierw (RSVP, klucze duplikatów, reguły serii) — ta sama transakcja, ten sam zbiór id
+    no_sync = {"synchronize_session": False}
+    db.execute(delete(UserEvent).where(UserEvent.event_id.in_(duplicate_ids)).execution_options(**no_sync))
+    db.execute(delete(EventTitleKey).where(EventTitleKey.event_id.in_(duplicate_ids)).execution_options(**no_sync))
+    db.execute(delete(EventRecurrence).where(EventRecurrence.event_id.in_(duplicate_ids)).execution_options(**no_sync))
+    removed_count = db.execute(
+        delete(Event).where(Event.id.in_(duplicate_ids)).execution_options(**no_sync)
+    ).rowcount or 0
     db.commit()
     print(f"🧹 Usunięto {removed_count} duplikatów wydarzeń")
     return removed_count
 
-async def import_events_all(db: Session, http: httpx.AsyncClient, sources_map: dict):
-    # Najpierw wyczyść stare duplikaty
-    clean_duplicate_events(db)
-    
-    for uni_name in sources_map.keys():
-        await import_events_for_university(db, uni_name, http, sources_map)
+async def import_events_all(db: Session, http: httpx.AsyncClient, sources_map: dict, sync: bool = False,
+                            on_progress: ProgressCallback | None = None):
+    # Najpierw wyczyść stare duplikaty (przy synchronizacji nie — usuwanie wierszy zabiera ich RSVP)
+    if not sync:
+        await db_executor.run(clean_duplicate_events, db)
+
+    return await import_events_plan(db, http, build_fetch_plan(sources_map), sync=sync, on_progress=on_progress)
 
 def build_event_ics(e) -> str:
     def fmt(dt: datetime | None):
@@ -0,0 +1,106 @@
+# app/services/feed_fetcher.py
+from __future__ import annotations
+import asyncio, hashlib, time
+from threading import Lock
+
+import httpx, feedparser
+
+from ..core import metrics
+from ..core.cache import MemoryCache
+from ..core.executor import parse_executor
+
+FEED_ACCEPT = "application/rss+xml, application/atom+xml, application/xml, */*"
+
+FEED_CACHE_TTL = 120.0  # przez tyle sekund wspólny wynik feedu nie jest w ogóle odpytywany
+FEED_STATE_MAX = 512    # pamiętanych feedów (LRU) — dowolne /news?q= to nowe URL-e Google News
+FEED_STATE_TTL = 6 * 3600.0  # nieużywany feed wypada po tylu sekundach (walidatory i tak się starzeją)
+
+# url -> {"etag", "last_modified", "digest", "parsed", "checked_at"}; słownik stanu modyfikujemy w miejscu
+_FEED_STATE = MemoryCache(max_entries=FEED_STATE_MAX)
+
+# url -> trwające pobranie (single-flight: współbieżni wołający czekają na jedno zapytanie)
+_FEED_INFLIGHT: dict[str, asyncio.Task] = {}
+
+_STATS = {"requests": 0, "not_modified": 0, "unchanged_body": 0, "parsed": 0, "errors": 0,
+          "cache_hits": 0, "coalesced": 0}
+_STATS_LOCK = Lock()
+
+def _bump(key: str) -> None:
+    with _STATS_LOCK:
+        _STATS[key] += 1
+
+def _stats() -> dict:
+    with _STATS_LOCK:
+        return {**_STATS, "tracked_urls": _FEED_STATE.size(), "inflight": len(_FEED_INFLIGHT)}
+
+metrics.register("feeds", _stats)
+
+async def fetch_feed(http: httpx.AsyncClient, url: str, timeout: float | None = None):
+    """
+    Pobiera i parsuje feed RSS/Atom z warunkowym GET.
+    Przy 304 albo identycznej treści zwraca poprzedni wynik bez ponownego parsowania.
+    """
+    state = _FEED_STATE.get(url)
+    headers = {"Accept": FEED_ACCEPT}
+    if state:
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+
+    _bump("requests")
+    try:
+        r = await http.get(url, headers=headers, timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT)
+        if r.status_code == 304 and state:
+            _bump("not_modified")
+            state["checked_at"] = time.time()
+            _FEED_STATE.set(url, state, ttl=FEED_STATE_TTL)
+            return state["parsed"]
+        r.raise_for_status()
+    except Exception:
+        _bump("errors")
+        return None
+
+    etag = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    digest = hashlib.sha256(r.content).hexdigest()
+    if state and state["digest"] == digest:
+        # serwer nie wspiera walidatorów, ale treść się nie zmieniła
+        _bump("unchanged_body")
+        state["etag"] = etag or state.get("etag")
+        state["last_modified"] = last_modified or state.get("last_modified")
+        state["checked_at"] = time.time()
+        _FEED_STATE.set(url, state, ttl=FEED_STATE_TTL)
+        return state["parsed"]
+
+    parsed = await parse_executor.run(feedparser.parse, r.content)
+    _bump("parsed")
+    _FEED_STATE.set(url, {
+        "etag": etag,
+        "last_modified": last_modified,
+        "digest": digest,
+        "parsed": parsed,
+        "checked_at": time.time(),
+    }, ttl=FEED_STATE_TTL)
+    return parsed
+
+async def get_feed(http: httpx.AsyncClient, url: str, timeout: float | None = None):
+    """
+    Wspólny (per URL) wynik feedu: świeży wpis z cache albo jedno współdzielone pobranie.
+    Ten sam feed wołany równolegle przez wiele zapytań (np. BOOK_RSS_FEEDS w /news/multi)
+    idzie w sieć raz, a wszyscy dostają ten sam sparsowany obiekt.
+    """
+    state = _FEED_STATE.get(url)
+    if state and time.time() - state.get("checked_at", 0) < FEED_CACHE_TTL:
+        _bump("cache_hits")
+        return state["parsed"]
+
+    task = _FEED_INFLIGHT.get(url)
+    if task is None:
+        task = asyncio.create_task(fetch_feed(http, url, timeout))
+        _FEED_INFLIGHT[url] = task
+        task.add_done_callback(lambda t, u=url: _FEED_INFLIGHT.pop(u, None) if _FEED_INFLIGHT.get(u) is t else None)
+    else:
+        _bump("coalesced")
+    # shield: anulowanie jednego wołającego nie przerywa pobrania pozostałym
+    return await asyncio.shield(task)
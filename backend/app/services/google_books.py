@@ -2,8 +2,24 @@ import requests
 import time
 from typing import List, Dict, Any, Optional
 
+from app.core import http_metrics
+
 GOOGLE_BOOKS_API = "https://www.googleapis.com/books/v1/volumes"
 GOOGLE_BOOKS_API_KEY: Optional[str] = None  # <- ustaw w .env i wczytaj np. os.getenv("GOOGLE_BOOKS_API_KEY")
+_GOOGLE_BOOKS_HOST = "www.googleapis.com"
+
+
+def _timed_get(url: str, **kwargs) -> requests.Response:
+    """requests.get z zapisem latencji/statusu/bajtów do metryk http (ten sam widok co httpx)"""
+    started = time.perf_counter()
+    try:
+        r = requests.get(url, **kwargs)
+    except requests.RequestException as e:
+        http_metrics.record_error(_GOOGLE_BOOKS_HOST, timeout=isinstance(e, requests.Timeout))
+        raise
+    http_metrics.record_response(_GOOGLE_BOOKS_HOST, r.status_code, time.perf_counter() - started)
+    http_metrics.record_bytes(_GOOGLE_BOOKS_HOST, len(r.content))
+    return r
 
 
 def search_google_books(query: str, max_results: int = 40) -> List[Dict[str, Any]]:
@@ -20,7 +36,7 @@ def search_google_books(query: str, max_results: int = 40) -> List[Dict[str, Any
         if GOOGLE_BOOKS_API_KEY:
             params["key"] = GOOGLE_BOOKS_API_KEY
 
-        r = requests.get(GOOGLE_BOOKS_API, params=params, timeout=4)
+        r = _timed_get(GOOGLE_BOOKS_API, params=params, timeout=4)
         if r.status_code == 429:
             # limit – spróbuj poczekać i ponowić
             time.sleep(0.3)
@@ -66,7 +82,7 @@ def get_google_book_by_id(google_id: str) -> dict | None:
     if GOOGLE_BOOKS_API_KEY:
         params["key"] = GOOGLE_BOOKS_API_KEY
 
-    r = requests.get(url, params=params)
+    r = _timed_get(url, params=params)
     if r.status_code != 200:
         return None
     item = r.json()
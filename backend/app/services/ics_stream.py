@@ -0,0 +1,73 @@
+# app/services/ics_stream.py
+"""
+Strumieniowe czytanie kalendarzy ICS.
+
+VEventSplitter dostaje kolejne kawałki treści odpowiedzi i oddaje gotowe bloki
+BEGIN:VEVENT … END:VEVENT (surowe bajty) — nie trzymamy w pamięci całego pliku ani drzewa
+Calendar. Bloki VTIMEZONE są zapamiętywane osobno i doklejane do każdej paczki przy parsowaniu,
+żeby TZID z niestandardową definicją strefy dalej się rozwiązywał.
+
+parse_vevents to zwykły generator (CPU) — uruchamiany w parse_executor, nie w event loopie.
+"""
+from __future__ import annotations
+from typing import Iterator
+
+from icalendar import Calendar
+
+_BEGIN_EVENT, _END_EVENT = b"BEGIN:VEVENT", b"END:VEVENT"
+_BEGIN_TZ, _END_TZ = b"BEGIN:VTIMEZONE", b"END:VTIMEZONE"
+
+
+class VEventSplitter:
+    """Dzieli strumień bajtów ICS na bloki VEVENT; linie zawinięte (spacja/tab na początku) zostają w bloku"""
+
+    def __init__(self):
+        self.timezones: list[bytes] = []
+        self._tail = b""
+        self._block: list[bytes] | None = None
+        self._in_tz = False
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        lines = (self._tail + chunk).split(b"\n")
+        self._tail = lines.pop()  # niepełna ostatnia linia czeka na kolejny kawałek
+        return self._consume(lines)
+
+    def close(self) -> list[bytes]:
+        tail, self._tail = self._tail, b""
+        return self._consume([tail]) if tail else []
+
+    def _consume(self, lines: list[bytes]) -> list[bytes]:
+        done = []
+        for line in lines:
+            line = line.rstrip(b"\r")
+            tag = line.rstrip().upper()
+            if self._block is not None:
+                self._block.append(line)
+                if tag == _END_EVENT:
+                    done.append(b"\r\n".join(self._block))
+                    self._block = None
+            elif tag == _BEGIN_EVENT:
+                self._block = [line]
+            elif tag == _BEGIN_TZ:
+                self._in_tz = True
+                self.timezones.append(line)
+            elif self._in_tz:
+                self.timezones[-1] += b"\r\n" + line
+                self._in_tz = tag != _END_TZ
+        return done
+
+
+def _wrap(blocks: list[bytes], timezones: list[bytes]) -> bytes:
+    return b"\r\n".join([b"BEGIN:VCALENDAR", b"VERSION:2.0", *timezones, *blocks, b"END:VCALENDAR"])
+
+
+def parse_vevents(blocks: list[bytes], timezones: list[bytes]) -> Iterator:
+    """Komponenty VEVENT z paczki bloków; uszkodzony blok pomijamy, nie całą paczkę"""
+    try:
+        yield from Calendar.from_ical(_wrap(blocks, timezones)).walk("vevent")
+        return
+    except Exception:
+        if len(blocks) == 1:
+            return
+    for block in blocks:
+        yield from parse_vevents([block], timezones)
@@ -0,0 +1,172 @@
+# app/services/import_jobs.py
+"""
+Importy wydarzeń jako zadania w tle.
+
+Zadanie = wiersz import_jobs (stan i postęp: /events/import/jobs/{id}) + asyncio.Task w procesie,
+który je przyjął. Na jeden zestaw źródeł (source_key) działa najwyżej jeden import: między workerami
+pilnuje tego unikalny indeks częściowy na aktywnych wierszach (działa bez wspólnego cache), w procesie
+— słownik aktywnych zadań. Worker wykonujący zadanie odnawia heartbeat_at; aktywne zadanie z
+nieodnawianym heartbeatem (proces padł, restart) jest oznaczane jako nieudane.
+"""
+from __future__ import annotations
+import asyncio, time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core.executor import db_executor
+from ..db.database import SessionLocal
+from ..models.import_job import ImportJob
+
+HEARTBEAT_EVERY = 30      # co ile sekund worker potwierdza, że zadanie żyje
+HEARTBEAT_STALE = 120     # po tylu sekundach bez heartbeatu zadanie uznajemy za przerwane
+_PROGRESS_EVERY = 1.0     # postęp zapisywany do bazy najwyżej raz na sekundę
+_ACTIVE_STATUSES = ("queued", "running")
+
+# run(db, on_progress) -> statystyki końcowe; db to sesja należąca do zadania
+JobRun = Callable[[Session, Callable[[dict], Awaitable[None]]], Awaitable[dict]]
+
+_ACTIVE: dict[str, int] = {}            # source_key -> id zadania w tym procesie
+_TASKS: dict[int, asyncio.Task] = {}
+_SUBMIT_LOCK = asyncio.Lock()
+
+def job_dict(job: ImportJob) -> dict:
+    iso = lambda dt: dt.isoformat() if dt else None
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "source_key": job.source_key,
+        "status": job.status,
+        "progress": job.progress or {},
+        "error": job.error,
+        "created_at": iso(job.created_at),
+        "started_at": iso(job.started_at),
+        "finished_at": iso(job.finished_at),
+    }
+
+# --- baza (wywoływane w db_executor, każda operacja na krótkiej, własnej sesji) ---
+def get_job(job_id: int) -> dict | None:
+    with SessionLocal() as db:
+        job = db.get(ImportJob, job_id)
+        return job_dict(job) if job else None
+
+def list_jobs(limit: int = 20) -> list[dict]:
+    with SessionLocal() as db:
+        rows = db.execute(select(ImportJob).order_by(ImportJob.id.desc()).limit(limit)).scalars().all()
+        return [job_dict(j) for j in rows]
+
+def _stale_before() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=HEARTBEAT_STALE)
+
+def _claim_job(kind: str, source_key: str) -> tuple[dict | None, bool]:
+    """
+    Nowe zadanie dla zestawu źródeł albo (aktywne zadanie, False), gdy import już trwa — także w innym
+    workerze (konflikt na uq_import_jobs_active_source). Zadanie bez heartbeatu jest zamykane i zastępowane.
+    """
+    with SessionLocal() as db:
+        for _ in range(3):
+            job = ImportJob(kind=kind, source_key=source_key, status="queued", progress={},
+                            heartbeat_at=datetime.utcnow())
+            db.add(job)
+            try:
+                db.commit()
+                db.refresh(job)
+                return job_dict(job), True
+            except IntegrityError:
+                db.rollback()
+            active = db.execute(
+                select(ImportJob).where(ImportJob.source_key == source_key, ImportJob.status.in_(_ACTIVE_STATUSES))
+            ).scalar_one_or_none()
+            if active is None:
+                continue  # zakończyło się w międzyczasie
+            if (active.heartbeat_at or active.created_at) < _stale_before():
+                active.status, active.error, active.finished_at = "failed", "Przerwane (brak heartbeatu)", datetime.utcnow()
+                db.commit()
+                continue
+            return job_dict(active), False
+        return None, False
+
+def _set(job_id: int, **values) -> None:
+    with SessionLocal() as db:
+        db.execute(update(ImportJob).where(ImportJob.id == job_id).values(**values))
+        db.commit()
+
+def recover_interrupted_jobs() -> int:
+    """Przy starcie: aktywne zadania bez świeżego heartbeatu (proces padł / restart) oznacz jako nieudane"""
+    with SessionLocal() as db:
+        res = db.execute(
+            update(ImportJob)
+            .where(ImportJob.status.in_(_ACTIVE_STATUSES),
+                   func.coalesce(ImportJob.heartbeat_at, ImportJob.created_at) < _stale_before())
+            .values(status="failed", error="Przerwane (restart serwera)", finished_at=datetime.utcnow())
+        )
+        db.commit()
+        return res.rowcount or 0
+
+# --- wykonanie ---
+async def _heartbeat(job_id: int) -> None:
+    while True:
+        await asyncio.sleep(HEARTBEAT_EVERY)
+        try:
+            await db_executor.run(_set, job_id, heartbeat_at=datetime.utcnow())
+        except Exception as e:
+            print(f"⚠️ Heartbeat importu {job_id} nieudany: {e!r}")
+
+async def _run(job_id: int, source_key: str, run: JobRun) -> None:
+    last_saved = 0.0
+
+    async def on_progress(snapshot: dict) -> None:
+        nonlocal last_saved
+        if time.monotonic() - last_saved < _PROGRESS_EVERY:
+            return
+        last_saved = time.monotonic()
+        await db_executor.run(_set, job_id, progress=dict(snapshot), heartbeat_at=datetime.utcnow())
+
+    db = SessionLocal()
+    beat = asyncio.create_task(_heartbeat(job_id))
+    try:
+        await db_executor.run(_set, job_id, status="running", started_at=datetime.utcnow(),
+                              heartbeat_at=datetime.utcnow())
+        stats = await run(db, on_progress)
+        await db_executor.run(_set, job_id, status="done", progress=stats, finished_at=datetime.utcnow())
+        print(f"✅ Import {job_id} ({source_key}) zakończony: {stats}")
+    except asyncio.CancelledError:
+        await db_executor.run(db.rollback)
+        await db_executor.run(_set, job_id, status="failed", error="Przerwane (zamknięcie serwera)",
+                              finished_at=datetime.utcnow())
+        raise
+    except Exception as e:
+        await db_executor.run(db.rollback)
+        print(f"❌ Import {job_id} ({source_key}) nieudany: {e!r}")
+        await db_executor.run(_set, job_id, status="failed", error=repr(e), finished_at=datetime.utcnow())
+    finally:
+        beat.cancel()
+        _ACTIVE.pop(source_key, None)
+        _TASKS.pop(job_id, None)
+        await db_executor.run(db.close)  # zwrot połączenia (z rollbackiem) to też I/O bazy
+
+async def submit(kind: str, source_key: str, run: JobRun) -> tuple[dict | None, bool]:
+    """
+    (zadanie, czy_nowe). Gdy import tego zestawu źródeł już trwa (w tym albo innym workerze) — jego
+    zadanie i False; None, gdy nie udało się ani go odczytać, ani założyć nowego.
+    """
+    async with _SUBMIT_LOCK:
+        job_id = _ACTIVE.get(source_key)
+        if job_id is not None:
+            return await db_executor.run(get_job, job_id), False
+
+        job, created = await db_executor.run(_claim_job, kind, source_key)
+        if not created:
+            return job, False
+        _ACTIVE[source_key] = job["id"]
+        _TASKS[job["id"]] = asyncio.create_task(_run(job["id"], source_key, run))
+        return job, True
+
+async def stop_import_jobs() -> None:
+    tasks = list(_TASKS.values())
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
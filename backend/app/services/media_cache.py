@@ -0,0 +1,246 @@
+# app/services/media_cache.py
+"""
+Lokalny cache obrazków (okładki, miniatury newsów, favicony) serwowanych przez /media/proxy.
+
+Pliki są adresowane treścią (sha256 bajtów) w MEDIA_CACHE_DIR/blobs, a mapowanie
+(URL źródłowy, szerokość) -> blob leży w MEDIA_CACHE_DIR/keys. Po przekroczeniu
+MEDIA_CACHE_MAX_BYTES usuwane są najdawniej używane bloby.
+"""
+from __future__ import annotations
+import asyncio, hashlib, hmac, io, json, os, time
+from pathlib import Path
+from threading import Lock
+from urllib.parse import urlencode, urlsplit, parse_qs
+
+import httpx
+
+from ..core import metrics
+from ..core.auth import SECRET_KEY
+from ..core.executor import parse_executor
+
+try:  # opcjonalnie: bez Pillow serwujemy oryginał bez skalowania
+    from PIL import Image
+except ImportError:
+    Image = None
+
+MEDIA_CACHE_DIR = Path(os.getenv("MEDIA_CACHE_DIR", "media_cache"))
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+MEDIA_MAX_SOURCE_BYTES = 5 * 1024 * 1024
+# adres backendu widziany przez przeglądarkę (klient działa na innym porcie niż API)
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://127.0.0.1:8000").rstrip("/")
+PROXY_PATH = "/media/proxy"
+
+# dozwolone szerokości (karty w UI) — stała lista, żeby nie mnożyć wariantów w cache
+ALLOWED_WIDTHS = (64, 128, 256, 320, 512)
+BOOK_THUMB_WIDTH = 256   # okładka na karcie książki / rankingu
+NEWS_THUMB_WIDTH = 320   # miniatura 160px na karcie newsa (x2 dla ekranów HiDPI)
+
+# tylko formaty rastrowe — SVG (może zawierać skrypt) nie jest serwowany z naszego originu;
+# ICO (favicony z icons.duckduckgo.com) zapisujemy bez skalowania, jak GIF/AVIF
+ALLOWED_CONTENT_TYPES = frozenset({
+    "image/jpeg", "image/png", "image/webp", "image/gif", "image/avif",
+    "image/x-icon", "image/vnd.microsoft.icon",
+})
+
+_TOUCH_EVERY = 3600  # aktualizacja mtime bloba (czas użycia dla LRU) najwyżej raz na godzinę
+
+_INFLIGHT: dict[str, asyncio.Task] = {}
+_LOCK = Lock()
+_STATE = {"total_bytes": None}
+_STATS = {"hits": 0, "fetches": 0, "errors": 0, "resized": 0, "evicted": 0}
+
+def _stats() -> dict:
+    with _LOCK:
+        return {**_STATS, "total_bytes": _STATE["total_bytes"], "max_bytes": MEDIA_CACHE_MAX_BYTES,
+                "resize": Image is not None}
+
+metrics.register("media_cache", _stats)
+
+# --- URL-e proxy ---
+def _sign(url: str, w: int | None) -> str:
+    msg = f"{url}|{w or ''}".encode("utf-8")
+    return hmac.new(SECRET_KEY.encode("utf-8"), msg, hashlib.sha256).hexdigest()[:20]
+
+def verify_signature(url: str, w: int | None, sig: str) -> bool:
+    return hmac.compare_digest(_sign(url, w), sig or "")
+
+def proxied_url(url: str | None, w: int | None = None) -> str | None:
+    """Zamienia zewnętrzny URL obrazka na podpisany URL /media/proxy (inne wartości bez zmian)"""
+    if not url or not url.startswith(("http://", "https://")) or url.startswith(PUBLIC_BASE_URL + PROXY_PATH):
+        return url
+    params = {"url": url}
+    if w:
+        params["w"] = w
+    params["sig"] = _sign(url, w)
+    return f"{PUBLIC_BASE_URL}{PROXY_PATH}?{urlencode(params)}"
+
+def original_url(url: str | None) -> str | None:
+    """Odwrotność proxied_url — do zapisu w bazie trafia zawsze adres źródłowy"""
+    if url and url.startswith(PUBLIC_BASE_URL + PROXY_PATH):
+        return (parse_qs(urlsplit(url).query).get("url") or [url])[0]
+    return url
+
+# --- Dysk ---
+def _key_path(key: str) -> Path:
+    return MEDIA_CACHE_DIR / "keys" / key[:2] / f"{key}.json"
+
+def _blob_path(digest: str) -> Path:
+    return MEDIA_CACHE_DIR / "blobs" / digest[:2] / digest
+
+def _cache_key(url: str, w: int | None) -> str:
+    return hashlib.sha256(f"{url}|{w or ''}".encode("utf-8")).hexdigest()
+
+def lookup(url: str, w: int | None) -> tuple[Path, str, str] | None:
+    """(ścieżka bloba, content-type, digest) albo None"""
+    try:
+        meta = json.loads(_key_path(_cache_key(url, w)).read_text())
+    except (OSError, ValueError):
+        return None
+    blob = _blob_path(meta["digest"])
+    try:
+        st = blob.stat()
+    except OSError:
+        _unlink(_key_path(_cache_key(url, w)))
+        return None  # blob usunięty przez eviction — pobierz ponownie
+    if meta.get("content_type") not in ALLOWED_CONTENT_TYPES:
+        return None  # wpis sprzed zawężenia typów — nie serwujemy
+    if time.time() - st.st_mtime > _TOUCH_EVERY:
+        try:
+            os.utime(blob)
+        except OSError:
+            pass
+    with _LOCK:
+        _STATS["hits"] += 1
+    return blob, meta["content_type"], meta["digest"]
+
+def _unlink(p: Path) -> None:
+    try:
+        p.unlink()
+    except OSError:
+        pass
+
+def _drop_keys(digests: set[str]) -> None:
+    """Usuwa wpisy keys/ wskazujące na usunięte bloby"""
+    for p in (MEDIA_CACHE_DIR / "keys").glob("*/*.json"):
+        try:
+            if json.loads(p.read_text()).get("digest") in digests:
+                p.unlink()
+        except (OSError, ValueError):
+            _unlink(p)  # uszkodzony wpis
+
+def _disk_usage() -> int:
+    total = 0
+    for p in (MEDIA_CACHE_DIR / "blobs").glob("*/*"):
+        try:
+            total += p.stat().st_size
+        except OSError:
+            pass
+    return total
+
+def _evict_if_needed() -> None:
+    """Usuwa najdawniej używane bloby, aż cache zmieści się w 90% limitu"""
+    with _LOCK:
+        total = _STATE["total_bytes"]
+    if total is None:
+        total = _disk_usage()
+    if total <= MEDIA_CACHE_MAX_BYTES:
+        with _LOCK:
+            _STATE["total_bytes"] = total
+        return
+    blobs = []
+    for p in (MEDIA_CACHE_DIR / "blobs").glob("*/*"):
+        try:
+            st = p.stat()
+            blobs.append((st.st_mtime, st.st_size, p))
+        except OSError:
+            pass
+    blobs.sort()
+    target, evicted = int(MEDIA_CACHE_MAX_BYTES * 0.9), set()
+    for _, size, p in blobs:
+        if total <= target:
+            break
+        try:
+            p.unlink()
+            total -= size
+            evicted.add(p.name)
+        except OSError:
+            pass
+    _drop_keys(evicted)  # eviction jest rzadkie (przekroczony limit), więc pełny przegląd keys/ jest tani
+    with _LOCK:
+        _STATE["total_bytes"] = total
+        _STATS["evicted"] += len(evicted)
+
+def _downscale(data: bytes, content_type: str, w: int) -> tuple[bytes, str]:
+    """Skaluje do szerokości w (tylko zmniejszanie); formaty inne niż JPEG/PNG/WebP bez zmian"""
+    if Image is None or content_type not in ("image/jpeg", "image/png", "image/webp"):
+        return data, content_type
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            if im.width <= w:
+                return data, content_type
+            im.thumbnail((w, w * 4))
+            out = io.BytesIO()
+            fmt = {"image/jpeg": "JPEG", "image/png": "PNG", "image/webp": "WEBP"}[content_type]
+            if fmt == "JPEG" and im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            im.save(out, format=fmt, quality=85, optimize=True)
+        with _LOCK:
+            _STATS["resized"] += 1
+        return out.getvalue(), content_type
+    except Exception:
+        return data, content_type
+
+def _write(url: str, w: int | None, data: bytes, content_type: str) -> tuple[Path, str, str]:
+    digest = hashlib.sha256(data).hexdigest()
+    blob = _blob_path(digest)
+    if not blob.exists():
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp = blob.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, blob)  # atomowo — równoległe workery nie widzą połowy pliku
+        with _LOCK:
+            if _STATE["total_bytes"] is not None:
+                _STATE["total_bytes"] += len(data)
+    key_file = _key_path(_cache_key(url, w))
+    key_file.parent.mkdir(parents=True, exist_ok=True)
+    key_file.write_text(json.dumps({"digest": digest, "content_type": content_type, "url": url, "w": w}))
+    _evict_if_needed()
+    return blob, content_type, digest
+
+def _process_and_store(url: str, w: int | None, data: bytes, content_type: str) -> tuple[Path, str, str]:
+    if w:
+        data, content_type = _downscale(data, content_type, w)
+    return _write(url, w, data, content_type)
+
+async def _fetch(http: httpx.AsyncClient, url: str, w: int | None) -> tuple[Path, str, str] | None:
+    try:
+        async with http.stream("GET", url, headers={"Accept": "image/*"}, timeout=7.0) as r:
+            r.raise_for_status()
+            content_type = (r.headers.get("content-type") or "").split(";")[0].strip().lower()
+            if content_type not in ALLOWED_CONTENT_TYPES:
+                raise ValueError(f"unsupported image type: {content_type!r}")
+            buf = bytearray()
+            async for chunk in r.aiter_bytes():
+                buf.extend(chunk)
+                if len(buf) > MEDIA_MAX_SOURCE_BYTES:
+                    raise ValueError("image too large")
+    except Exception:
+        with _LOCK:
+            _STATS["errors"] += 1
+        return None
+    with _LOCK:
+        _STATS["fetches"] += 1
+    return await parse_executor.run(_process_and_store, url, w, bytes(buf), content_type)
+
+async def get_or_fetch(http: httpx.AsyncClient, url: str, w: int | None) -> tuple[Path, str, str] | None:
+    """Blob z dysku albo jedno (współdzielone) pobranie ze źródła"""
+    hit = await parse_executor.run(lookup, url, w)
+    if hit:
+        return hit
+    key = _cache_key(url, w)
+    task = _INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch(http, url, w))
+        _INFLIGHT[key] = task
+        task.add_done_callback(lambda t, k=key: _INFLIGHT.pop(k, None) if _INFLIGHT.get(k) is t else None)
+    return await asyncio.shield(task)
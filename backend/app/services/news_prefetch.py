@@ -0,0 +1,68 @@
+# app/services/news_prefetch.py
+from __future__ import annotations
+import asyncio, time
+
+from ..api.routes_news import ALL_NEWS_KEY, _NEWS_CACHE_TTL, schedule_news_refresh, warm_news_cache, news_age
+from ..constants.univeristy_queries import UNI_NEWS_QUERIES
+from ..core.executor import db_executor
+from ..core.cache import cache
+from . import og_cache, news_store
+
+# Odświeżamy przed wygaśnięciem TTL, żeby żądania zawsze trafiały w ciepły cache
+PREFETCH_INTERVAL = _NEWS_CACHE_TTL * 0.8
+PREFETCH_CONCURRENCY = 2  # ile uczelni budujemy naraz (każda to kilkanaście feedów)
+
+_task: asyncio.Task | None = None
+
+def prefetch_keys() -> list[str]:
+    return list(UNI_NEWS_QUERIES.keys()) + [ALL_NEWS_KEY]
+
+async def prefetch_all_news() -> None:
+    """Buduje newsy dla wszystkich uczelni i widoku "wszystkie" """
+    keys = prefetch_keys()
+    semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+    async def one(key: str):
+        age = await news_age(key)
+        if age is not None and age < PREFETCH_INTERVAL / 2:
+            return  # przy wielu workerach: klucz właśnie odświeżył inny proces
+        async with semaphore:
+            await schedule_news_refresh(key, capped=False)
+
+    results = await asyncio.gather(*[one(k) for k in keys], return_exceptions=True)
+    for key, res in zip(keys, results):
+        if isinstance(res, Exception):
+            print(f"❌ Prefetch newsów '{key}' nieudany: {res!r}")
+    await cache.apurge_expired()
+    try:
+        await db_executor.run(og_cache.purge_expired)
+        await db_executor.run(news_store.purge_old_news)
+    except Exception as e:
+        print(f"❌ Czyszczenie og_cache/news_items nieudane: {e!r}")
+
+async def _prefetch_loop() -> None:
+    # najpierw to, co już jest w bazie — pierwsze żądania po restarcie nie czekają na sieć
+    await warm_news_cache(prefetch_keys())
+    while True:
+        started = time.time()
+        try:
+            await prefetch_all_news()
+            print(f"📰 Prefetch newsów zakończony w {time.time() - started:.1f}s")
+        except Exception as e:
+            print(f"❌ Błąd prefetchu newsów: {e!r}")
+        await asyncio.sleep(max(5.0, PREFETCH_INTERVAL - (time.time() - started)))
+
+def start_news_prefetcher() -> None:
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_prefetch_loop())
+
+async def stop_news_prefetcher() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _task = None
@@ -0,0 +1,161 @@
+# app/services/news_store.py
+from __future__ import annotations
+import base64, hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+from dateutil import parser as dtp
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.db.database import SessionLocal
+from app.models.news import NewsArticle, NewsArticleUniversity
+from .og_cache import canonical_url
+
+NEWS_RETENTION_DAYS = 400  # newsy i tak filtrujemy do ostatniego roku
+
+_FIELDS = ("link", "title", "source", "publisher_domain", "publisher_favicon", "snippet", "thumbnail", "date")
+
+def article_id(link: str) -> str:
+    """Klucz deduplikacji: sha256 kanonicznego linku (bez utm_/fbclid, fragmentu itp.)"""
+    return hashlib.sha256(canonical_url(link).encode("utf-8")).hexdigest()
+
+def _parse_date(s: str | None) -> datetime | None:
+    """Data z feedu (RFC 822 albo ISO) -> naiwny UTC"""
+    if not s:
+        return None
+    try:
+        dt = parsedate_to_datetime(s)
+    except (TypeError, ValueError):
+        try:
+            dt = dtp.parse(s)
+        except (ValueError, OverflowError):
+            return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def encode_cursor(published_at: datetime, item_id: str) -> str:
+    raw = f"{published_at.isoformat()}|{item_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, str] | None:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        ts, item_id = raw.split("|", 1)
+        return datetime.fromisoformat(ts), item_id
+    except Exception:
+        return None
+
+def _insert_for(db):
+    """INSERT … ON CONFLICT właściwy dla bazy (PostgreSQL na produkcji, SQLite lokalnie)"""
+    return pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+def upsert_news(university: str, items: list) -> int:
+    """
+    Zapisuje newsy (NewsItem albo dict) do news_items i oznacza je kluczem uczelni — wywoływać w db_executor.
+    Dwa INSERT … ON CONFLICT (artykuły, oznaczenia), więc równoległe odświeżenia różnych uczelni
+    zapisujące te same artykuły (BOOK_RSS_FEEDS) nie wykluczają się nawzajem.
+    """
+    now = datetime.utcnow()
+    rows: dict[str, dict] = {}
+    for it in items:
+        data = it if isinstance(it, dict) else it.model_dump()
+        if not data.get("link"):
+            continue
+        item_id = article_id(data["link"])
+        rows.setdefault(item_id, {
+            "id": item_id, **{f: data.get(f) for f in _FIELDS},
+            "published_at": _parse_date(data.get("date")) or now, "fetched_at": now,
+        })
+    if not rows:
+        return 0
+
+    db = SessionLocal()
+    try:
+        insert = _insert_for(db)
+        stmt = insert(NewsArticle)
+        # nie nadpisuj wzbogaconych pól (OG) pustymi wartościami; published_at zostaje z pierwszego zapisu
+        keep = {f: func.coalesce(func.nullif(stmt.excluded[f], ""), getattr(NewsArticle, f)) for f in _FIELDS}
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[NewsArticle.id], set_={**keep, "fetched_at": stmt.excluded.fetched_at},
+        ).returning(NewsArticle.id, NewsArticle.published_at)
+        # stała kolejność kluczy — równoległe upserty blokują wiersze w tej samej kolejności (bez zakleszczeń)
+        published = dict(db.execute(stmt, [rows[k] for k in sorted(rows)]).all())
+
+        tags = insert(NewsArticleUniversity)
+        tags = tags.on_conflict_do_update(
+            index_elements=[NewsArticleUniversity.item_id, NewsArticleUniversity.university],
+            set_={"published_at": tags.excluded.published_at},
+        )
+        db.execute(tags, [
+            {"item_id": item_id, "university": university, "published_at": published[item_id]}
+            for item_id in sorted(published)
+        ])
+        db.commit()
+        return len(rows)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def read_news_page(university: str, limit: int, cursor: str | None = None) -> tuple[list[dict], str | None]:
+    """Strona newsów uczelni od najnowszych (keyset po (published_at, id)) + kursor następnej strony"""
+    db = SessionLocal()
+    try:
+        q = (
+            db.query(NewsArticle, NewsArticleUniversity.published_at)
+            .join(NewsArticleUniversity, NewsArticleUniversity.item_id == NewsArticle.id)
+            .filter(NewsArticleUniversity.university == university)
+        )
+        after = decode_cursor(cursor) if cursor else None
+        if after:
+            ts, item_id = after
+            q = q.filter(or_(
+                NewsArticleUniversity.published_at < ts,
+                and_(NewsArticleUniversity.published_at == ts, NewsArticleUniversity.item_id < item_id),
+            ))
+        rows = (
+            q.order_by(NewsArticleUniversity.published_at.desc(), NewsArticleUniversity.item_id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        items = [{f: getattr(a, f) for f in _FIELDS} for a, _ in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last, last_ts = rows[limit - 1]
+            next_cursor = encode_cursor(last_ts, last.id)
+        return items, next_cursor
+    finally:
+        db.close()
+
+def latest_fetch(university: str) -> float | None:
+    """Czas (epoch) ostatniego zapisu newsów danej uczelni — do rozgrzania cache po restarcie"""
+    db = SessionLocal()
+    try:
+        ts = (
+            db.query(func.max(NewsArticle.fetched_at))
+            .join(NewsArticleUniversity, NewsArticleUniversity.item_id == NewsArticle.id)
+            .filter(NewsArticleUniversity.university == university)
+            .scalar()
+        )
+        return (ts - datetime(1970, 1, 1)).total_seconds() if ts else None
+    finally:
+        db.close()
+
+def purge_old_news() -> int:
+    """Usuwa artykuły starsze niż NEWS_RETENTION_DAYS (razem z przypisaniami do uczelni)"""
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=NEWS_RETENTION_DAYS)
+        old_ids = [i for (i,) in db.query(NewsArticle.id).filter(NewsArticle.published_at < cutoff).all()]
+        if not old_ids:
+            return 0
+        db.query(NewsArticleUniversity).filter(NewsArticleUniversity.item_id.in_(old_ids)).delete(synchronize_session=False)
+        n = db.query(NewsArticle).filter(NewsArticle.id.in_(old_ids)).delete(synchronize_session=False)
+        db.commit()
+        return n
+    finally:
+        db.close()
@@ -0,0 +1,115 @@
+# app/services/og_cache.py
+from __future__ import annotations
+import time
+from datetime import datetime, timedelta
+from threading import Lock
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from sqlalchemy.exc import IntegrityError
+
+from app.db.database import SessionLocal
+from app.models.og_cache import OgCache
+from app.core import metrics
+from app.core.cache import cache
+
+OG_POSITIVE_TTL = 24 * 3600   # udane pobranie (także strona bez meta OG)
+OG_NEGATIVE_TTL = 30 * 60     # błąd sieci/HTTP — szybciej próbujemy ponownie
+
+# parametry śledzące, które nie zmieniają treści artykułu
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ocid")
+
+# szybka warstwa: wspólny cache (app/core/cache.py), "og:<kanoniczny URL>" -> dane
+_CACHE_PREFIX = "og:"
+_LOCK = Lock()
+_STATS = {"cache_hits": 0, "db_hits": 0, "misses": 0, "stores": 0}
+
+def _stats() -> dict:
+    with _LOCK:
+        return dict(_STATS)
+
+metrics.register("og_cache", _stats)
+
+def canonical_url(url: str) -> str:
+    """Klucz cache: małe litery w schemacie/hoście, bez fragmentu i parametrów śledzących"""
+    try:
+        p = urlsplit(url.strip())
+        query = urlencode([
+            (k, v) for k, v in parse_qsl(p.query, keep_blank_values=True)
+            if not k.lower().startswith(_TRACKING_PARAMS)
+        ])
+        path = p.path or "/"
+        return urlunsplit((p.scheme.lower(), p.netloc.lower(), path, query, ""))
+    except Exception:
+        return url
+
+def _fresh(fetched_at: float, ok: bool) -> bool:
+    return time.time() - fetched_at < (OG_POSITIVE_TTL if ok else OG_NEGATIVE_TTL)
+
+def _remember(key: str, fetched_at: float, ok: bool, data: dict) -> None:
+    # TTL wpisu = czas, jaki został do wygaśnięcia (dodatni albo ujemny)
+    ttl = (OG_POSITIVE_TTL if ok else OG_NEGATIVE_TTL) - (time.time() - fetched_at)
+    if ttl > 0:
+        cache.set(_CACHE_PREFIX + key, data, ttl=ttl, tags=("og",))
+
+def get_cached(key: str) -> dict | None:
+    data = cache.get(_CACHE_PREFIX + key)
+    if data is not None:
+        with _LOCK: _STATS["cache_hits"] += 1
+    return data
+
+async def aget_cached(key: str) -> dict | None:
+    """get_cached dla kodu async — odczyt z backendu cache poza event loopem"""
+    data = await cache.aget(_CACHE_PREFIX + key)
+    if data is not None:
+        with _LOCK: _STATS["cache_hits"] += 1
+    return data
+
+def load_cached(key: str) -> dict | None:
+    """Odczyt z tabeli og_cache (wspólnej dla wszystkich workerów) — wywoływać w db_executor"""
+    db = SessionLocal()
+    try:
+        row = db.get(OgCache, key)
+        if not row or not row.fetched_at:
+            with _LOCK: _STATS["misses"] += 1
+            return None
+        fetched_at = (row.fetched_at - datetime(1970, 1, 1)).total_seconds()
+        if not _fresh(fetched_at, bool(row.ok)):
+            with _LOCK: _STATS["misses"] += 1
+            return None
+        data = row.data or {}
+        _remember(key, fetched_at, bool(row.ok), data)
+        with _LOCK: _STATS["db_hits"] += 1
+        return data
+    finally:
+        db.close()
+
+def store(key: str, data: dict, ok: bool) -> None:
+    """Zapis do wspólnego cache i tabeli og_cache — wywoływać w db_executor"""
+    now = datetime.utcnow()
+    _remember(key, (now - datetime(1970, 1, 1)).total_seconds(), ok, data)
+    db = SessionLocal()
+    try:
+        row = db.get(OgCache, key)
+        if row:
+            row.data, row.ok, row.fetched_at = data, ok, now
+        else:
+            db.add(OgCache(url=key, data=data, ok=ok, fetched_at=now))
+        try:
+            db.commit()
+        except IntegrityError:
+            # inny worker zapisał ten sam URL w międzyczasie
+            db.rollback()
+        with _LOCK: _STATS["stores"] += 1
+    finally:
+        db.close()
+
+def purge_expired() -> int:
+    """Usuwa z tabeli wpisy starsze niż dodatni TTL"""
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(seconds=OG_POSITIVE_TTL)
+        n = db.query(OgCache).filter(OgCache.fetched_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+        return n
+    finally:
+        db.close()
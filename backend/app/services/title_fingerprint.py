@@ -0,0 +1,59 @@
+# app/services/title_fingerprint.py
+"""
+Odcisk tytułu wydarzenia do wykrywania (prawie) duplikatów.
+
+- title_tokens: małe litery, bez polskich znaków i interpunkcji
+- klucz "fp:…": posortowane unikalne tokeny — ten sam tytuł z inną kolejnością słów daje ten sam klucz
+- klucze "b<i>:…": MinHash zbioru tokenów pocięty na pasma (LSH) — tytuły różniące się
+  pojedynczym słowem z dużym prawdopodobieństwem dzielą co najmniej jedno pasmo
+
+Klucze trafiają do indeksowanej tabeli event_title_keys, więc szukanie kandydatów to
+zapytanie po indeksie (klucz, start_at), a nie ilike z wiodącym '%'.
+"""
+from __future__ import annotations
+import hashlib, random, re, unicodedata
+from functools import lru_cache
+
+MINHASH_PERMUTATIONS = 16
+LSH_BANDS = 8                     # 8 pasm po 2 wiersze: podobieństwo 0.7 -> kandydat w ~99.5% przypadków
+SIMILARITY_THRESHOLD = 0.7        # część wspólnych słów (względem dłuższego tytułu)
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240611)    # stałe współczynniki — klucze muszą być takie same w każdym procesie
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(MINHASH_PERMUTATIONS)]
+_ROWS_PER_BAND = MINHASH_PERMUTATIONS // LSH_BANDS
+
+_WORD = re.compile(r"\w+")
+
+def _digest(s: str) -> str:
+    return hashlib.blake2b(s.encode("utf-8"), digest_size=8).hexdigest()
+
+@lru_cache(maxsize=8192)
+def title_tokens(title: str) -> frozenset[str]:
+    text = unicodedata.normalize("NFKD", (title or "").lower().replace("ł", "l"))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return frozenset(_WORD.findall(text))
+
+def _minhash(tokens: frozenset[str]) -> list[int]:
+    hashed = [int(_digest(t), 16) for t in tokens]
+    return [min((a * h + b) % _PRIME for h in hashed) for a, b in _PERMUTATIONS]
+
+@lru_cache(maxsize=8192)
+def title_keys(title: str) -> tuple[str, ...]:
+    """Klucze wyszukiwania: odcisk "fp:…" + pasma LSH "b<i>:…" (pusty tytuł = brak kluczy)"""
+    tokens = title_tokens(title)
+    if not tokens:
+        return ()
+    keys = ["fp:" + _digest(" ".join(sorted(tokens)))]
+    sig = _minhash(tokens)
+    for i in range(LSH_BANDS):
+        band = sig[i * _ROWS_PER_BAND:(i + 1) * _ROWS_PER_BAND]
+        keys.append(f"b{i}:" + _digest(",".join(map(str, band))))
+    return tuple(keys)
+
+def titles_similar(a: str, b: str) -> bool:
+    """Jeśli ponad 70% słów się pokrywa (po normalizacji, bez względu na kolejność), to prawdopodobnie duplikat"""
+    a_tokens, b_tokens = title_tokens(a), title_tokens(b)
+    if not a_tokens or not b_tokens:
+        return False
+    return len(a_tokens & b_tokens) / max(len(a_tokens), len(b_tokens)) > SIMILARITY_THRESHOLD
@@ -0,0 +1,29 @@
+# tests/conftest.py
+"""
+Testy działają na SQLite w katalogu tymczasowym — zmienne środowiskowe ustawiamy przed pierwszym
+importem app (database.py czyta DATABASE_URL przy imporcie, load_dotenv nie nadpisuje istniejących).
+"""
+import os, tempfile
+from pathlib import Path
+
+_TMP = Path(tempfile.mkdtemp(prefix="bookrec-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP / 'test.db'}"
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["MEDIA_CACHE_DIR"] = str(_TMP / "media")
+
+import pytest
+
+from app.db.database import Base, engine, SessionLocal
+from app import models  # noqa: F401 — rejestruje wszystkie tabele w Base.metadata
+
+
+@pytest.fixture
+def db():
+    """Świeży schemat na każdy test"""
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,120 @@
+# tests/test_cache.py
+import asyncio, time
+
+import pytest
+
+from app.core.cache import Cache, MemoryCache, SQLiteCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCache(max_entries=100)
+    return SQLiteCache(str(tmp_path / "cache.sqlite3"))
+
+
+def test_get_set_and_ttl(backend, monkeypatch):
+    backend.set("k", {"a": 1}, ttl=10)
+    assert backend.get("k") == {"a": 1}
+
+    later = time.time() + 11
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert backend.get("k") is None
+
+
+def test_add_is_a_lease_released_only_by_its_owner(backend):
+    assert backend.add("lock", "token-a", ttl=60)
+    assert not backend.add("lock", "token-b", ttl=60)
+
+    assert not backend.release("lock", "token-b")  # cudza blokada zostaje
+    assert backend.get("lock") == "token-a"
+    assert backend.release("lock", "token-a")
+    assert backend.add("lock", "token-b", ttl=60)
+
+
+def test_add_takes_over_expired_lease(backend, monkeypatch):
+    assert backend.add("lock", 1, ttl=5)
+    later = time.time() + 6
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert backend.add("lock", 2, ttl=5)
+
+
+def test_incr_counts_and_restarts_after_ttl(backend, monkeypatch):
+    assert [backend.incr("n", ttl=30) for _ in range(3)] == [1, 2, 3]
+
+    later = time.time() + 31
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert backend.incr("n", ttl=30) == 1
+
+
+def test_delete_tag_removes_only_tagged_keys(backend):
+    backend.set("a", 1, ttl=60, tags=["news"])
+    backend.set("b", 2, ttl=60, tags=["news", "agh"])
+    backend.set("c", 3, ttl=60)
+
+    assert backend.delete_tag("news") == 2
+    assert backend.get("a") is None and backend.get("b") is None
+    assert backend.get("c") == 3
+
+
+def test_purge_expired(backend, monkeypatch):
+    backend.set("short", 1, ttl=1)
+    backend.set("long", 2, ttl=100)
+    later = time.time() + 2
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    assert backend.purge_expired() == 1
+    assert backend.size() == 1
+
+
+def test_memory_cache_evicts_least_recently_used():
+    lru = MemoryCache(max_entries=2)
+    lru.set("a", 1, ttl=60)
+    lru.set("b", 2, ttl=60)
+    lru.get("a")  # "a" świeżo użyte — wypada "b"
+    lru.set("c", 3, ttl=60)
+
+    assert lru.get("a") == 1 and lru.get("b") is None and lru.get("c") == 3
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    one, two = SQLiteCache(path), SQLiteCache(path)  # jak dwa workery na jednym pliku
+
+    assert one.add("lock", "w1", ttl=60)
+    assert not two.add("lock", "w2", ttl=60)
+    one.incr("login:x", ttl=60)
+    assert two.incr("login:x", ttl=60) == 2
+
+
+class _Broken:
+    name = "broken"
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise RuntimeError("backend down")
+        return fail
+
+
+def test_facade_never_raises_backend_errors():
+    cache = Cache(_Broken())
+
+    assert cache.get("k", "default") == "default"
+    cache.set("k", 1, ttl=10)
+    assert cache.add("lock", 1, ttl=10)  # bez blokady praca zrobiona dwa razy zamiast wcale
+    assert cache.incr("n", ttl=10) == 0
+    assert cache.stats()["errors"] == 4
+
+
+def test_async_variants_with_sqlite_backend(tmp_path):
+    cache = Cache(SQLiteCache(str(tmp_path / "async.sqlite3")))
+
+    async def run():
+        await cache.aset("k", "v", ttl=60)
+        assert await cache.aget("k") == "v"
+        assert await cache.aadd("lock", "t", ttl=60)
+        assert await cache.arelease("lock", "t")
+        await cache.adelete("k")
+        return await cache.aget("k", "gone")
+
+    assert asyncio.run(run()) == "gone"
@@ -0,0 +1,125 @@
+# tests/test_event_recurrence.py
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+from icalendar import Calendar
+from sqlalchemy import select
+
+from app.api import routes_events
+from app.models.event import Event, EventRecurrence
+from app.services import event_recurrence as er
+from app.services import events_import as ei
+
+
+def _vevent(*lines: str):
+    cal = Calendar.from_ical("\r\n".join(["BEGIN:VCALENDAR", "VERSION:2.0", "BEGIN:VEVENT", "UID:s1",
+                                          "SUMMARY:Seminarium", *lines, "END:VEVENT", "END:VCALENDAR"]))
+    return next(iter(cal.walk("vevent")))
+
+
+def _event(id: int, start: datetime, hours: int = 2):
+    return SimpleNamespace(id=id, title=f"wydarzenie {id}", start_at=start, end_at=start + timedelta(hours=hours))
+
+
+def test_iter_occurrences_respects_window_and_exdates():
+    start = datetime(2030, 1, 7, 16)
+    starts = list(er.iter_occurrences("FREQ=WEEKLY", "UTC", start, [datetime(2030, 1, 21, 16)],
+                                      datetime(2030, 1, 10), datetime(2030, 2, 5)))
+
+    assert starts == [datetime(2030, 1, 14, 16), datetime(2030, 1, 28, 16), datetime(2030, 2, 4, 16)]
+
+
+def test_local_hour_is_kept_across_dst_change():
+    # 10:00 w Warszawie: UTC+1 zimą, UTC+2 od ostatniej niedzieli marca
+    starts = list(er.iter_occurrences("FREQ=WEEKLY", "Europe/Warsaw", datetime(2030, 3, 18, 9), [],
+                                      datetime(2030, 3, 1), datetime(2030, 4, 10)))
+
+    assert [s.hour for s in starts] == [9, 9, 8, 8]
+
+
+def test_recurrence_from_vevent_normalises_until_count_and_exdate():
+    rec = er.recurrence_from_vevent(_vevent(
+        "DTSTART;TZID=Europe/Warsaw:20300107T170000", "RRULE:FREQ=WEEKLY;COUNT=4",
+        "EXDATE;TZID=Europe/Warsaw:20300114T170000",
+    ))
+
+    assert rec["tzid"] == "Europe/Warsaw"
+    assert rec["exdates"] == ["2030-01-14T16:00:00"]       # UTC, jak events.start_at
+    assert rec["until"] == datetime(2030, 1, 28, 16)        # ostatnie wystąpienie z COUNT
+
+    rec = er.recurrence_from_vevent(_vevent("DTSTART:20300107T170000Z", "RRULE:FREQ=DAILY;UNTIL=20300110"))
+    assert rec["until"] == datetime(2030, 1, 10, 23, 59, 59)
+    assert er.recurrence_from_vevent(_vevent("DTSTART:20300107T170000Z")) is None
+
+
+def test_expand_yields_occurrences_and_keeps_single_events():
+    single = _event(1, datetime(2030, 1, 9, 12))
+    series = _event(2, datetime(2030, 1, 1, 16))
+    broken = _event(3, datetime(2030, 1, 1, 8))
+    recurrences = {
+        2: SimpleNamespace(rrule="FREQ=DAILY;COUNT=5", tzid="UTC", exdates=["2030-01-03T16:00:00"]),
+        3: SimpleNamespace(rrule="FREQ=SOMETIMES", tzid="UTC", exdates=[]),
+    }
+
+    out = list(er.expand([single, series, broken], recurrences, datetime(2030, 1, 1), datetime(2030, 1, 31)))
+
+    assert out[0] is single and out[-1] is broken  # nieczytelna reguła = sam wiersz serii
+    occurrences = out[1:-1]
+    assert [o.start_at.day for o in occurrences] == [1, 2, 4, 5]
+    assert all(o.end_at - o.start_at == timedelta(hours=2) and o.title == "wydarzenie 2" for o in occurrences)
+
+
+def test_window_bounds_defaults_to_a_year():
+    d = datetime(2030, 6, 1)
+    assert er.window_bounds(None, None) is None
+    assert er.window_bounds(d, None) == (d, d + er.DEFAULT_WINDOW)
+    assert er.window_bounds(None, d) == (d - er.DEFAULT_WINDOW, d)
+
+
+def _list(db, **filters):
+    params = {"uni": None, "q": None, "category": None, "online": None, "date_from": None, "date_to": None}
+    return routes_events.list_events(db=db, current_user=None, **{**params, **filters})
+
+
+def test_overridden_occurrence_replaces_the_series_slot(db):
+    body = ("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n"
+            "BEGIN:VEVENT\r\nUID:s1\r\nSUMMARY:Seminarium fizyki\r\nDTSTART:20301105T160000Z\r\n"
+            "RRULE:FREQ=WEEKLY;COUNT=4\r\nEND:VEVENT\r\n"
+            "BEGIN:VEVENT\r\nUID:s1\r\nRECURRENCE-ID:20301112T160000Z\r\nSUMMARY:Seminarium fizyki (sala 2)\r\n"
+            "DTSTART:20301113T180000Z\r\nEND:VEVENT\r\n"
+            "END:VCALENDAR\r\n").encode("utf-8")
+
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+        async with httpx.AsyncClient(transport=transport) as http:
+            await ei.import_events_plan(db, http, {("ics", "https://agh.example.com/s.ics"): [("AGH", "nauka")]})
+    asyncio.run(run())
+
+    rec = db.execute(select(EventRecurrence)).scalar_one()
+    assert rec.rrule == "FREQ=WEEKLY;COUNT=4" and rec.exdates == ["2030-11-12T16:00:00"]
+
+    out = _list(db, date_from="2030-11-01", date_to="2030-11-30")
+    assert sorted((e.start_at, e.title) for e in out) == [
+        (datetime(2030, 11, 5, 16), "Seminarium fizyki"),
+        (datetime(2030, 11, 13, 18), "Seminarium fizyki (sala 2)"),
+        (datetime(2030, 11, 19, 16), "Seminarium fizyki"),
+        (datetime(2030, 11, 26, 16), "Seminarium fizyki"),
+    ]
+
+
+def test_old_series_is_not_cut_by_the_list_limit(db):
+    series = Event(title="Seria od dawna", start_at=datetime(2029, 1, 7, 16), source_type="ics", source_uid="s")
+    db.add(series)
+    db.flush()
+    db.add(EventRecurrence(event_id=series.id, rrule="FREQ=WEEKLY", exdates=[], tzid="UTC", until=None))
+    db.add_all([Event(title=f"Pojedyncze {i}", start_at=datetime(2030, 11, 1) + timedelta(hours=i))
+                for i in range(250)])
+    db.commit()
+
+    out = _list(db, date_from="2030-11-01", date_to="2030-11-30")
+
+    assert len(out) == 200
+    # 250 pojedynczych wydarzeń w oknie nie wypycha serii z zapytania (sortowanie po dacie dopiero po rozwinięciu)
+    assert [e.start_at.day for e in out if e.title == "Seria od dawna"] == [24, 17, 10, 3]
@@ -0,0 +1,199 @@
+# tests/test_events_import.py
+import asyncio
+from datetime import datetime
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from app.models.event import Event, EventRecurrence, UserEvent
+from app.services import events_import as ei
+
+AGH_ICS = "https://agh.example.com/events.ics"
+UJ_ICS = "https://uj.example.com/events.ics"
+
+
+def _vevent(uid: str, title: str, start: str, *extra: str) -> str:
+    lines = ["BEGIN:VEVENT", f"UID:{uid}", f"SUMMARY:{title}", f"DTSTART:{start}", *extra, "END:VEVENT"]
+    return "\r\n".join(lines) + "\r\n"
+
+
+def _calendar(*vevents: str) -> bytes:
+    return ("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n" + "".join(vevents) + "END:VCALENDAR\r\n").encode("utf-8")
+
+
+class _Sources:
+    """Udawane źródła ICS: URL -> treść (brak wpisu = 404); liczy pobrania"""
+
+    def __init__(self, **bodies: bytes):
+        self.bodies = dict(bodies)
+        self.calls: dict[str, int] = {}
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        self.calls[url] = self.calls.get(url, 0) + 1
+        if url not in self.bodies:
+            return httpx.Response(404)
+        return httpx.Response(200, content=self.bodies[url], headers={"content-type": "text/calendar"})
+
+
+def _import(db, sources: _Sources, plan: dict, sync: bool = False) -> dict:
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(sources.handler)) as http:
+            return await ei.import_events_plan(db, http, plan, sync=sync)
+    return asyncio.run(run())
+
+
+def _events(db) -> dict[str, Event]:
+    db.expire_all()
+    return {e.source_uid: e for e in db.execute(select(Event)).scalars()}
+
+
+LECTURES = [
+    _vevent("w1", "Wykład o chemii kwantowej", "20301105T100000Z"),
+    _vevent("w2", "Seminarium z robotyki", "20301106T120000Z"),
+    _vevent("w3", "Warsztaty z analizy danych", "20301107T140000Z"),
+]
+
+
+def test_reimport_updates_rows_in_place(db):
+    sources = _Sources(**{AGH_ICS: _calendar(*LECTURES)})
+    plan = {("ics", AGH_ICS): [("AGH", "nauka")]}
+
+    first = _import(db, sources, plan)
+    ids = {uid: e.id for uid, e in _events(db).items()}
+    assert first["inserted"] == 3 and set(ids) == {"w1", "w2", "w3"}
+
+    again = _import(db, sources, plan)
+    assert (again["inserted"], again["updated"], again["unchanged"]) == (0, 0, 3)
+
+    sources.bodies[AGH_ICS] = _calendar(
+        _vevent("w1", "Wykład o chemii kwantowej", "20301105T100000Z", "LOCATION:Aula A-0"), *LECTURES[1:]
+    )
+    changed = _import(db, sources, plan)
+    events = _events(db)
+    assert (changed["inserted"], changed["updated"]) == (0, 1)
+    assert events["w1"].location_name == "Aula A-0"
+    assert {uid: e.id for uid, e in events.items()} == ids  # ten sam wiersz, to samo id
+
+
+def test_shared_source_is_fetched_once_for_all_universities(db):
+    sources = _Sources(**{AGH_ICS: _calendar(*LECTURES)})
+    plan = ei.build_fetch_plan({
+        "AGH": [{"type": "ics", "url": AGH_ICS, "category": "nauka"}],
+        "UJ": [{"type": "ics", "url": AGH_ICS, "category": "nauka"}],
+    })
+
+    stats = _import(db, sources, plan)
+
+    assert sources.calls[AGH_ICS] == 1
+    assert stats["sources"] == 1 and stats["subscriptions"] == 2
+    assert stats["inserted"] == 3
+
+
+def test_book_event_from_another_source_is_a_duplicate(db):
+    # wydarzenie książkowe trafia do uczelni wskazanych przez słowa kluczowe w treści
+    title = "Spotkanie autorskie w AGH wokół nowej książki o historii Krakowa"
+    sources = _Sources(**{
+        AGH_ICS: _calendar(_vevent("a1", title, "20301110T170000Z")),
+        UJ_ICS: _calendar(_vevent("u1", title + "!", "20301110T173000Z")),
+    })
+
+    _import(db, sources, {("ics", AGH_ICS): [("AGH", "książki")]})
+    assert [e.university_name for e in _events(db).values()] == ["Akademia Górniczo-Hutnicza"]
+    stats = _import(db, sources, {("ics", UJ_ICS): [("UJ", "książki")]})
+
+    assert stats["duplicates"] == 1 and stats["inserted"] == 0
+    assert list(_events(db)) == ["a1"]
+
+
+SERIES = [
+    _vevent("s1", "Seminarium fizyki", "20301105T160000Z", "RRULE:FREQ=WEEKLY;COUNT=4"),
+    # przeniesione drugie wystąpienie — ten sam tytuł co seria
+    _vevent("s1", "Seminarium fizyki", "20301113T180000Z", "RECURRENCE-ID:20301112T160000Z"),
+]
+
+
+def test_clean_duplicates_keeps_newest_row_without_source_uid(db):
+    old = Event(title="Dzień otwarty", start_at=datetime(2030, 3, 1, 10), updated_at=datetime(2030, 1, 1))
+    new = Event(title="Dzień otwarty", start_at=datetime(2030, 3, 1, 10), updated_at=datetime(2030, 2, 1))
+    other = Event(title="Noc naukowców", start_at=datetime(2030, 3, 2, 18))
+    db.add_all([old, new, other])
+    db.commit()
+    db.add(UserEvent(user_id=1, event_id=old.id, state="going"))
+    db.commit()
+    keep = {new.id, other.id}
+
+    assert ei.clean_duplicate_events(db) == 1
+    assert set(db.execute(select(Event.id)).scalars()) == keep
+    assert db.execute(select(UserEvent)).first() is None  # RSVP usuniętego wiersza razem z nim
+
+
+def test_clean_duplicates_leaves_ics_series_and_overrides(db):
+    sources = _Sources(**{AGH_ICS: _calendar(*SERIES)})
+    plan = {("ics", AGH_ICS): [("AGH", "nauka")]}
+    _import(db, sources, plan)
+    ids = {uid: e.id for uid, e in _events(db).items()}
+    db.add(UserEvent(user_id=1, event_id=ids["s1"], state="going"))
+    db.commit()
+
+    assert ei.clean_duplicate_events(db) == 0
+    _import(db, sources, plan)
+
+    assert {uid: e.id for uid, e in _events(db).items()} == ids
+    assert db.execute(select(UserEvent.event_id)).scalars().all() == [ids["s1"]]
+    assert db.execute(select(EventRecurrence.event_id)).scalars().all() == [ids["s1"]]
+
+
+def test_sync_marks_vanished_events_removed_and_keeps_rsvps(db):
+    sources = _Sources(**{AGH_ICS: _calendar(*LECTURES)})
+    plan = {("ics", AGH_ICS): [("AGH", "nauka")]}
+    _import(db, sources, plan, sync=True)
+    ids = {uid: e.id for uid, e in _events(db).items()}
+    db.add(UserEvent(user_id=1, event_id=ids["w1"], state="going"))
+    db.commit()
+
+    sources.bodies[AGH_ICS] = _calendar(
+        _vevent("w1", "Wykład o chemii kwantowej (sala zmieniona)", "20301105T100000Z"), LECTURES[1]
+    )
+    stats = _import(db, sources, plan, sync=True)
+    events = _events(db)
+    assert stats["removed"] == 1
+    assert {uid: e.status for uid, e in events.items()} == {"w1": "published", "w2": "published", "w3": "removed"}
+    assert events["w1"].id == ids["w1"] and events["w1"].title.endswith("(sala zmieniona)")
+    assert db.execute(select(UserEvent.event_id)).scalars().all() == [ids["w1"]]
+
+    # wydarzenie wraca do źródła — ten sam wiersz znów widoczny
+    sources.bodies[AGH_ICS] = _calendar(*LECTURES)
+    _import(db, sources, plan, sync=True)
+    events = _events(db)
+    assert events["w3"].status == "published" and events["w3"].id == ids["w3"]
+
+
+def test_sync_does_not_remove_events_of_a_failed_source(db):
+    sources = _Sources(**{AGH_ICS: _calendar(*LECTURES)})
+    plan = {("ics", AGH_ICS): [("AGH", "nauka")]}
+    _import(db, sources, plan, sync=True)
+
+    del sources.bodies[AGH_ICS]  # 404
+    stats = _import(db, sources, plan, sync=True)
+
+    assert stats["removed"] == 0
+    assert {e.status for e in _events(db).values()} == {"published"}
+
+
+def test_rows_left_pending_by_interrupted_sync_are_published(db, monkeypatch):
+    sources = _Sources(**{AGH_ICS: _calendar(*LECTURES)})
+    plan = {("ics", AGH_ICS): [("AGH", "nauka")]}
+
+    def interrupted(self, source_urls):
+        raise RuntimeError("worker zatrzymany")
+
+    with monkeypatch.context() as m:
+        m.setattr(ei.ImportSession, "finalize", interrupted)
+        with pytest.raises(RuntimeError):
+            _import(db, sources, plan, sync=True)
+    assert {e.status for e in _events(db).values()} == {"pending"}
+
+    _import(db, sources, plan)
+    assert {e.status for e in _events(db).values()} == {"published"}
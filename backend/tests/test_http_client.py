@@ -0,0 +1,103 @@
+# tests/test_http_client.py
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import http_client
+from app.core.http_client import CircuitOpenError, HostAwareTransport
+
+
+def _client(handler) -> tuple[httpx.AsyncClient, HostAwareTransport]:
+    transport = HostAwareTransport(httpx.MockTransport(handler))
+    return httpx.AsyncClient(transport=transport), transport
+
+
+def _status_by_host(statuses: dict):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(statuses.get(request.url.host, 200), text="ok")
+    return handler
+
+
+def test_circuit_opens_after_consecutive_failures():
+    c, t = _client(_status_by_host({"down.pl": 503}))
+
+    async def run():
+        for _ in range(http_client.CIRCUIT_FAILURES):
+            assert (await c.get("https://down.pl/")).status_code == 503
+        with pytest.raises(CircuitOpenError):
+            await c.get("https://down.pl/")
+        # inne hosty działają dalej
+        assert (await c.get("https://up.pl/")).status_code == 200
+
+    asyncio.run(run())
+    assert t.stats()["down.pl"]["circuit"] == "open"
+    assert t.stats()["down.pl"]["trips"] == 1
+
+
+def test_success_resets_failure_count():
+    statuses = {"flaky.pl": 503}
+    c, t = _client(_status_by_host(statuses))
+
+    async def run():
+        for _ in range(http_client.CIRCUIT_FAILURES - 1):
+            await c.get("https://flaky.pl/")
+        statuses["flaky.pl"] = 200
+        await c.get("https://flaky.pl/")
+
+    asyncio.run(run())
+    assert t.stats()["flaky.pl"]["failures"] == 0
+
+
+def test_half_open_probe_after_cooldown(monkeypatch):
+    monkeypatch.setattr(http_client, "CIRCUIT_COOLDOWN", 0.05)
+    statuses = {"down.pl": 503}
+    c, t = _client(_status_by_host(statuses))
+
+    async def run():
+        for _ in range(http_client.CIRCUIT_FAILURES):
+            await c.get("https://down.pl/")
+        await asyncio.sleep(0.1)
+
+        # próba nieudana — obwód od razu otwarty ponownie
+        assert (await c.get("https://down.pl/")).status_code == 503
+        with pytest.raises(CircuitOpenError):
+            await c.get("https://down.pl/")
+        await asyncio.sleep(0.1)
+
+        # próba udana — obwód zamknięty
+        statuses["down.pl"] = 200
+        assert (await c.get("https://down.pl/")).status_code == 200
+        assert (await c.get("https://down.pl/")).status_code == 200
+
+    asyncio.run(run())
+    assert t.stats()["down.pl"]["circuit"] == "closed"
+
+
+def test_host_state_is_capped_but_keeps_open_circuits(monkeypatch):
+    monkeypatch.setattr(http_client, "HOST_STATE_MAX", 5)
+    c, t = _client(_status_by_host({"down.pl": 503}))
+
+    async def run():
+        for _ in range(http_client.CIRCUIT_FAILURES):
+            await c.get("https://down.pl/")
+        for i in range(20):
+            await c.get(f"https://host{i}.pl/")
+
+    asyncio.run(run())
+    hosts = t.stats()
+    assert len(hosts) == 5
+    assert hosts["down.pl"]["circuit"] == "open"  # odcięty host nie wypada z LRU
+    assert "host19.pl" in hosts and "host0.pl" not in hosts
+
+
+def test_slot_is_held_until_body_is_closed():
+    c, t = _client(_status_by_host({}))
+
+    async def run():
+        async with c.stream("GET", "https://slow.pl/") as r:
+            assert t.stats()["slow.pl"]["in_flight"] == 1
+            await r.aread()
+        assert t.stats()["slow.pl"]["in_flight"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,136 @@
+# tests/test_ics_stream.py
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from app.models.event import Event
+from app.services import events_import as ei
+from app.services.ics_stream import VEventSplitter, parse_vevents
+
+ICS_URL = "https://agh.example.com/events.ics"
+
+VTIMEZONE = (
+    "BEGIN:VTIMEZONE\r\nTZID:Uczelnia/Kraków\r\n"
+    "BEGIN:STANDARD\r\nDTSTART:19701025T030000\r\nTZOFFSETFROM:+0200\r\nTZOFFSETTO:+0100\r\n"
+    "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU\r\nEND:STANDARD\r\n"
+    "BEGIN:DAYLIGHT\r\nDTSTART:19700329T020000\r\nTZOFFSETFROM:+0100\r\nTZOFFSETTO:+0200\r\n"
+    "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU\r\nEND:DAYLIGHT\r\n"
+    "END:VTIMEZONE\r\n"
+)
+
+
+def _vevent(i: int) -> str:
+    return (f"BEGIN:VEVENT\r\nUID:e{i}\r\nSUMMARY:Wykład numer {i} o fizyce cząstek {i * 7919}\r\n"
+            f"DTSTART:2030{(i % 12) + 1:02d}{(i % 28) + 1:02d}T100000Z\r\nEND:VEVENT\r\n")
+
+
+def _calendar(n: int) -> bytes:
+    return ("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n" + "".join(_vevent(i) for i in range(n))
+            + "END:VCALENDAR\r\n").encode("utf-8")
+
+
+SAMPLE = (
+    "BEGIN:VCALENDAR\r\nVERSION:2.0\r\n" + VTIMEZONE
+    + "BEGIN:VEVENT\r\nUID:tz\r\nSUMMARY:Wykład inauguracyjny\r\n"
+      "DTSTART;TZID=Uczelnia/Kraków:20300115T100000\r\n"
+      "DESCRIPTION:Pierwsza część opisu\r\n  i jego zawinięta kontynuacja\r\nEND:VEVENT\r\n"
+    + _vevent(1) + "END:VCALENDAR\r\n"
+).encode("utf-8")
+
+
+def _split(data: bytes, size: int) -> tuple[list[bytes], list[bytes]]:
+    """(bloki VEVENT, bloki VTIMEZONE) przy podawaniu treści kawałkami po size bajtów"""
+    splitter, blocks = VEventSplitter(), []
+    for i in range(0, len(data), size):
+        blocks += splitter.feed(data[i:i + size])
+    blocks += splitter.close()
+    return blocks, splitter.timezones
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, len(SAMPLE)])
+def test_splitter_is_independent_of_chunk_boundaries(size):
+    blocks, timezones = _split(SAMPLE, size)
+
+    assert (blocks, timezones) == _split(SAMPLE, len(SAMPLE))
+    assert len(blocks) == 2
+    assert blocks[0].startswith(b"BEGIN:VEVENT") and blocks[0].endswith(b"END:VEVENT")
+    assert len(timezones) == 1 and timezones[0].endswith(b"END:VTIMEZONE")
+
+
+def test_folded_lines_and_custom_timezone_survive_splitting():
+    blocks, timezones = _split(SAMPLE, 5)
+    first = next(parse_vevents(blocks[:1], timezones))
+
+    assert str(first["description"]) == "Pierwsza część opisu i jego zawinięta kontynuacja"
+    start = first.decoded("dtstart")
+    assert start.utcoffset().total_seconds() == 3600  # strefa z VTIMEZONE źródła, zima = UTC+1
+
+
+def test_broken_block_is_skipped_not_the_whole_batch():
+    broken = b"BEGIN:VEVENT\r\nUID:zly\r\nSUMMARY:x\r\nBEGIN:VALARM\r\nEND:VEVENT"
+    blocks, _ = _split(_calendar(3), 100)
+
+    uids = [str(c["uid"]) for c in parse_vevents([blocks[0], broken, *blocks[1:]], [])]
+
+    assert uids == ["e0", "e1", "e2"]
+
+
+def _stream(body: bytes, fail_at: int | None = None):
+    def handler(request: httpx.Request) -> httpx.Response:
+        async def chunks():
+            end = len(body) if fail_at is None else fail_at
+            for i in range(0, end, 1000):
+                yield body[i:min(i + 1000, end)]
+            if fail_at is not None:
+                raise httpx.ReadError("connection reset")
+        return httpx.Response(200, content=chunks())
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _batches(http: httpx.AsyncClient) -> list[list]:
+    async def run():
+        async with http:
+            return [items async for items in ei._iter_ics_batches(http, ICS_URL)]
+    return asyncio.run(run())
+
+
+def test_large_calendar_comes_in_parse_batches(monkeypatch):
+    monkeypatch.setattr(ei, "ICS_PARSE_BATCH", 10)
+
+    batches = _batches(_stream(_calendar(60)))
+
+    # paczka rusza do parsowania, gdy z kolejnego kawałka odpowiedzi uzbiera się ICS_PARSE_BATCH bloków
+    assert len(batches) >= 3
+    assert all(10 <= len(batch) < 20 for batch in batches[:-1])
+    uids = [fields["uid"] for batch in batches for _, fields, _ in batch]
+    assert uids == [f"e{i}" for i in range(60)]
+
+
+def test_failure_mid_stream_keeps_parsed_events_and_marks_source_incomplete(monkeypatch):
+    monkeypatch.setattr(ei, "ICS_PARSE_BATCH", 10)
+    body = _calendar(60)
+
+    batches = _batches(_stream(body, fail_at=len(body) // 2))
+
+    assert batches[-1] == [(ei._INCOMPLETE, None, ICS_URL)]
+    uids = [fields["uid"] for batch in batches[:-1] for _, fields, _ in batch]
+    assert 20 <= len(uids) < 60 and uids == [f"e{i}" for i in range(len(uids))]
+
+
+def test_sync_with_interrupted_stream_removes_nothing(db):
+    body = _calendar(60)
+    plan = {("ics", ICS_URL): [("AGH", "nauka")]}
+
+    async def run(fail_at):
+        async with _stream(body, fail_at) as http:
+            return await ei.import_events_plan(db, http, plan, sync=True)
+
+    assert asyncio.run(run(None))["inserted"] == 60
+    stats = asyncio.run(run(len(body) // 2))
+
+    assert stats["removed"] == 0
+    db.expire_all()
+    statuses = db.execute(select(Event.status)).scalars().all()
+    assert len(statuses) == 60 and set(statuses) == {"published"}
@@ -0,0 +1,126 @@
+# tests/test_media_cache.py
+import asyncio, io, os, time
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.api import routes_media
+from app.services import media_cache
+
+SRC = "https://covers.example.com/book.jpg"
+
+
+@pytest.fixture(autouse=True)
+def media_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_cache, "MEDIA_CACHE_DIR", tmp_path)
+    monkeypatch.setitem(media_cache._STATE, "total_bytes", None)
+    return tmp_path
+
+
+def _params(url: str) -> dict:
+    return {k: v[0] for k, v in parse_qs(urlsplit(url).query).items()}
+
+
+def _png(width: int, height: int = 10) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(out, format="PNG")
+    return out.getvalue()
+
+
+def _http(body: bytes, content_type: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, content=body, headers={"content-type": content_type})
+    ))
+
+
+def test_proxied_url_round_trip():
+    proxied = media_cache.proxied_url(SRC, 256)
+    p = _params(proxied)
+
+    assert p["url"] == SRC and p["w"] == "256"
+    assert media_cache.verify_signature(SRC, 256, p["sig"])
+    assert media_cache.original_url(proxied) == SRC
+    assert media_cache.proxied_url(proxied) == proxied  # nie podpisujemy dwa razy
+
+
+@pytest.mark.parametrize("url, w, sig", [
+    ("https://evil.example.com/x.jpg", 256, None),  # inny URL, ten sam podpis
+    (SRC, 512, None),                               # inna szerokość
+    (SRC, 256, "0" * 20),                           # podrobiony podpis
+    (SRC, 256, ""),
+])
+def test_verify_rejects_tampering(url, w, sig):
+    good = _params(media_cache.proxied_url(SRC, 256))["sig"]
+    assert not media_cache.verify_signature(url, w, good if sig is None else sig)
+
+
+def test_non_http_urls_are_left_alone():
+    assert media_cache.proxied_url(None) is None
+    assert media_cache.proxied_url("data:image/png;base64,xx") == "data:image/png;base64,xx"
+
+
+def test_proxy_endpoint_checks_signature_and_width():
+    app = FastAPI()
+    app.include_router(routes_media.router)
+    client = TestClient(app)
+    p = _params(media_cache.proxied_url(SRC, 256))
+
+    assert client.get("/media/proxy", params={**p, "sig": "0" * 20}).status_code == 403
+    assert client.get("/media/proxy", params={**p, "url": "http://127.0.0.1/admin"}).status_code == 403
+    assert client.get("/media/proxy", params={**p, "w": "300"}).status_code == 400
+
+
+def test_fetch_downscales_and_serves_from_disk():
+    async def run():
+        async with _http(_png(1000), "image/png") as http:
+            return await media_cache.get_or_fetch(http, SRC, 256)
+
+    path, content_type, _ = asyncio.run(run())
+    assert content_type == "image/png"
+    with Image.open(path) as im:
+        assert im.width == 256
+    assert media_cache.lookup(SRC, 256)[0] == path
+    assert media_cache.lookup(SRC, 128) is None  # inna szerokość = osobny wariant
+
+
+def test_svg_is_not_cached():
+    svg = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+
+    async def run():
+        async with _http(svg, "image/svg+xml") as http:
+            return await media_cache.get_or_fetch(http, SRC, None)
+
+    assert asyncio.run(run()) is None
+    assert media_cache.lookup(SRC, None) is None
+
+
+def test_ico_favicon_is_cached_unchanged():
+    ico = b"\x00\x00\x01\x00" + b"\x00" * 60
+    url = "https://icons.duckduckgo.com/ip3/agh.edu.pl.ico"
+
+    async def run():
+        async with _http(ico, "image/x-icon") as http:
+            return await media_cache.get_or_fetch(http, url, 64)
+
+    path, content_type, _ = asyncio.run(run())
+    assert content_type == "image/x-icon"
+    assert path.read_bytes() == ico
+
+
+def test_eviction_drops_oldest_blobs_and_their_keys(monkeypatch):
+    monkeypatch.setattr(media_cache, "MEDIA_CACHE_MAX_BYTES", 250)
+    now = time.time()
+    for i in range(2):
+        blob = media_cache._write(f"https://img.example.com/{i}.png", None, bytes([i]) * 100, "image/png")[0]
+        os.utime(blob, (now - 200 + i * 100, now - 200 + i * 100))  # 0.png używany najdawniej
+    media_cache._write("https://img.example.com/2.png", None, bytes([2]) * 100, "image/png")
+
+    # 300 B > 250 B — najstarszy blob wylatuje razem z wpisem w keys/
+    assert media_cache.lookup("https://img.example.com/0.png", None) is None
+    assert media_cache.lookup("https://img.example.com/2.png", None) is not None
+    keys = list((media_cache.MEDIA_CACHE_DIR / "keys").glob("*/*.json"))
+    assert len(keys) == 2
@@ -0,0 +1,50 @@
+# tests/test_news_store.py
+from datetime import datetime, timedelta
+
+from app.services import news_store
+
+
+def _item(i: int, day: int, **extra) -> dict:
+    date = (datetime(2026, 10, 1) + timedelta(days=day)).strftime("%a, %d %b %Y %H:%M:%S +0000")
+    return {"link": f"https://example.com/a/{i}", "title": f"Artykuł {i}", "date": date, **extra}
+
+
+def test_read_news_page_walks_all_items_with_cursor(db):
+    # kilka artykułów z tą samą datą — keyset rozstrzyga remisy po id
+    news_store.upsert_news("AGH", [_item(i, day=i // 3) for i in range(10)])
+
+    seen, cursor = [], None
+    while True:
+        items, cursor = news_store.read_news_page("AGH", 4, cursor)
+        seen += [it["link"] for it in items]
+        if cursor is None:
+            break
+
+    assert len(seen) == 10 and len(set(seen)) == 10
+    assert seen[0].endswith("/9")  # od najnowszych
+
+
+def test_read_news_page_is_scoped_to_university(db):
+    news_store.upsert_news("AGH", [_item(1, 0)])
+    news_store.upsert_news("UJ", [_item(2, 0)])
+
+    items, cursor = news_store.read_news_page("UJ", 10)
+    assert [it["link"] for it in items] == ["https://example.com/a/2"] and cursor is None
+
+
+def test_upsert_dedups_canonical_links_and_keeps_enriched_fields(db):
+    news_store.upsert_news("AGH", [_item(1, 0, thumbnail="https://img/1.jpg")])
+    # ten sam artykuł z parametrami utm_ i bez miniatury — nie dubluje się i nie gubi miniatury
+    again = _item(1, 0, thumbnail="")
+    again["link"] += "?utm_source=rss"
+    news_store.upsert_news("AGH", [again])
+
+    items, _ = news_store.read_news_page("AGH", 10)
+    assert len(items) == 1
+    assert items[0]["thumbnail"] == "https://img/1.jpg"
+
+
+def test_bad_cursor_starts_from_first_page(db):
+    news_store.upsert_news("AGH", [_item(i, i) for i in range(3)])
+    items, _ = news_store.read_news_page("AGH", 10, "nie-kursor")
+    assert len(items) == 3
@@ -36,4 +36,36 @@ api.interceptors.response.use(
   }
 );
 
+// NDJSON (jedna linia = jeden obiekt JSON) — wywołuje onItem dla każdej linii, gdy tylko dotrze
+export async function streamNdjson<T>(
+  url: string,
+  params: Record<string, string>,
+  onItem: (item: T) => void,
+  signal?: AbortSignal
+): Promise<void> {
+  const qs = new URLSearchParams(params).toString();
+  const headers: Record<string, string> = {};
+  const auth = api.defaults.headers.common.Authorization;
+  if (typeof auth === "string") headers.Authorization = auth;
+
+  const res = await fetch(`${api.defaults.baseURL}${url}?${qs}`, { headers, signal });
+  if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    let idx: number;
+    while ((idx = buf.indexOf("\n")) >= 0) {
+      const line = buf.slice(0, idx).trim();
+      buf = buf.slice(idx + 1);
+      if (line) onItem(JSON.parse(line) as T);
+    }
+  }
+  if (buf.trim()) onItem(JSON.parse(buf) as T);
+}
+
 export default api;
@@ -1,6 +1,6 @@
 // pages/HomePage.tsx
 import { useEffect, useMemo, useState } from "react";
-import api from "../lib/api";
+import api, { streamNdjson } from "../lib/api";
 import TopNav from "../components/layout/TopNav";
 import UniversitySidebar from "../components/home/UniversitySidebar";
 import NewsList, { NewsItem } from "../components/home/NewsList";
@@ -44,6 +44,8 @@ export default function HomePage() {
   const [selected, setSelected] = useState<string>("wszystkie");
   const [raw, setRaw] = useState<NewsItem[]>([]);
   const [loading, setLoading] = useState(false);
+  const [failed, setFailed] = useState(false);
+  const [attempt, setAttempt] = useState(0);
 
   const [filters, setFilters] = useState<Filters>({
     query: "",
@@ -70,28 +72,46 @@ export default function HomePage() {
     const ctrl = new AbortController();
     const fetchNews = async () => {
       setLoading(true);
+      setFailed(false);
       try {
         if (selected === "wszystkie") {
           // Używamy wszystkich dostępnych uczelni zamiast tylko 6
           if (!universities.length) { setRaw([]); return; }
           const q = universities.join(",");
-          const r = await api.get<Record<string, NewsItem[]>>("/news/multi", {
-            params: { q, limit_each: 20 },
-            signal: ctrl.signal as any,
-          });
-          const merged = Object.values(r.data).flat();
+          // Renderuj progresywnie: każda uczelnia pojawia się, gdy tylko backend ją odeśle
           const byLink = new Map<string, NewsItem>();
-          merged.forEach((n) => n.link && byLink.set(n.link, n));
-          setRaw(Array.from(byLink.values()));
+          setRaw([]);
+          await streamNdjson<{ university: string; items: NewsItem[] }>(
+            "/news/multi/stream",
+            { q, limit_each: "20" },
+            (chunk) => {
+              chunk.items.forEach((n) => n.link && !byLink.has(n.link) && byLink.set(n.link, n));
+              setRaw(Array.from(byLink.values()));
+              setLoading(false);
+            },
+            ctrl.signal
+          );
         } else {
-          const r = await api.get<NewsItem[]>("/news", {
-            params: { q: selected, max_results: 60 },
-            signal: ctrl.signal as any,
-          });
+          const load = () =>
+            api.get<NewsItem[]>("/news", {
+              params: { q: selected, max_results: 60 },
+              signal: ctrl.signal as any,
+            });
+          let r = await load();
+          // nowa fraza: backend pobiera newsy w tle i od razu odsyła pustą stronę z Retry-After
+          for (let i = 0; i < 5 && !r.data.length && r.headers["retry-after"]; i++) {
+            await new Promise((res) => setTimeout(res, Number(r.headers["retry-after"]) * 1000));
+            if (ctrl.signal.aborted) return;
+            r = await load();
+          }
           setRaw(r.data);
         }
       } catch (e: any) {
-        if (e?.name !== "CanceledError") setRaw([]);
+        if (e?.name !== "CanceledError" && e?.name !== "AbortError") {
+          // strumień urwany w trakcie: uczelnie już wyrenderowane zostają, pokazujemy tylko znacznik błędu
+          if (selected !== "wszystkie") setRaw([]);
+          setFailed(true);
+        }
       } finally {
         setLoading(false);
       }
@@ -100,7 +120,7 @@ export default function HomePage() {
     // Wywołaj fetchNews od razu, nie czekaj na cfg
     fetchNews();
     return () => ctrl.abort();
-  }, [selected, universities]);
+  }, [selected, universities, attempt]);
 
   const publishersAll = useMemo(() => {
     const s = new Set<string>();
@@ -174,6 +194,18 @@ export default function HomePage() {
             />
           </div>
           <div className="flex-1 overflow-y-auto">
+            {failed && (
+              <div className="m-4 p-3 rounded-xl bg-amber-50 dark:bg-amber-900/30 text-amber-800 dark:text-amber-200
+                              text-sm flex items-center justify-between gap-2">
+                <span>Nie udało się wczytać wszystkich newsów.</span>
+                <button
+                  className="px-3 py-1 rounded-lg bg-amber-600 text-white hover:bg-amber-700"
+                  onClick={() => setAttempt((a) => a + 1)}
+                >
+                  Spróbuj ponownie
+                </button>
+              </div>
+            )}
             <NewsList items={filtered} loading={loading} />
           </div>
         </section>